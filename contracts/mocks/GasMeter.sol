@@ -0,0 +1,25 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.9;
+
+/// @notice Never deployed: its runtime code is put at the caller's address
+/// through an eth_call state override so that the forwarded call keeps
+/// msg.sender, and the gas used is returned along with the call's output
+contract GasMeter {
+    function meter(address target, bytes calldata data)
+        external
+        payable
+        returns (
+            uint256 gasUsed,
+            bool success,
+            bytes memory result
+        )
+    {
+        uint256 start = gasleft();
+        (success, result) = target.call{value: msg.value}(data);
+        gasUsed = start - gasleft();
+    }
+
+    /// @dev the metered call may pay ETH back to its caller (harvests,
+    /// refunds, WETH withdrawals)
+    receive() external payable {}
+}
@@ -37,4 +37,10 @@ interface ICurvePool {
     function get_virtual_price() external view returns (uint256);
 
     function price_oracle() external view returns (uint256);
+
+    function balances(uint256 i) external view returns (uint256);
+
+    function A_precise() external view returns (uint256);
+
+    function fee() external view returns (uint256);
 }
@@ -19,4 +19,14 @@ interface ICurveStableSwapNG {
     function price_oracle(uint256 k) external view returns (uint256);
 
     function get_virtual_price() external view returns (uint256);
-}
\ No newline at end of file
+
+    function A_precise() external view returns (uint256);
+
+    function fee() external view returns (uint256);
+
+    function offpeg_fee_multiplier() external view returns (uint256);
+
+    function stored_rates() external view returns (uint256[] memory);
+
+    function get_balances() external view returns (uint256[] memory);
+}
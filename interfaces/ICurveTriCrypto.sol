@@ -17,4 +17,24 @@ interface ICurveTriCrypto {
     ) external view returns (uint256);
 
     function price_oracle(uint256 k) external view returns (uint256);
+
+    function coins(uint256 i) external view returns (address);
+
+    function balances(uint256 i) external view returns (uint256);
+
+    function A() external view returns (uint256);
+
+    function gamma() external view returns (uint256);
+
+    function D() external view returns (uint256);
+
+    function price_scale(uint256 k) external view returns (uint256);
+
+    function mid_fee() external view returns (uint256);
+
+    function out_fee() external view returns (uint256);
+
+    function fee_gamma() external view returns (uint256);
+
+    function future_A_gamma_time() external view returns (uint256);
 }
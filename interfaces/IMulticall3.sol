@@ -0,0 +1,32 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.9;
+
+interface IMulticall3 {
+    struct Call3 {
+        address target;
+        bool allowFailure;
+        bytes callData;
+    }
+
+    struct Result {
+        bool success;
+        bytes returnData;
+    }
+
+    // payable on chain, declared view so that it is always sent as eth_call
+    function aggregate3(Call3[] calldata calls)
+        external
+        view
+        returns (Result[] memory returnData);
+
+    function getBlockNumber() external view returns (uint256 blockNumber);
+
+    function getBasefee() external view returns (uint256 basefee);
+
+    function getCurrentBlockTimestamp()
+        external
+        view
+        returns (uint256 timestamp);
+
+    function getEthBalance(address addr) external view returns (uint256 balance);
+}
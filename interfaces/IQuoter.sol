@@ -2,6 +2,8 @@
 pragma solidity 0.8.9;
 
 interface IQuoter {
+    function factory() external view returns (address);
+
     function quoteExactInputSingle(
         address tokenIn,
         address tokenOut,
@@ -2,6 +2,8 @@
 pragma solidity 0.8.9;
 
 interface IUniV2Router {
+    function factory() external pure returns (address);
+
     function swapExactTokensForETH(
         uint256 amountIn,
         uint256 amountOutMin,
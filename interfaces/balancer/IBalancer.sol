@@ -160,6 +160,15 @@ interface IBalancerVault {
     //
     // Finally, Internal Balance can be used when either sending or receiving tokens.
 
+    function getPoolTokens(bytes32 poolId)
+        external
+        view
+        returns (
+            address[] memory tokens,
+            uint256[] memory balances,
+            uint256 lastChangeBlock
+        );
+
     enum SwapKind {
         GIVEN_IN,
         GIVEN_OUT
@@ -18,3 +18,53 @@ interface IBalancerHelper {
         IBalancerVault.ExitPoolRequest memory request
     ) external view returns (uint256 bptIn, uint256[] memory amountsOut);
 }
+
+interface IBalancerWeightedPool {
+    function getPoolId() external view returns (bytes32);
+
+    function getNormalizedWeights() external view returns (uint256[] memory);
+
+    function getSwapFeePercentage() external view returns (uint256);
+}
+
+interface IBalancerStablePool {
+    function getPoolId() external view returns (bytes32);
+
+    function getAmplificationParameter()
+        external
+        view
+        returns (
+            uint256 value,
+            bool isUpdating,
+            uint256 precision
+        );
+
+    function getSwapFeePercentage() external view returns (uint256);
+
+    function getScalingFactors() external view returns (uint256[] memory);
+
+    function getBptIndex() external view returns (uint256);
+
+    function getActualSupply() external view returns (uint256);
+}
+
+interface IBalancerLinearPool {
+    function getPoolId() external view returns (bytes32);
+
+    function getMainIndex() external view returns (uint256);
+
+    function getWrappedIndex() external view returns (uint256);
+
+    function getBptIndex() external view returns (uint256);
+
+    function getTargets()
+        external
+        view
+        returns (uint256 lowerTarget, uint256 upperTarget);
+
+    function getSwapFeePercentage() external view returns (uint256);
+
+    function getScalingFactors() external view returns (uint256[] memory);
+
+    function getVirtualSupply() external view returns (uint256);
+}
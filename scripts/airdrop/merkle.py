@@ -0,0 +1,641 @@
+import json
+import mmap
+import struct
+from bisect import bisect_left
+from multiprocessing import Pool
+
+from Crypto.Hash import keccak
+from hexbytes import HexBytes
+from web3 import Web3
+
+NODE_SIZE = 32
+
+# binary snapshot layout: header, one (offset, node count) entry per level,
+# the levels as 32 byte nodes (leaves first) and the address index, one
+# (address, leaf position, amount) entry per claim in claim index order
+SNAPSHOT_MAGIC = b"UMKL"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sIIQQ")
+SNAPSHOT_LEVEL = struct.Struct("<QQ")
+SNAPSHOT_CLAIM = struct.Struct("<20sQ32s")
+
+
+def abi_encode(index, account, amount):
+    v = Web3.soliditySha3(["uint256", "address", "uint256"], [index, account, amount])
+    return bytearray(v)
+
+
+def sort_claims(data):
+    # claim indexes follow the order of the claimers' addresses
+    return sorted(data, key=lambda x: bytearray.fromhex(x["user"][2:]))
+
+
+def sort_leaves(leaves):
+    # returns the claim index of each leaf and the leaves in tree order
+    _sorted_encoded_data = [i for i in sorted(enumerate(leaves), key=lambda x: x[1])]
+    return list(zip(*_sorted_encoded_data))
+
+
+def encode_leaf(index, account, amount):
+    # keccak256(abi.encodePacked(index, account, amount)) without going
+    # through web3's type dispatch, same result as abi_encode
+    account = bytes.fromhex(account[2:])
+    if len(account) != 20:
+        raise ValueError("Invalid address")
+    data = index.to_bytes(32, "big") + account + amount.to_bytes(32, "big")
+    return keccak.new(data=data, digest_bits=256).digest()
+
+
+def encode_leaves(claims, processes=None):
+    # encodes (index, account, amount) tuples, sharded over a process pool
+    # when processes is set. pool.starmap keeps the input order
+    if not processes or processes < 2 or len(claims) < 2 * processes:
+        return [encode_leaf(*claim) for claim in claims]
+    chunksize = -(-len(claims) // (processes * 4))
+    with Pool(processes) as pool:
+        return pool.starmap(encode_leaf, claims, chunksize)
+
+
+def _verify_claims(claims, root):
+    failures = []
+    for user, index, amount, proof in claims:
+        node = encode_leaf(index, user, amount)
+        for sibling in proof:
+            node = hash_pair(node, sibling)
+        if node != root:
+            failures.append(user)
+    return failures
+
+
+def read_published_claims(fp):
+    # reads a proofs file written by OrderedMerkleTree.write_proofs (either
+    # format), returns the merkle root and (user, index, amount, proof) tuples
+    header = json.loads(fp.readline())
+    if "proofs" in header:
+        claims = header["proofs"].items()
+    else:
+        claims = (json.loads(line) for line in fp if line.strip())
+        claims = ((claim["user"], claim) for claim in claims)
+    return header["merkleRoot"], [
+        (
+            user,
+            claim["index"],
+            int(claim["amount"], 16),
+            [bytes.fromhex(sibling[2:]) for sibling in claim["proof"]],
+        )
+        for user, claim in claims
+    ]
+
+
+def verify_proofs(fp, root=None, processes=None):
+    # checks every proof of a published proofs file against root, which
+    # defaults to the root in the file but can be the one read from the
+    # distributor (merkleRoot()). Returns the users whose proof is invalid
+    file_root, claims = read_published_claims(fp)
+    root = bytes(HexBytes(root or file_root))
+    if not processes or processes < 2 or len(claims) < 2 * processes:
+        return _verify_claims(claims, root)
+    size = -(-len(claims) // (processes * 4))
+    chunks = [(claims[i : i + size], root) for i in range(0, len(claims), size)]
+    with Pool(processes) as pool:
+        return [
+            user
+            for failures in pool.starmap(_verify_claims, chunks)
+            for user in failures
+        ]
+
+
+def verify_multiproof(multiproof, root):
+    # recomputes the root from a multiproof produced by
+    # OrderedMerkleTree.get_multiproof. The level walk mirrors
+    # MerkleTree.get_multiproof: flags tell whether a node is paired with the
+    # next known node or with the next proof element, nodes without a
+    # sibling (odd end nodes) are carried over to the next level
+    nodes = sorted(
+        (position, encode_leaf(claim["index"], claim["user"], claim["amount"]))
+        for position, claim in zip(multiproof["positions"], multiproof["claims"])
+    )
+    proof = iter(bytes.fromhex(x[2:]) for x in multiproof["proof"])
+    flags = iter(multiproof["flags"])
+    count = multiproof["leafCount"]
+    while count > 1:
+        next_nodes = []
+        i = 0
+        while i < len(nodes):
+            index, node = nodes[i]
+            if index == count - 1 and count % 2 == 1:
+                pass
+            elif next(flags):
+                i += 1
+                node = hash_pair(node, nodes[i][1])
+            else:
+                node = hash_pair(node, next(proof))
+            next_nodes.append((index // 2, node))
+            i += 1
+        nodes = next_nodes
+        count = (count + 1) // 2
+    consumed = next(proof, None) is None and next(flags, None) is None
+    return consumed and len(nodes) == 1 and "0x" + nodes[0][1].hex() == root
+
+
+def calldata_size(*arrays, static=0):
+    # abi encoded calldata bytes of a call with `static` 32 byte arguments
+    # followed by dynamic arrays of the given lengths
+    return 4 + 32 * static + sum(32 * (2 + length) for length in arrays)
+
+
+def format_claim(proof):
+    return {
+        "index": proof["claim"]["index"],
+        "amount": f"0x{(proof['claim']['amount']):x}",
+        "proof": proof["proofs"],
+    }
+
+
+class OrderedMerkleTree(object):
+    def __init__(self, data, previous=None, processes=None):
+        self.data = sort_claims(data)
+        self.claimers = [x["user"] for x in self.data]
+        self.amounts = [x["amount"] for x in self.data]
+        _unsorted_encoded_data = [None] * len(self.data)
+        if previous is not None:
+            _unsorted_encoded_data = [
+                self._reuse_leaf(previous, i) for i in range(len(self.data))
+            ]
+        _missing = [i for i, x in enumerate(_unsorted_encoded_data) if x is None]
+        _encoded = encode_leaves(
+            [(i, self.claimers[i], self.amounts[i]) for i in _missing], processes
+        )
+        for i, encoded_data in zip(_missing, _encoded):
+            _unsorted_encoded_data[i] = encoded_data
+        self.index, self.encoded_data = sort_leaves(_unsorted_encoded_data)
+        self.tree = MerkleTree()
+        self.tree.add_leaves(self.encoded_data)
+        self.tree.make_tree(previous.tree if previous is not None else None)
+        # leaf position of each claim and claim index of each claimer
+        self.positions = [0] * len(self.index)
+        for position, index in enumerate(self.index):
+            self.positions[index] = position
+        self.claimer_index = {}
+        for index, claimer in enumerate(self.claimers):
+            self.claimer_index.setdefault(claimer.lower(), index)
+        self._proof_cache = {}
+
+    def _reuse_leaf(self, previous, index):
+        # the leaf of an unchanged claim is taken from the previous tree
+        claimer, amount = self.claimers[index], self.amounts[index]
+        if (
+            index < len(previous.claimers)
+            and previous.claimers[index].lower() == claimer.lower()
+            and previous.amounts[index] == amount
+        ):
+            return previous.encoded_data[previous.positions[index]]
+        return None
+
+    def _get_claim_proof(self, index):
+        original_data = {
+            "index": index,
+            "user": self.claimers[index],
+            "amount": self.amounts[index],
+        }
+        proofs = [
+            "0x" + item
+            for a in self.tree.get_proof(self.positions[index])
+            for item in list(a.values())
+        ]
+        return {"claim": original_data, "proofs": proofs}
+
+    def get_proofs(self):
+        res = {}
+        res["root"] = "0x" + self.tree.get_merkle_root()
+        res["proofs"] = [
+            self._get_claim_proof(index) for index in range(len(self.claimers))
+        ]
+        return res
+
+    def get_root(self):
+        return "0x" + self.tree.get_merkle_root()
+
+    def iter_proofs(self):
+        for index in range(len(self.claimers)):
+            yield self._get_claim_proof(index)
+
+    def write_proofs(self, fp, distribution_id, json_lines=False):
+        # writes proofs one claim at a time using the published
+        # {"id", "merkleRoot", "proofs": {user: claim}} schema, or one json
+        # document per line (header first) if json_lines is set
+        root = self.get_root()
+        if json_lines:
+            fp.write(json.dumps({"id": distribution_id, "merkleRoot": root}) + "\n")
+            for proof in self.iter_proofs():
+                entry = {"user": proof["claim"]["user"], **format_claim(proof)}
+                fp.write(json.dumps(entry) + "\n")
+            return
+        fp.write(json.dumps({"id": distribution_id, "merkleRoot": root})[:-1])
+        fp.write(', "proofs": {')
+        for i, proof in enumerate(self.iter_proofs()):
+            if i > 0:
+                fp.write(", ")
+            fp.write(json.dumps(proof["claim"]["user"]) + ": ")
+            fp.write(json.dumps(format_claim(proof)))
+        fp.write("}}")
+
+    def update(self, updates, removed=(), processes=None):
+        # builds the tree of the next epoch from a list of changed or added
+        # {"user", "amount"} entries and a list of removed users, reusing the
+        # leaves and subtrees that did not change. Returns the new tree and
+        # the claimers whose claim or proof differs from this tree.
+        removed = {user.lower() for user in removed}
+        data = {
+            x["user"].lower(): x for x in self.data if x["user"].lower() not in removed
+        }
+        data.update({x["user"].lower(): x for x in updates})
+        tree = OrderedMerkleTree(list(data.values()), self, processes)
+        return tree, tree.get_changed_claimers(self)
+
+    def get_changed_claimers(self, previous):
+        changed = []
+        for index, claimer in enumerate(self.claimers):
+            old_index = previous.claimer_index.get(claimer.lower())
+            if (
+                old_index != index
+                or previous.amounts[old_index] != self.amounts[index]
+                or previous.positions[old_index] != self.positions[index]
+                or self.tree.proof_changed(self.positions[index], previous.tree)
+            ):
+                changed.append(claimer)
+        return changed
+
+    def get_multiproof(self, claimers):
+        # single proof for a batch of claims, sibling nodes shared by several
+        # claims or computable from the claimed leaves are only included once
+        indexes = {self.claimer_index[claimer.lower()] for claimer in claimers}
+        indexes = sorted(indexes, key=lambda i: self.positions[i])
+        positions = [self.positions[index] for index in indexes]
+        proof, flags = self.tree.get_multiproof(positions)
+        return {
+            "root": self.get_root(),
+            "leafCount": self.tree.get_leaf_count(),
+            "claims": [
+                {
+                    "index": index,
+                    "user": self.claimers[index],
+                    "amount": self.amounts[index],
+                }
+                for index in indexes
+            ],
+            "positions": positions,
+            "proof": ["0x" + x.hex() for x in proof],
+            "flags": flags,
+        }
+
+    def get_multiproof_savings(self, claimers):
+        # calldata of one claim(index, account, amount, proof) per claimer
+        # against a single batched claim with (indexes, accounts, amounts,
+        # positions, proof) arrays and the flags packed in a uint256[] bitmap
+        multiproof = self.get_multiproof(claimers)
+        individual = sum(
+            calldata_size(len(self.get_proof(x["user"])["proofs"]), static=3)
+            for x in multiproof["claims"]
+        )
+        batched = calldata_size(
+            *[len(multiproof["claims"])] * 4,
+            len(multiproof["proof"]),
+            -(-len(multiproof["flags"]) // 256),
+        )
+        return {
+            "claims": len(multiproof["claims"]),
+            "individual": individual,
+            "multiproof": batched,
+            "saved": individual - batched,
+        }
+
+    def write_snapshot(self, fp):
+        # writes the tree in the binary format read by MerkleSnapshot
+        levels = self.tree.levels
+        table_size = SNAPSHOT_LEVEL.size * len(levels)
+        offset = SNAPSHOT_HEADER.size + table_size
+        index_offset = offset + sum(len(level) for level in levels)
+        fp.write(
+            SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC,
+                SNAPSHOT_VERSION,
+                len(levels),
+                len(self.claimers),
+                index_offset,
+            )
+        )
+        for level in levels:
+            fp.write(SNAPSHOT_LEVEL.pack(offset, len(level) // NODE_SIZE))
+            offset += len(level)
+        for level in levels:
+            fp.write(level)
+        for index, claimer in enumerate(self.claimers):
+            fp.write(
+                SNAPSHOT_CLAIM.pack(
+                    bytes.fromhex(claimer[2:]),
+                    self.positions[index],
+                    self.amounts[index].to_bytes(32, "big"),
+                )
+            )
+
+    def get_proof(self, claimer):
+        index = self.claimer_index.get(claimer.lower())
+        if index is None:
+            return None
+        if index not in self._proof_cache:
+            self._proof_cache[index] = self._get_claim_proof(index)
+        return self._proof_cache[index]
+
+
+def common_prefix(a, b, block=1024):
+    # number of leading 32 byte nodes shared by two level buffers
+    n = min(len(a), len(b)) // NODE_SIZE
+    i = 0
+    while (
+        i + block <= n
+        and a[i * NODE_SIZE : (i + block) * NODE_SIZE]
+        == b[i * NODE_SIZE : (i + block) * NODE_SIZE]
+    ):
+        i += block
+    while (
+        i < n
+        and a[i * NODE_SIZE : (i + 1) * NODE_SIZE]
+        == b[i * NODE_SIZE : (i + 1) * NODE_SIZE]
+    ):
+        i += 1
+    return i
+
+
+def common_suffix(a, b):
+    # number of trailing 32 byte nodes shared by two level buffers
+    return common_prefix(a[::-1], b[::-1])
+
+
+def hash_pair(a, b):
+    # sorted pair hashing, matches OpenZeppelin's MerkleProof
+    if b < a:
+        a, b = b, a
+    return keccak.new(data=a + b, digest_bits=256).digest()
+
+
+class Keccak:
+    def __init__(self, data):
+        self.data = data
+
+    def digest(self):
+        return keccak.new(data=self.data, digest_bits=256).digest()
+
+    def hexdigest(self):
+        return self.digest().hex()
+
+
+class MerkleTree(object):
+    def __init__(self):
+        self.hash_function = Keccak
+        self.reset_tree()
+
+    def reset_tree(self):
+        self.leaves = list()
+        self.levels = None
+        self.dirty = None
+        self.is_ready = False
+
+    def add_leaf(self, v):
+        self.is_ready = False
+        self.leaves.append(v)
+
+    def add_leaves(self, values):
+        self.is_ready = False
+        self.leaves.extend(values)
+
+    def concat(self, a, b):
+        a, b = sorted([a, b])
+        return a + b
+
+    def get_leaf(self, index):
+        return self.leaves[index].hex()
+
+    def get_leaf_count(self):
+        return len(self.leaves)
+
+    def get_tree_ready_state(self):
+        return self.is_ready
+
+    def get_node(self, level, index):
+        return self.levels[level][index * NODE_SIZE : (index + 1) * NODE_SIZE]
+
+    def _calculate_next_level(self):
+        # levels are stored leaves first as contiguous buffers of 32 byte nodes
+        level = self.levels[-1]
+        N = len(level) // NODE_SIZE  # number of nodes on the level
+        nodes = [level[i : i + NODE_SIZE] for i in range(0, len(level), NODE_SIZE)]
+        paired = N - N % 2
+        new_level = b"".join(map(hash_pair, nodes[0:paired:2], nodes[1:paired:2]))
+        if N % 2 == 1:  # if odd number of nodes, carry the last one over
+            new_level += nodes[-1]
+        self.levels.append(new_level)
+
+    def _update_levels(self, previous):
+        # rebuilds only the nodes whose subtree differs from the previous
+        # tree, nodes before the first and after the last changed leaf are
+        # copied over. dirty holds the [start, end) range recomputed per level
+        old = previous.levels
+        level = self.levels[0]
+        start = common_prefix(level, old[0])
+        end = len(level) // NODE_SIZE
+        if len(level) == len(old[0]):
+            end -= common_suffix(level, old[0])
+            if start >= end:
+                self.levels = list(old)
+                self.dirty = [(0, 0)] * len(old)
+                return
+        self.dirty = [(start, end)]
+        x = 0
+        while len(self.levels[-1]) > NODE_SIZE:
+            level = self.levels[-1]
+            N = len(level) // NODE_SIZE
+            start, end = start // 2, (end + 1) // 2
+            prefix = old[x + 1][: start * NODE_SIZE] if start > 0 else b""
+            suffix = b""
+            if end < (N + 1) // 2:
+                suffix = old[x + 1][end * NODE_SIZE :]
+            nodes = [
+                level[i : i + NODE_SIZE]
+                for i in range(
+                    2 * start * NODE_SIZE, min(2 * end, N) * NODE_SIZE, NODE_SIZE
+                )
+            ]
+            paired = len(nodes) - len(nodes) % 2
+            middle = b"".join(map(hash_pair, nodes[0:paired:2], nodes[1:paired:2]))
+            if len(nodes) % 2 == 1:
+                middle += nodes[-1]
+            self.levels.append(prefix + middle + suffix)
+            self.dirty.append((start, end))
+            x += 1
+
+    def make_tree(self, previous=None):
+        self.is_ready = False
+        self.dirty = None
+        if self.get_leaf_count() > 0:
+            self.levels = [b"".join(self.leaves)]
+            if previous is not None and previous.levels is not None:
+                self._update_levels(previous)
+            else:
+                while len(self.levels[-1]) > NODE_SIZE:
+                    self._calculate_next_level()
+        self.is_ready = True
+
+    def _get_sibling_index(self, level, index):
+        level_len = len(self.levels[level]) // NODE_SIZE
+        if (index == level_len - 1) and (level_len % 2 == 1):
+            return None  # odd end node, carried over without a sibling
+        return index - 1 if index % 2 else index + 1
+
+    def proof_changed(self, index, previous):
+        # whether the proof of a leaf differs from the one at the same
+        # position of the tree this one was updated from, may over-report
+        if self.dirty is None or len(self.levels) != len(previous.levels):
+            return True
+        for x in range(len(self.levels) - 1):
+            sibling = self._get_sibling_index(x, index >> x)
+            if sibling != previous._get_sibling_index(x, index >> x):
+                return True
+            start, end = self.dirty[x]
+            if sibling is not None and start <= sibling < end:
+                return True
+        return False
+
+    def get_merkle_root(self):
+        if self.is_ready:
+            if self.levels is not None:
+                return self.levels[-1].hex()
+            else:
+                return None
+        else:
+            return None
+
+    def get_proof(self, index):
+        if self.levels is None:
+            return None
+        elif not self.is_ready or index > len(self.leaves) - 1 or index < 0:
+            return None
+        else:
+            proof = []
+            for x in range(len(self.levels) - 1):
+                sibling_index = self._get_sibling_index(x, index)
+                if sibling_index is not None:
+                    sibling_pos = "left" if index % 2 else "right"
+                    sibling_value = self.get_node(x, sibling_index).hex()
+                    proof.append({sibling_pos: sibling_value})
+                index = index // 2
+            return proof
+
+    def get_multiproof(self, indexes):
+        # walks the levels bottom-up from the given leaf positions. A node
+        # paired with another known node needs no proof element (flag True),
+        # otherwise its sibling is added to the proof (flag False)
+        known = sorted(set(indexes))
+        proof = []
+        flags = []
+        for x in range(len(self.levels) - 1):
+            next_known = []
+            i = 0
+            while i < len(known):
+                index = known[i]
+                sibling_index = self._get_sibling_index(x, index)
+                if sibling_index is None:
+                    pass
+                elif i + 1 < len(known) and known[i + 1] == sibling_index:
+                    flags.append(True)
+                    i += 1
+                else:
+                    flags.append(False)
+                    proof.append(self.get_node(x, sibling_index))
+                next_known.append(index // 2)
+                i += 1
+            known = next_known
+        return proof, flags
+
+    def validate_proof(self, proof, target_hash, merkle_root):
+        merkle_root = bytes.fromhex(merkle_root)
+        proof_hash = bytes.fromhex(target_hash)
+        for p in proof:
+            # pairs are hashed sorted, the side of the sibling does not matter
+            sibling = p["left"] if "left" in p else p["right"]
+            proof_hash = hash_pair(proof_hash, bytes.fromhex(sibling))
+        return proof_hash == merkle_root
+
+
+class MerkleSnapshot(object):
+    # serves proofs from a file written by OrderedMerkleTree.write_snapshot
+    # through a read-only memory map, only the pages of the nodes on the
+    # requested path and of the address lookup are read
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            level_count,
+            self.claim_count,
+            self._index_offset,
+        ) = SNAPSHOT_HEADER.unpack_from(self._mm, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("Not a merkle snapshot")
+        self.levels = [
+            SNAPSHOT_LEVEL.unpack_from(
+                self._mm, SNAPSHOT_HEADER.size + i * SNAPSHOT_LEVEL.size
+            )
+            for i in range(level_count)
+        ]
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.claim_count
+
+    def __getitem__(self, index):
+        # address of the claim at index, claims are sorted by address
+        return self._get_claim(index)[0]
+
+    def _get_claim(self, index):
+        offset = self._index_offset + index * SNAPSHOT_CLAIM.size
+        return SNAPSHOT_CLAIM.unpack_from(self._mm, offset)
+
+    def get_node(self, level, index):
+        offset = self.levels[level][0] + index * NODE_SIZE
+        return self._mm[offset : offset + NODE_SIZE]
+
+    def get_root(self):
+        return "0x" + self.get_node(len(self.levels) - 1, 0).hex()
+
+    def get_proof(self, claimer):
+        account = bytes.fromhex(claimer[2:])
+        index = bisect_left(self, account)
+        if index == self.claim_count:
+            return None
+        address, position, amount = self._get_claim(index)
+        if address != account:
+            return None
+        proofs = []
+        for x, (_, level_len) in enumerate(self.levels[:-1]):
+            if not (position == level_len - 1 and level_len % 2 == 1):
+                sibling_index = position - 1 if position % 2 else position + 1
+                proofs.append("0x" + self.get_node(x, sibling_index).hex())
+            position = position // 2
+        return {
+            "claim": {
+                "index": index,
+                "user": Web3.toChecksumAddress(address),
+                "amount": int.from_bytes(amount, "big"),
+            },
+            "proofs": proofs,
+        }
@@ -3,7 +3,7 @@ import json
 import os
 from tests.utils.airdrop.prisma import PRISMA_CLAIMS
 from tests.utils.constants import CVXPRISMA
-from tests.utils.merkle import OrderedMerkleTree
+from scripts.airdrop.merkle import OrderedMerkleTree
 from brownie import (
     accounts,
     interface,
@@ -0,0 +1,18 @@
+import os
+from brownie import interface
+from scripts.airdrop.merkle import verify_proofs
+
+AIRDROP_CONTRACT = "0x8E6d5cf9B9659D4f8e68EE040bF26E728eF1baA4"
+
+
+def main():
+    location = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+    root = interface.IGenericDistributor(AIRDROP_CONTRACT).merkleRoot()
+    with open(os.path.join(location, "proofs.json"), "r") as fp:
+        failures = verify_proofs(fp, root, processes=os.cpu_count())
+
+    print(f"ROOT: {root}")
+    print(f"INVALID PROOFS: {len(failures)}")
+    for user in failures:
+        print(user)
+    assert len(failures) == 0
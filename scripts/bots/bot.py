@@ -1,85 +1,270 @@
-import requests
+import asyncio
 import json
-from typing import Optional
 import os
-import time
 import eth_abi
-from web3 import Web3, HTTPProvider
+import websockets
+from aiohttp import ClientSession
+from web3 import Web3
 from eth_account import Account
 
+from scripts.bots.fees import FeeHistory
+from scripts.bots.txs import (
+    TxPipeline,
+    RpcError,
+    INCLUSION_BLOCKS,
+    PRIORITY_PERCENTILE,
+)
+
 BAL_VAULT = "0xBA12222222228d8Ba445958a75a0704d566BF2C8"
 AURABAL_BAL_ETH_BPT_POOL_ID = (
     "0x3dd0843a028c86e0b760b1a76929d1c5ef93a2dd000200000000000000000249"
 )
 AURABAL_TOKEN = "0x616e8BfA43F920657B3497DBf40D6b1A02D4608d"
 BAL_ETH_POOL_TOKEN = "0x5c6Ee304399DBdB9C8Ef030aB642B10820DB8F56"
-
-ALCHEMY_API_KEY = os.environ["ALCHEMY_API_KEY"]
-PROVIDER = f"https://eth-mainnet.alchemyapi.io/v2/{ALCHEMY_API_KEY}"
-web3 = Web3(HTTPProvider(PROVIDER))
 BOT_ADDRESS = Web3.toChecksumAddress("0x2251AF9804d0A1A04e8e0e7A1FBB83F4D7423f9e")
-ACCOUNT = os.environ["HARVESTER_KEY"]
 
+# amount of BPT used to get the auraBAL / BPT ratio
+QUERY_AMOUNT = int(1e20)
+# harvest if the ETH received exceeds the gas cost by this much
+MIN_PROFIT = int(1e15)
+# seconds between two eth_blockNumber when new heads can't be subscribed to
+POLL_INTERVAL = 2
 
-def get_gas_price() -> Optional[int]:
-    r = requests.get("https://api.ethgasstation.info/api/fee-estimate")
-    gas_price = json.loads(r.content).get("gasPrice", {}).get("standard")
-    return gas_price
+LOCATION = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
 
 
-if __name__ == "__main__":
-    account = Account.from_key(ACCOUNT)
-    location = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
-    bot_abi = json.load(open(os.path.join(location, "abis/AuraBalBotZap.json"), "r"))
-    bal_vault_abi = json.load(open(os.path.join(location, "abis/BalVault.json"), "r"))
+class RpcClient(object):
+    # JSON-RPC over http, several calls are sent as a single batch request
 
-    bot = web3.eth.contract(BOT_ADDRESS, abi=bot_abi)
-    bal_vault = web3.eth.contract(BAL_VAULT, abi=bal_vault_abi)
+    def __init__(self, session, url):
+        self.session = session
+        self.url = url
 
+    async def batch(self, calls):
+        # calls is a list of (method, params), the result of each call is
+        # returned in order, RpcError instances for the ones that failed
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in enumerate(calls)
+        ]
+        async with self.session.post(self.url, json=payload) as response:
+            replies = await response.json(content_type=None)
+        replies = sorted(replies, key=lambda reply: reply["id"])
+        return [
+            RpcError(reply["error"]) if "error" in reply else reply["result"]
+            for reply in replies
+        ]
+
+    async def request(self, method, params):
+        result = (await self.batch([(method, params)]))[0]
+        if isinstance(result, RpcError):
+            raise result
+        return result
+
+
+async def poll_heads(client, interval=POLL_INTERVAL):
+    last = None
     while True:
+        block = int(await client.request("eth_blockNumber", []), 16)
+        if block != last:
+            last = block
+            yield block
+        await asyncio.sleep(interval)
+
+
+async def latest_heads(ws):
+    # block numbers of the newHeads notifications of ws. the socket is read
+    # in the background, heads received while the consumer processes a block
+    # are collapsed into the latest one instead of being queued
+    heads = []
+    received = asyncio.Event()
+
+    async def read():
+        async for message in ws:
+            head = json.loads(message)["params"]["result"]
+            heads.append(int(head["number"], 16))
+            received.set()
+
+    reader = asyncio.ensure_future(read())
+    try:
+        while True:
+            waiter = asyncio.ensure_future(received.wait())
+            await asyncio.wait([reader, waiter], return_when=asyncio.FIRST_COMPLETED)
+            if received.is_set():
+                received.clear()
+                block = heads[-1]
+                heads.clear()
+                yield block
+            else:
+                waiter.cancel()
+                # raises if the connection failed
+                reader.result()
+                return
+    finally:
+        reader.cancel()
+
+
+async def watch_heads(client, ws_url=None, interval=POLL_INTERVAL):
+    # block numbers of the new heads, from an eth_subscribe newHeads
+    # subscription if a websocket endpoint is given, polling otherwise.
+    # heads missed while a block is processed are skipped
+    if ws_url is not None:
         try:
-            amount = int(1e20)
-            swap_step = (
-                AURABAL_BAL_ETH_BPT_POOL_ID,
-                0,
-                1,
-                amount,
-                eth_abi.encode_abi(["uint256"], [0]),
-            )
-            assets = [BAL_ETH_POOL_TOKEN, AURABAL_TOKEN]
-            funds = (BOT_ADDRESS, False, BOT_ADDRESS, False)
-            ratio = (
-                bal_vault.functions.queryBatchSwap(0, [swap_step], assets, funds).call()[-1]
-                * -1
+            async with websockets.connect(ws_url) as ws:
+                await ws.send(
+                    json.dumps(
+                        {
+                            "jsonrpc": "2.0",
+                            "id": 1,
+                            "method": "eth_subscribe",
+                            "params": ["newHeads"],
+                        }
+                    )
+                )
+                await ws.recv()
+                async for block in latest_heads(ws):
+                    yield block
+        except (OSError, websockets.WebSocketException) as e:
+            print(f"Subscription failed ({e}), polling for new blocks")
+    async for block in poll_heads(client, interval):
+        yield block
+
+
+def decide(ratio, gas_price, simulations, amount=QUERY_AMOUNT, min_profit=MIN_PROFIT):
+    # simulations maps lock to the (gas used, ETH received) of harvest(0, lock)
+    # returns (lock, ETH received, gas used, gas cost, whether to harvest)
+    lock = ratio > amount
+    gas_used, eth_received = simulations[lock]
+    if isinstance(gas_used, RpcError) or isinstance(eth_received, RpcError):
+        return lock, 0, 0, 0, False
+    gas_cost = gas_used * gas_price
+    return lock, eth_received, gas_used, gas_cost, eth_received - gas_cost > min_profit
+
+
+class HarvestBot(object):
+    def __init__(self, client, account, chain_id, bot_address=BOT_ADDRESS):
+        w3 = Web3()
+        bot_abi = json.load(open(os.path.join(LOCATION, "abis/AuraBalBotZap.json")))
+        vault_abi = json.load(open(os.path.join(LOCATION, "abis/BalVault.json")))
+        self.bot = w3.eth.contract(bot_address, abi=bot_abi)
+        self.bal_vault = w3.eth.contract(BAL_VAULT, abi=vault_abi)
+        self.client = client
+        self.account = account
+        self.pending = None
+        self.fees = FeeHistory()
+        self.txs = TxPipeline(client, account, chain_id, self.fees)
+
+    def get_calls(self, block):
+        # ratio query, fee history and, for both lock values, the gas estimate
+        # and simulation of the harvest, all pinned to block
+        tag = hex(block)
+        swap_step = (
+            AURABAL_BAL_ETH_BPT_POOL_ID,
+            0,
+            1,
+            QUERY_AMOUNT,
+            eth_abi.encode_abi(["uint256"], [0]),
+        )
+        assets = [BAL_ETH_POOL_TOKEN, AURABAL_TOKEN]
+        funds = (self.bot.address, False, self.bot.address, False)
+        query = self.bal_vault.encodeABI(
+            fn_name="queryBatchSwap", args=[0, [swap_step], assets, funds]
+        )
+        calls = [
+            ("eth_call", [{"to": BAL_VAULT, "data": query}, tag]),
+            self.fees.query(block),
+        ]
+        for lock in (False, True):
+            tx = {
+                "from": self.account.address,
+                "to": self.bot.address,
+                "data": self.bot.encodeABI(fn_name="harvest", args=[0, lock]),
+            }
+            calls.append(("eth_estimateGas", [tx, tag]))
+            calls.append(("eth_call", [tx, tag]))
+        return calls
+
+    async def on_block(self, block):
+        if self.pending is not None and not self.pending.done():
+            return
+        results = await self.client.batch(self.get_calls(block))
+        query, history = results[:2]
+        if isinstance(query, RpcError) or isinstance(history, RpcError):
+            print(f"Block {block}: query failed ({query}, {history})")
+            return
+        ratio = -eth_abi.decode_abi(["int256[]"], bytes.fromhex(query[2:]))[0][-1]
+        self.fees.update(history)
+        gas_price = self.fees.gas_price(INCLUSION_BLOCKS, PRIORITY_PERCENTILE)
+        simulations = {}
+        for lock, (gas_used, received) in zip(
+            (False, True), (results[2:4], results[4:6])
+        ):
+            if not isinstance(gas_used, RpcError):
+                gas_used = int(gas_used, 16)
+            if not isinstance(received, RpcError):
+                received = eth_abi.decode_abi(["uint256"], bytes.fromhex(received[2:]))[
+                    0
+                ]
+            simulations[lock] = (gas_used, received)
+
+        lock, eth_received, gas_used, gas_cost, harvest = decide(
+            ratio, gas_price, simulations
+        )
+        print(f"Block {block}")
+        print(f"AuraBAL to ETH20BAL80LP Ratio: {ratio} (Lock: {lock})")
+        print(f"Gas price: {gas_price * 1e-9} gwei")
+        print(f"Gas used: {gas_used}")
+        print(f"Gas cost (ETH): {gas_cost * 1e-18} ({gas_cost})")
+        print(f"ETH received: {eth_received * 1e-18} ({eth_received})")
+        if harvest:
+            print("Calling harvest")
+            self.pending = asyncio.ensure_future(
+                self.harvest(lock, eth_received * 9 // 10, gas_used)
             )
 
-            gas_price = 8 #get_gas_price()
-            lock = ratio > amount
-            gas_used = bot.functions.harvest(0, lock).estimate_gas(
-                {"from": account.address}
+    async def harvest(self, lock, min_amount_out, gas_used):
+        try:
+            pending = await self.txs.submit(
+                {
+                    "to": self.bot.address,
+                    "data": self.bot.encodeABI(
+                        fn_name="harvest", args=[min_amount_out, lock]
+                    ),
+                    "gas": gas_used * 12 // 10,
+                }
             )
-            print(f"GAS PRICE: {gas_price} GAS USED: {gas_used}")
-            eth_received = bot.functions.harvest(0, lock).call({"from": account.address})
-            gas_cost = gas_used * gas_price * 1e9
-            print(f"AuraBAL to ETH20BAL80LP Ratio: {ratio} (Lock: {lock})")
-            print(f"Gas price: {gas_price}")
-            print(f"Gas used: {gas_used}")
-            print(f"Gas cost (ETH): {gas_cost * 1e-18} ({gas_cost})")
-            print(f"ETH received: {eth_received * 1e-18} ({eth_received})")
-            if (eth_received - gas_cost) > 1e15:
-                print("Calling harvest")
-                try:
-                    nonce = web3.eth.get_transaction_count(account.address)
-                    tx = bot.functions.harvest(int(eth_received * 0.9), lock).build_transaction(
-                        {"chainId": 1, "nonce": nonce, "from": account.address}
-                    )
-                    signed = account.sign_transaction(tx)
-                    hash = web3.eth.send_raw_transaction(signed.rawTransaction)
-                    print("Waiting for approval transaction receipt")
-                    receipt = web3.eth.wait_for_transaction_receipt(hash)
-                    print("Tx confirmed %s " % receipt)
-                except Exception as e:
-                    print(f"Error: {e}")
-            time.sleep(60)
+            print(f"Waiting for transaction receipt (nonce {pending.nonce})")
+            receipt = await pending.confirmed
+            print("Tx confirmed %s " % receipt)
         except Exception as e:
-            print("Error: ", e)
+            print(f"Error: {e}")
+
+    async def run(self, ws_url=None):
+        async for block in watch_heads(self.client, ws_url):
+            try:
+                await self.on_block(block)
+            except Exception as e:
+                print("Error: ", e)
+
+
+async def main(rpc_url, ws_url, private_key):
+    account = Account.from_key(private_key)
+    async with ClientSession() as session:
+        client = RpcClient(session, rpc_url)
+        chain_id = int(await client.request("eth_chainId", []), 16)
+        await HarvestBot(client, account, chain_id).run(ws_url)
+
+
+if __name__ == "__main__":
+    # RPC_URL / WS_URL can point to a local anvil or hardhat fork
+    ALCHEMY_API_KEY = os.environ.get("ALCHEMY_API_KEY")
+    RPC_URL = os.environ.get(
+        "RPC_URL", f"https://eth-mainnet.alchemyapi.io/v2/{ALCHEMY_API_KEY}"
+    )
+    WS_URL = os.environ.get(
+        "WS_URL",
+        f"wss://eth-mainnet.alchemyapi.io/v2/{ALCHEMY_API_KEY}"
+        if ALCHEMY_API_KEY
+        else None,
+    )
+    asyncio.run(main(RPC_URL, WS_URL, os.environ["HARVESTER_KEY"]))
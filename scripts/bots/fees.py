@@ -0,0 +1,112 @@
+from collections import deque
+
+# EIP-1559 fee estimation from a rolling eth_feeHistory window
+
+# priority fee percentiles requested from eth_feeHistory
+PERCENTILES = [10, 50, 90]
+# number of past blocks kept in the window
+WINDOW = 20
+# EIP-1559 BASE_FEE_MAX_CHANGE_DENOMINATOR
+BASE_FEE_CHANGE_DENOMINATOR = 8
+
+
+def _int(value):
+    # quantities are hex strings over raw JSON-RPC, ints through web3
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def next_base_fee(base_fee, gas_used_ratio):
+    # base fee of the block after one with base_fee that used gas_used_ratio
+    # of its gas limit, the target being half the limit
+    delta = int(base_fee * (2 * gas_used_ratio - 1) / BASE_FEE_CHANGE_DENOMINATOR)
+    return max(0, base_fee + delta)
+
+
+class FeeHistory(object):
+    def __init__(self, window=WINDOW, percentiles=PERCENTILES):
+        self.window = window
+        self.percentiles = list(percentiles)
+        # (block number, base fee, gas used ratio, priority fee per percentile)
+        self.blocks = deque(maxlen=window)
+        # base fee of the block after the last one in the window
+        self.pending_base_fee = None
+
+    @property
+    def last_block(self):
+        return self.blocks[-1][0] if self.blocks else None
+
+    def update(self, history):
+        # history is an eth_feeHistory result, blocks already in the window
+        # are skipped and the oldest ones dropped once the window is full
+        oldest = _int(history["oldestBlock"])
+        base_fees = [_int(fee) for fee in history["baseFeePerGas"]]
+        ratios = history["gasUsedRatio"]
+        rewards = history.get("reward") or [[] for _ in ratios]
+        for i, ratio in enumerate(ratios):
+            number = oldest + i
+            if self.last_block is not None and number <= self.last_block:
+                continue
+            self.blocks.append(
+                (number, base_fees[i], ratio, [_int(r) for r in rewards[i]])
+            )
+        if ratios and oldest + len(ratios) - 1 == self.last_block:
+            self.pending_base_fee = base_fees[len(ratios)]
+
+    def query(self, block):
+        # eth_feeHistory call bringing the window up to block, only the blocks
+        # not seen yet are requested
+        if self.last_block is None:
+            count = self.window
+        else:
+            count = max(1, min(self.window, block - self.last_block))
+        return "eth_feeHistory", [hex(count), hex(block), self.percentiles]
+
+    async def refresh(self, client, block):
+        self.update(await client.request(*self.query(block)))
+
+    def refresh_web3(self, w3, block=None):
+        if block is None:
+            block = w3.eth.block_number
+        _, (count, _, percentiles) = self.query(block)
+        self.update(w3.eth.fee_history(int(count, 16), block, percentiles))
+
+    def predict_base_fees(self, blocks):
+        # expected base fee of each of the next blocks, assuming they are as
+        # full as the average block of the window
+        ratios = [ratio for _, _, ratio, _ in self.blocks]
+        ratio = sum(ratios) / len(ratios) if ratios else 0.5
+        fees = [self.pending_base_fee]
+        while len(fees) < blocks:
+            fees.append(next_base_fee(fees[-1], ratio))
+        return fees
+
+    def max_base_fee(self, blocks):
+        # highest base fee possible within the next blocks (all blocks full)
+        fee = self.pending_base_fee
+        for _ in range(blocks - 1):
+            fee = next_base_fee(fee, 1)
+        return fee
+
+    def priority_fee(self, percentile):
+        # median over the window of the percentile-th priority fee of each
+        # block, empty blocks excluded
+        i = self.percentiles.index(percentile)
+        values = sorted(
+            rewards[i]
+            for _, _, ratio, rewards in self.blocks
+            if ratio > 0 and len(rewards) > i
+        )
+        return values[len(values) // 2] if values else 0
+
+    def gas_price(self, blocks, percentile):
+        # effective gas price expected to be paid by a tx included within the
+        # next blocks
+        return max(self.predict_base_fees(blocks)) + self.priority_fee(percentile)
+
+    def fees(self, blocks, percentile):
+        # fee fields of a type 2 tx that stays includable for the next blocks
+        priority_fee = self.priority_fee(percentile)
+        return {
+            "maxFeePerGas": self.max_base_fee(blocks) + priority_fee,
+            "maxPriorityFeePerGas": priority_fee,
+        }
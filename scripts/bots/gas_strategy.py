@@ -0,0 +1,25 @@
+from brownie import web3, Wei
+from brownie.network.gas.bases import BlockGasStrategy
+
+from scripts.bots.fees import FeeHistory
+
+
+class FeeHistoryStrategy(BlockGasStrategy):
+    # gas price from a rolling eth_feeHistory window: the base fee expected
+    # over the next `blocks` blocks plus the `percentile`-th priority fee.
+    # re-evaluated every `duration` blocks, pending txs are bumped if it rose
+
+    def __init__(self, percentile=50, blocks=3, max_gas_price=None, duration=2):
+        super().__init__(duration)
+        self.percentile = percentile
+        self.blocks = blocks
+        self.max_gas_price = None if max_gas_price is None else Wei(max_gas_price)
+
+    def get_gas_price(self):
+        history = FeeHistory(percentiles=[self.percentile])
+        while True:
+            history.refresh_web3(web3)
+            price = history.gas_price(self.blocks, self.percentile)
+            if self.max_gas_price is not None:
+                price = min(price, self.max_gas_price)
+            yield price
@@ -0,0 +1,205 @@
+import asyncio
+
+from scripts.bots.fees import FeeHistory
+
+# seconds between two checks of the pending transactions
+POLL_INTERVAL = 2
+# a transaction still pending after that many blocks is sped up
+SPEED_UP_AFTER = 3
+# replacements must raise both fees by at least 10% to be accepted by the
+# nodes, 12.5% leaves some margin
+BUMP_NUM, BUMP_DEN = 1125, 1000
+INCLUSION_BLOCKS = 3
+PRIORITY_PERCENTILE = 50
+
+
+class RpcError(Exception):
+    # error reply of the node, the request was received and rejected
+    pass
+
+
+class TransactionReverted(Exception):
+    pass
+
+
+class NonceManager(object):
+    # hands out nonces locally: the pending transaction count is only fetched
+    # on the first use and when a nonce handed back can't be reused
+
+    def __init__(self, client, address):
+        self.client = client
+        self.address = address
+        self.next_nonce = None
+        self.lock = asyncio.Lock()
+
+    async def sync(self):
+        # to be called with the lock held
+        count = await self.client.request(
+            "eth_getTransactionCount", [self.address, "pending"]
+        )
+        self.next_nonce = int(count, 16)
+
+    async def take(self):
+        async with self.lock:
+            if self.next_nonce is None:
+                await self.sync()
+            nonce = self.next_nonce
+            self.next_nonce += 1
+            return nonce
+
+    async def release(self, nonce):
+        # nonce of a transaction that was not sent. it is handed out again if
+        # no other one was taken since, otherwise the later transactions
+        # leave a gap and the count is fetched again
+        async with self.lock:
+            if self.next_nonce == nonce + 1:
+                self.next_nonce = nonce
+            else:
+                await self.sync()
+
+    async def reset(self):
+        # outcome of a send is unknown (e.g. a timeout) and the transaction
+        # may have reached the node: the next nonce is fetched again
+        async with self.lock:
+            self.next_nonce = None
+
+
+class PendingTx(object):
+    def __init__(self, tx):
+        # tx is the last signed version, hashes holds every version sent
+        self.tx = tx
+        self.hashes = []
+        self.sent_at = None
+        self.receipt = None
+        self.confirmed = asyncio.get_event_loop().create_future()
+
+    @property
+    def nonce(self):
+        return self.tx["nonce"]
+
+
+class TxPipeline(object):
+    # sends transactions without waiting for the previous ones to be mined
+    # and tracks all of them concurrently. each PendingTx resolves to its
+    # receipt once confirmed (or fails with TransactionReverted), stuck ones
+    # are replaced with bumped fees
+
+    def __init__(
+        self,
+        client,
+        account,
+        chain_id,
+        fees=None,
+        confirmations=1,
+        speed_up_after=SPEED_UP_AFTER,
+        poll_interval=POLL_INTERVAL,
+    ):
+        self.client = client
+        self.account = account
+        self.chain_id = chain_id
+        self.fees = FeeHistory() if fees is None else fees
+        self.nonces = NonceManager(client, account.address)
+        self.confirmations = confirmations
+        self.speed_up_after = speed_up_after
+        self.poll_interval = poll_interval
+        self.pending = {}
+
+    async def block_number(self):
+        return int(await self.client.request("eth_blockNumber", []), 16)
+
+    async def get_fees(self):
+        block = await self.block_number()
+        if self.fees.last_block is None or self.fees.last_block < block:
+            await self.fees.refresh(self.client, block)
+        return self.fees.fees(INCLUSION_BLOCKS, PRIORITY_PERCENTILE)
+
+    async def submit(self, tx):
+        # tx needs to, data and gas, value defaults to 0. the fee fields are
+        # filled from the fee history if missing
+        tx = {"value": 0, **tx, "chainId": self.chain_id}
+        if "maxFeePerGas" not in tx:
+            tx.update(await self.get_fees())
+        tx["nonce"] = await self.nonces.take()
+        pending = PendingTx(tx)
+        try:
+            await self.send(pending)
+        except RpcError:
+            await self.nonces.release(pending.nonce)
+            raise
+        except Exception:
+            await self.nonces.reset()
+            raise
+        self.pending[pending.nonce] = pending
+        asyncio.ensure_future(self.track(pending))
+        return pending
+
+    async def submit_all(self, txs):
+        # all sent before any is mined, returns the receipts in order
+        pendings = [await self.submit(tx) for tx in txs]
+        return await asyncio.gather(*(pending.confirmed for pending in pendings))
+
+    async def send(self, pending, tx=None):
+        # tx replaces pending.tx once the node accepted it
+        tx = pending.tx if tx is None else tx
+        signed = self.account.sign_transaction(tx)
+        tx_hash = await self.client.request(
+            "eth_sendRawTransaction", [signed.rawTransaction.hex()]
+        )
+        pending.tx = tx
+        pending.hashes.append(tx_hash)
+        pending.sent_at = await self.block_number()
+
+    async def replace(self, pending, **changes):
+        # same nonce, fees raised by at least the minimum bump (or to the
+        # current estimate if higher). changes override other fields
+        fees = await self.get_fees()
+        tx = {**pending.tx, **changes}
+        for field in ("maxFeePerGas", "maxPriorityFeePerGas"):
+            tx[field] = max(fees[field], pending.tx[field] * BUMP_NUM // BUMP_DEN)
+        await self.send(pending, tx)
+
+    async def speed_up(self, pending):
+        await self.replace(pending)
+
+    async def cancel(self, pending):
+        # 0 value self transfer taking the nonce
+        await self.replace(
+            pending, to=self.account.address, value=0, data="0x", gas=21000
+        )
+
+    async def track(self, pending):
+        try:
+            while not pending.confirmed.done():
+                await asyncio.sleep(self.poll_interval)
+                block = await self.block_number()
+                if pending.receipt is None:
+                    for tx_hash in pending.hashes:
+                        receipt = await self.client.request(
+                            "eth_getTransactionReceipt", [tx_hash]
+                        )
+                        if receipt is not None:
+                            pending.receipt = receipt
+                            break
+                if pending.receipt is not None:
+                    mined = int(pending.receipt["blockNumber"], 16)
+                    if block - mined + 1 < self.confirmations:
+                        continue
+                    if pending.receipt["status"] == "0x1":
+                        pending.confirmed.set_result(pending.receipt)
+                    else:
+                        pending.confirmed.set_exception(
+                            TransactionReverted(pending.receipt)
+                        )
+                elif block - pending.sent_at >= self.speed_up_after:
+                    try:
+                        await self.speed_up(pending)
+                    except Exception as e:
+                        # e.g. nonce too low as a previous version just got
+                        # mined, its receipt is picked up on the next check
+                        print(f"Speed up of nonce {pending.nonce} failed: {e}")
+                        pending.sent_at = block
+        except Exception as e:
+            if not pending.confirmed.done():
+                pending.confirmed.set_exception(e)
+        finally:
+            self.pending.pop(pending.nonce, None)
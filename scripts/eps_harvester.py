@@ -61,9 +61,14 @@ contracts = [
 def main():
     deployer = accounts.load("mainnet-deploy")
 
-    # up the nonce to 18
-    for i in range(17):
-        deployer.transfer(deployer, 1)
+    # up the nonce to 18, the transfers are all sent before waiting
+    nonce = deployer.nonce
+    txs = [
+        deployer.transfer(deployer, 1, nonce=nonce + i, required_confs=0)
+        for i in range(17)
+    ]
+    for tx in txs:
+        tx.wait(1)
 
     eps = EPSClaim.deploy({"from": deployer})
     assert eps.address == CVXCRV_VAULT
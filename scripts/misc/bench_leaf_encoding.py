@@ -0,0 +1,39 @@
+import random
+import time
+
+from web3 import Web3
+
+from scripts.airdrop.merkle import abi_encode, encode_leaf
+
+SAMPLE_SIZE = 20000
+
+
+def time_encoder(encoder, claims):
+    start = time.perf_counter()
+    leaves = [encoder(*claim) for claim in claims]
+    return time.perf_counter() - start, leaves
+
+
+def main():
+    rng = random.Random(0)
+    claims = [
+        (
+            i,
+            Web3.toChecksumAddress(f"0x{rng.getrandbits(160):040x}"),
+            rng.getrandbits(96),
+        )
+        for i in range(SAMPLE_SIZE)
+    ]
+    web3_time, web3_leaves = time_encoder(abi_encode, claims)
+    packed_time, packed_leaves = time_encoder(encode_leaf, claims)
+    assert web3_leaves == packed_leaves
+
+    scale = 1_000_000 / SAMPLE_SIZE
+    print(f"Leaves encoded: {SAMPLE_SIZE}")
+    print(f"soliditySha3: {web3_time * scale:.2f}s per million leaves")
+    print(f"packed encoder: {packed_time * scale:.2f}s per million leaves")
+    print(f"Speedup: {web3_time / packed_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from tabulate import tabulate
+from web3 import Web3
+
+from scripts.airdrop.merkle import (
+    MerkleTree,
+    OrderedMerkleTree,
+    encode_leaves,
+    sort_claims,
+    sort_leaves,
+)
+
+# run with `python -m scripts.misc.bench_merkle [sizes...]`, no network needed
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def synthetic_claims(size, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "user": Web3.toChecksumAddress(f"0x{rng.getrandbits(160):040x}"),
+            "amount": rng.randrange(10**15, 10**24),
+        }
+        for _ in range(size)
+    ]
+
+
+def timed(fn, *args):
+    # wall time (s) of the stage
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def traced(fn, *args):
+    # peak memory (MiB) allocated on top of what was already traced when the
+    # stage started, tracemalloc has to be running
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    result = fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    return result, (peak - baseline) / 2**20
+
+
+def make_tree(leaves):
+    tree = MerkleTree()
+    tree.add_leaves(leaves)
+    tree.make_tree()
+    return tree
+
+
+def export_proofs(tree):
+    with open(os.devnull, "w") as fp:
+        tree.write_proofs(fp, "benchmark")
+
+
+def run_stages(data, measure):
+    stages = []
+    claims, stat = measure(sort_claims, data)
+    stages.append(("sort claims", stat))
+    tuples = [(i, x["user"], x["amount"]) for i, x in enumerate(claims)]
+    leaves, stat = measure(encode_leaves, tuples)
+    stages.append(("encode leaves", stat))
+    (_, sorted_leaves), stat = measure(sort_leaves, leaves)
+    stages.append(("sort leaves", stat))
+    _, stat = measure(make_tree, sorted_leaves)
+    stages.append(("make_tree", stat))
+    del claims, tuples, leaves, sorted_leaves
+
+    tree, stat = measure(OrderedMerkleTree, data)
+    stages.append(("OrderedMerkleTree", stat))
+    _, stat = measure(tree.get_proofs)
+    stages.append(("get_proofs", stat))
+    _, stat = measure(export_proofs, tree)
+    stages.append(("json export", stat))
+    return stages
+
+
+def bench(size):
+    # tracing slows every allocation down, the stages are timed with it off
+    # and the peak memory is measured in a second pass
+    data = synthetic_claims(size)
+    times = run_stages(data, timed)
+    tracemalloc.start()
+    try:
+        peaks = run_stages(data, traced)
+    finally:
+        tracemalloc.stop()
+    return [
+        [size, stage, f"{t:.3f}", f"{peak:.1f}"]
+        for (stage, t), (_, peak) in zip(times, peaks)
+    ]
+
+
+def main(sizes=None):
+    sizes = sizes or SIZES
+    report = []
+    for size in sizes:
+        report += bench(size)
+    print(tabulate(report, headers=["Claims", "Stage", "Time (s)", "Peak (MiB)"]))
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]])
@@ -1,25 +1,61 @@
+from multiprocessing import cpu_count
+
 from tabulate import tabulate
 
-from tests.utils.cvxfxs import eth_to_fxs
+from tests.utils.cvxfxs import FxsSnapshot, eth_to_fxs
+from tests.utils.routes import quote_grid, best_options, optimal_split
 
 REDC = "\033[93m"
 ENDC = "\033[0m"
 
-def main():
-    amounts = [1e17, 1e18, 1e19, 1e20]
-    options = [0,1,2,3]
-    headers = ["Route", "Amount In", "Amount Out"]
+# FXSSwapper.SwapOption
+SWAP_OPTIONS = ["Curve", "Uniswap", "Unistables", "UniCurve1"]
+
+# 0.1 to 1000 ETH, 10 sizes per decade
+GRID = [int(10 ** (17 + i / 10)) for i in range(41)]
+
+
+def main(target=10):
+    # target: size of the trade the recommendation is made for, in ETH
+    target = int(float(target) * 1e18)
+    options = list(range(len(SWAP_OPTIONS)))
+    snapshot = FxsSnapshot()
+
+    grid = quote_grid(
+        eth_to_fxs, options, GRID, processes=cpu_count(), snapshot=snapshot
+    )
+    headers = ["Amount In"] + SWAP_OPTIONS
     report = []
-    for amount in amounts:
-        amounts_out = []
+    for i, (amount, best, _) in enumerate(best_options(grid, GRID)):
+        row = [amount * 1e-18]
         for option in options:
-            amounts_out.append(int(eth_to_fxs(amount, option))  * 1e-18)
-        for i, option in enumerate(options):
-            out = REDC + str(amounts_out[i]) + ENDC if amounts_out[i] == max(amounts_out) else str(amounts_out[i])
-            report.append([
-                option,
-                int(amount) * 1e-18,
-                out
-            ])
-
+            out = grid[option][i] * 1e-18
+            row.append(REDC + str(out) + ENDC if option == best else str(out))
+        report.append(row)
     print(tabulate(report, headers=headers))
+
+    outputs = {option: eth_to_fxs(target, option, snapshot) for option in options}
+    best = max(options, key=lambda o: outputs[o])
+    allocation, split_output = optimal_split(
+        lambda amount, option: eth_to_fxs(amount, option, snapshot), options, target
+    )
+    print(f"\nSplit of {target * 1e-18} ETH across routes:")
+    print(
+        tabulate(
+            [
+                [SWAP_OPTIONS[o], allocation[o] * 1e-18]
+                for o in options
+                if allocation[o] > 0
+            ],
+            headers=["Route", "Amount In"],
+        )
+    )
+    gain = (split_output - outputs[best]) * 10000 / outputs[best]
+    print(
+        f"Split output: {split_output * 1e-18} FXS "
+        f"({gain:.2f} bps over the best single route)"
+    )
+
+    print(f"\nRecommended: updateOption({best}) # SwapOption.{SWAP_OPTIONS[best]}")
+    print(f"Expected output: {outputs[best] * 1e-18} FXS for {target * 1e-18} ETH")
+    return best, outputs[best]
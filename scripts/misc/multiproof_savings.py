@@ -0,0 +1,36 @@
+import random
+
+from tabulate import tabulate
+from web3 import Web3
+
+from tests.utils.airdrop.prisma import PRISMA_CLAIMS
+from scripts.airdrop.merkle import OrderedMerkleTree
+
+BATCH_SIZES = [2, 5, 10, 25, 50, 100, 250]
+
+
+def main():
+    data = [
+        {"user": Web3.toChecksumAddress(k), "amount": v}
+        for k, v in PRISMA_CLAIMS.items()
+    ]
+    tree = OrderedMerkleTree(data)
+    rng = random.Random(0)
+    headers = ["Claims", "Individual (bytes)", "Multiproof (bytes)", "Saved"]
+    report = []
+    for size in BATCH_SIZES:
+        claimers = [x["user"] for x in rng.sample(data, size)]
+        savings = tree.get_multiproof_savings(claimers)
+        report.append(
+            [
+                size,
+                savings["individual"],
+                savings["multiproof"],
+                f"{savings['saved']} ({savings['saved'] / savings['individual']:.0%})",
+            ]
+        )
+    print(tabulate(report, headers=headers))
+
+
+if __name__ == "__main__":
+    main()
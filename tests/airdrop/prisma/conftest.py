@@ -4,7 +4,7 @@ from web3 import Web3
 
 from ...utils.airdrop.prisma import PRISMA_CLAIMS
 from ...utils.constants import PRISMA, PRISMA_LOCKER
-from ...utils.merkle import OrderedMerkleTree
+from scripts.airdrop.merkle import OrderedMerkleTree
 
 
 @pytest.fixture(scope="session")
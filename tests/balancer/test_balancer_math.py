@@ -0,0 +1,146 @@
+import math
+
+from ..utils.balancer import (
+    LinearPool,
+    LocalVault,
+    StablePool,
+    WeightedPool,
+    linear_from_nominal,
+    linear_to_nominal,
+    log_exp_pow,
+    pow_up,
+    stable_invariant,
+    weighted_out_given_in,
+)
+
+ONE = 10**18
+USDC = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+WETH = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+BAL = "0xba100000625a3754423978a60c9317c58a424e3D"
+BPT = "0x5c6Ee304399DBdB9C8Ef030aB642B10820DB8F56"
+WRAPPED = "0xd093fA4Fb80D09bB30817FDcd442d4d02eD3E5de"
+POOL_A = "0x" + "aa" * 32
+POOL_B = "0x" + "bb" * 32
+
+
+def test_log_exp_pow():
+    for x, y in [(2 * ONE, ONE // 2), (ONE // 3, 4 * ONE), (10**17, 25 * 10**16)]:
+        expected = (x / ONE) ** (y / ONE)
+        assert abs(log_exp_pow(x, y) / ONE - expected) < expected * 1e-14
+    # close to one, the 36 decimals logarithm is used
+    x = ONE + 10**15
+    assert abs(log_exp_pow(x, 3 * ONE) / ONE - 1.001**3) < 1e-15
+    x = ONE - 10**15
+    assert abs(log_exp_pow(x, ONE // 4) / ONE - 0.999**0.25) < 1e-15
+
+
+def test_weighted_out_given_in():
+    balance_in, balance_out = 1000 * ONE, 500 * ONE
+    for weight_in, weight_out in [(ONE // 2, ONE // 2), (8 * ONE // 10, 2 * ONE // 10)]:
+        amount_in = 10 * ONE
+        out = weighted_out_given_in(
+            balance_in, weight_in, balance_out, weight_out, amount_in
+        )
+        ratio = (balance_in / (balance_in + amount_in)) ** (weight_in / weight_out)
+        expected = balance_out * (1 - ratio)
+        # rounded in favour of the pool
+        assert out <= expected
+        assert out > expected * (1 - 1e-12)
+
+
+def test_legacy_pow_up():
+    # WeightedPool2Tokens has no shortcut for the 4.0 exponent of a 80/20 pool
+    x = 99 * ONE // 100
+    raw = log_exp_pow(x, 4 * ONE)
+    assert pow_up(x, 4 * ONE, legacy=True) == raw + raw // 10**14 + 2
+    assert pow_up(x, 4 * ONE) == 960596010000000000
+    assert pow_up(x, ONE, legacy=True) > x
+    out = weighted_out_given_in(1000 * ONE, 8 * ONE // 10, 500 * ONE, ONE // 5, ONE)
+    legacy = weighted_out_given_in(
+        1000 * ONE, 8 * ONE // 10, 500 * ONE, ONE // 5, ONE, legacy=True
+    )
+    assert legacy < out
+
+
+def test_stable_invariant():
+    assert stable_invariant(200 * 1000, [10**24, 10**24]) == 2 * 10**24
+    # A n S + D = A n D + D ** 3 / (4 x y), solved in floating point
+    unbalanced = stable_invariant(200 * 1000, [10**24, 3 * 10**23])
+    assert abs(unbalanced - 1.2986835167360686e24) < 1e24 * 1e-14
+
+
+def test_stable_pool_swap():
+    pool = StablePool([BAL, WETH], [10**24, 10**24], [ONE, ONE], 200000, 10**15)
+    out = pool.swap(BAL.lower(), WETH.lower(), 1000 * ONE)
+    # close to parity minus the 0.1% fee
+    assert 998 * ONE < out < 999 * ONE
+    assert pool.balances == [10**24 + 1000 * ONE, 10**24 - out]
+
+
+def test_composable_join_exit():
+    tokens = [USDC, BPT, WETH]
+    balances = [10**12, 2**111, 10**24]
+    pool = StablePool(
+        tokens, balances, [10**30, ONE, ONE], 200000, 10**14, 1, 2 * 10**24
+    )
+    bpt_out = pool.swap(USDC.lower(), BPT.lower(), 10**9)
+    assert 999 * ONE < bpt_out < 1000 * ONE
+    usdc_out = pool.swap(BPT.lower(), USDC.lower(), bpt_out)
+    # the round trip only loses fees
+    assert 999 * 10**6 < usdc_out < 10**9
+    assert pool.bpt_supply == 2 * 10**24
+
+
+def test_linear_nominal():
+    fee, lower, upper = 10**14, 10**24, 2 * 10**24
+    for real in [5 * 10**23, 15 * 10**23, 3 * 10**24]:
+        nominal = linear_to_nominal(real, fee, lower, upper)
+        assert abs(linear_from_nominal(nominal, fee, lower, upper) - real) <= 1
+    assert linear_to_nominal(15 * 10**23, fee, lower, upper) == 15 * 10**23
+
+
+def test_linear_pool_swap():
+    pool = LinearPool(
+        [USDC, BPT, WRAPPED],
+        [1_500_000 * 10**6, 2**111, 1_000_000 * 10**6],
+        [10**30, ONE, 11 * 10**29],
+        0,
+        2,
+        1,
+        1_000_000 * 10**6,
+        2_000_000 * 10**6,
+        10**14,
+        2_600_000 * ONE,
+    )
+    # inside the targets, BPT is redeemed at the invariant / supply rate
+    out = pool.swap(BPT.lower(), USDC.lower(), 1000 * ONE)
+    assert out == 1000 * 10**6
+
+
+def test_local_vault_multihop():
+    weighted = WeightedPool(
+        [BAL, WETH],
+        [10**24, 250 * ONE],
+        [ONE, ONE],
+        [8 * ONE // 10, 2 * ONE // 10],
+        10**16,
+    )
+    stable = StablePool([WETH, BPT], [10**21, 10**21], [ONE, ONE], 50000, 10**15)
+    vault = LocalVault({POOL_A: weighted, POOL_B: stable})
+    swaps = [(POOL_A, 0, 1, 1000 * ONE, b""), (POOL_B, 1, 2, 0, b"")]
+    deltas = vault.query_batch_swap(0, swaps, [BAL, WETH, BPT])
+
+    eth = WeightedPool(
+        [BAL, WETH],
+        [10**24, 250 * ONE],
+        [ONE, ONE],
+        [8 * ONE // 10, 2 * ONE // 10],
+        10**16,
+    ).swap(BAL.lower(), WETH.lower(), 1000 * ONE)
+    assert deltas[0] == 1000 * ONE
+    assert deltas[1] == 0
+    assert deltas[2] < 0
+    assert -deltas[2] < eth
+    # the snapshot is not modified by quoting
+    assert weighted.balances == [10**24, 250 * ONE]
+    assert vault.query_batch_swap(0, swaps, [BAL, WETH, BPT]) == deltas
@@ -0,0 +1,34 @@
+import pytest
+
+from tests.utils.aurabal import (
+    calc_harvest_amount_aura,
+    get_aura_to_eth_amount,
+    get_aurabal_to_lptoken_amount,
+    get_bbusd_to_eth_amount,
+    get_blp_to_aurabal,
+    get_local_balancer,
+)
+
+# one route per pool of BALANCER_POOLS, the local quotes have to match
+# IBalancerVault.queryBatchSwap to the wei
+ROUTES = [
+    get_aurabal_to_lptoken_amount,
+    get_blp_to_aurabal,
+    get_aura_to_eth_amount,
+    get_bbusd_to_eth_amount,
+]
+
+
+@pytest.mark.parametrize("route", ROUTES)
+@pytest.mark.parametrize("amount", [10**15, 10**18, 10**21])
+def test_local_balancer_matches_query_batch_swap(route, amount):
+    balancer = get_local_balancer()
+    assert route(amount, balancer) == route(amount)
+
+
+@pytest.mark.parametrize("lock", [False, True])
+def test_local_balancer_harvest_estimate(strategy, lock):
+    balancer = get_local_balancer()
+    assert calc_harvest_amount_aura(
+        strategy, lock, balancer
+    ) == calc_harvest_amount_aura(strategy, lock)
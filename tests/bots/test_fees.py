@@ -0,0 +1,68 @@
+from scripts.bots.fees import FeeHistory, next_base_fee
+
+GWEI = 10**9
+
+
+def history(oldest, base_fees, ratios, rewards):
+    return {
+        "oldestBlock": hex(oldest),
+        "baseFeePerGas": [hex(fee) for fee in base_fees],
+        "gasUsedRatio": ratios,
+        "reward": [[hex(r) for r in reward] for reward in rewards],
+    }
+
+
+def test_next_base_fee():
+    assert next_base_fee(8 * GWEI, 0.5) == 8 * GWEI
+    assert next_base_fee(8 * GWEI, 1) == 9 * GWEI
+    assert next_base_fee(8 * GWEI, 0) == 7 * GWEI
+
+
+def test_rolling_window():
+    fees = FeeHistory(window=3, percentiles=[50])
+    assert fees.query(100) == ("eth_feeHistory", ["0x3", hex(100), [50]])
+    fees.update(
+        history(
+            98,
+            [10 * GWEI, 10 * GWEI, 11 * GWEI, 12 * GWEI],
+            [0.5, 0.9, 0.9],
+            [[GWEI], [2 * GWEI], [3 * GWEI]],
+        )
+    )
+    assert fees.last_block == 100
+    assert fees.pending_base_fee == 12 * GWEI
+    assert fees.priority_fee(50) == 2 * GWEI
+    # only the blocks not seen yet are requested
+    assert fees.query(102)[1][0] == "0x2"
+    # overlapping results are merged, the oldest blocks dropped
+    fees.update(
+        history(
+            100,
+            [12 * GWEI, 11 * GWEI, 11 * GWEI, 10 * GWEI],
+            [0.9, 0.1, 0.1],
+            [[3 * GWEI], [0], [5 * GWEI]],
+        )
+    )
+    assert [block[0] for block in fees.blocks] == [100, 101, 102]
+    assert fees.pending_base_fee == 10 * GWEI
+    assert fees.priority_fee(50) == 3 * GWEI
+
+
+def test_predictions():
+    fees = FeeHistory(window=2, percentiles=[10, 90])
+    fees.update(
+        history(
+            10,
+            [8 * GWEI] * 3,
+            [1.0, 1.0],
+            [[GWEI, 3 * GWEI], [GWEI, 5 * GWEI]],
+        )
+    )
+    predicted = fees.predict_base_fees(3)
+    assert predicted == [8 * GWEI, 9 * GWEI, next_base_fee(9 * GWEI, 1.0)]
+    assert fees.max_base_fee(3) == predicted[-1]
+    assert fees.gas_price(3, 10) == predicted[-1] + GWEI
+    assert fees.fees(3, 90) == {
+        "maxFeePerGas": predicted[-1] + 5 * GWEI,
+        "maxPriorityFeePerGas": 5 * GWEI,
+    }
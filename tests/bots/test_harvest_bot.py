@@ -0,0 +1,150 @@
+import asyncio
+import json
+
+import eth_abi
+from eth_account import Account
+
+from scripts.bots.bot import (
+    HarvestBot,
+    RpcError,
+    decide,
+    latest_heads,
+    QUERY_AMOUNT,
+)
+
+KEY = "0x" + "11" * 32
+
+
+class FakeClient(object):
+    # replies to the bot's batched calls with canned values
+    def __init__(self, ratio, received, gas_used=300000, gas_price=10**10):
+        self.ratio = ratio
+        self.received = received
+        self.gas_used = gas_used
+        self.gas_price = gas_price
+        self.batches = []
+        self.sent = []
+        self.block = 100
+
+    def fee_history(self, params):
+        # flat base fee at gas_price, no priority fees
+        count, newest = int(params[0], 16), int(params[1], 16)
+        return {
+            "oldestBlock": hex(newest - count + 1),
+            "baseFeePerGas": [hex(self.gas_price)] * (count + 1),
+            "gasUsedRatio": [0.5] * count,
+            "reward": [["0x0"] * len(params[2])] * count,
+        }
+
+    def _encode(self, types, values):
+        return "0x" + eth_abi.encode_abi(types, values).hex()
+
+    async def batch(self, calls):
+        self.batches.append(calls)
+        results = [
+            self._encode(["int256[]"], [[QUERY_AMOUNT, -self.ratio]]),
+            self.fee_history(calls[1][1]),
+        ]
+        for lock in (False, True):
+            received = self.received[lock]
+            if received is None:
+                results += [RpcError("revert"), RpcError("revert")]
+            else:
+                results.append(hex(self.gas_used))
+                results.append(self._encode(["uint256"], [received]))
+        return results
+
+    async def request(self, method, params):
+        if method == "eth_getTransactionCount":
+            return "0x5"
+        if method == "eth_blockNumber":
+            return hex(self.block)
+        if method == "eth_feeHistory":
+            return self.fee_history(params)
+        if method == "eth_sendRawTransaction":
+            self.sent.append(params[0])
+            return "0x" + "ab" * 32
+        return {"status": "0x1", "blockNumber": hex(self.block)}
+
+
+def run_block(client, block=100):
+    async def run():
+        bot = HarvestBot(client, Account.from_key(KEY), 1)
+        await bot.on_block(block)
+        if bot.pending is not None:
+            await bot.pending
+        return bot
+
+    return asyncio.run(run())
+
+
+def test_decide():
+    simulations = {False: (300000, 10**17), True: (350000, 2 * 10**17)}
+    lock, received, gas_used, cost, harvest = decide(
+        QUERY_AMOUNT + 1, 10**10, simulations
+    )
+    assert lock and received == 2 * 10**17 and gas_used == 350000
+    assert cost == 350000 * 10**10 and harvest
+    lock, received, _, _, harvest = decide(QUERY_AMOUNT, 10**12, simulations)
+    assert not lock and not harvest
+    failed = {False: (RpcError("revert"), RpcError("revert")), True: simulations[True]}
+    assert not decide(QUERY_AMOUNT, 10**10, failed)[-1]
+
+
+def test_single_batch_per_block():
+    client = FakeClient(QUERY_AMOUNT * 2, {False: 10**17, True: 10**17})
+    bot = run_block(client)
+    assert len(client.batches) == 1
+    methods = [method for method, _ in client.batches[0]]
+    assert (
+        methods == ["eth_call", "eth_feeHistory"] + ["eth_estimateGas", "eth_call"] * 2
+    )
+    # all the calls are pinned to the same block
+    assert client.batches[0][1][1][1] == hex(100)
+    calls = client.batches[0][:1] + client.batches[0][2:]
+    assert all(params[-1] == hex(100) for _, params in calls)
+    assert len(client.sent) == 1
+    assert bot.fees.last_block == 100
+    # type 2 transaction
+    assert client.sent[0].startswith("0x02")
+
+
+def test_no_harvest_when_unprofitable():
+    client = FakeClient(QUERY_AMOUNT // 2, {False: 10**15, True: None})
+    run_block(client)
+    assert client.sent == []
+
+
+class FakeSocket(object):
+    # newHeads notifications pushed by the test, None closes the connection
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    def push(self, *blocks):
+        for block in blocks:
+            message = None
+            if block is not None:
+                message = json.dumps({"params": {"result": {"number": hex(block)}}})
+            self.queue.put_nowait(message)
+
+    async def __aiter__(self):
+        while True:
+            message = await self.queue.get()
+            if message is None:
+                return
+            yield message
+
+
+def test_latest_heads_skips_queued_heads():
+    async def run():
+        ws = FakeSocket()
+        heads = latest_heads(ws)
+        ws.push(1, 2, 3)
+        seen = [await heads.__anext__()]
+        # received while block 3 is processed
+        ws.push(4, 5, None)
+        await asyncio.sleep(0)
+        seen += [block async for block in heads]
+        return seen
+
+    assert asyncio.run(run()) == [3, 5]
@@ -0,0 +1,228 @@
+import asyncio
+
+from eth_account import Account
+
+from scripts.bots.fees import FeeHistory
+from scripts.bots.txs import (
+    NonceManager,
+    RpcError,
+    TransactionReverted,
+    TxPipeline,
+    BUMP_NUM,
+    BUMP_DEN,
+)
+
+KEY = "0x" + "22" * 32
+GWEI = 10**9
+
+
+class RecordingAccount(object):
+    def __init__(self):
+        self.account = Account.from_key(KEY)
+        self.address = self.account.address
+        self.signed = []
+
+    def sign_transaction(self, tx):
+        self.signed.append(dict(tx))
+        return self.account.sign_transaction(tx)
+
+
+class FakeNode(object):
+    # one block per eth_blockNumber, sent txs paying at least min_fee are
+    # mined in the next block with status
+    def __init__(self, account, min_fee=0, status="0x1"):
+        self.account = account
+        self.min_fee = min_fee
+        self.status = status
+        self.block = 100
+        self.mined = {}
+        self.counts = 0
+
+    async def request(self, method, params):
+        if method == "eth_getTransactionCount":
+            self.counts += 1
+            return "0x7"
+        if method == "eth_blockNumber":
+            self.block += 1
+            return hex(self.block)
+        if method == "eth_feeHistory":
+            count, newest = int(params[0], 16), int(params[1], 16)
+            return {
+                "oldestBlock": hex(newest - count + 1),
+                "baseFeePerGas": [hex(10 * GWEI)] * (count + 1),
+                "gasUsedRatio": [0.5] * count,
+                "reward": [[hex(GWEI)] * len(params[2])] * count,
+            }
+        if method == "eth_sendRawTransaction":
+            tx_hash = "0x%064x" % len(self.account.signed)
+            if self.account.signed[-1]["maxFeePerGas"] >= self.min_fee:
+                self.mined[tx_hash] = self.block + 1
+            return tx_hash
+        if method == "eth_getTransactionReceipt":
+            mined = self.mined.get(params[0])
+            if mined is None or mined > self.block:
+                return None
+            return {
+                "status": self.status,
+                "transactionHash": params[0],
+                "blockNumber": hex(mined),
+            }
+
+
+def pipeline(node, account, **kwargs):
+    return TxPipeline(node, account, 1, FeeHistory(), poll_interval=0, **kwargs)
+
+
+def tx(i):
+    return {"to": "0x" + "33" * 20, "data": hex(i), "gas": 50000}
+
+
+def test_submit_all_without_waiting():
+    account = RecordingAccount()
+    node = FakeNode(account)
+
+    async def run():
+        txs = pipeline(node, account)
+        return await txs.submit_all([tx(i) for i in range(3)])
+
+    receipts = asyncio.run(run())
+    assert [t["nonce"] for t in account.signed] == [7, 8, 9]
+    # nonces are tracked locally
+    assert node.counts == 1
+    assert [r["transactionHash"] for r in receipts] == [
+        "0x%064x" % i for i in (1, 2, 3)
+    ]
+    assert all(t["maxPriorityFeePerGas"] == GWEI for t in account.signed)
+
+
+def test_speed_up_stuck_transaction():
+    account = RecordingAccount()
+    node = FakeNode(account, min_fee=2**256)
+
+    async def run():
+        txs = pipeline(node, account, speed_up_after=2)
+        pending = await txs.submit(tx(0))
+        # only a bumped version gets mined
+        node.min_fee = pending.tx["maxFeePerGas"] + 1
+        return pending, await pending.confirmed
+
+    pending, receipt = asyncio.run(run())
+    first, replacement = account.signed[0], account.signed[-1]
+    assert len(pending.hashes) == 2
+    assert replacement["nonce"] == first["nonce"]
+    assert replacement["data"] == first["data"]
+    for field in ("maxFeePerGas", "maxPriorityFeePerGas"):
+        assert replacement[field] >= first[field] * BUMP_NUM // BUMP_DEN
+    assert receipt["transactionHash"] == pending.hashes[-1]
+
+
+def test_failed_send_releases_nonce():
+    account = RecordingAccount()
+    node = FakeNode(account)
+    send = node.request
+
+    async def failing(method, params):
+        if method == "eth_sendRawTransaction" and len(account.signed) == 1:
+            raise RpcError("nonce too low")
+        return await send(method, params)
+
+    node.request = failing
+
+    async def run():
+        txs = pipeline(node, account)
+        try:
+            await txs.submit(tx(0))
+        except RpcError:
+            pass
+        return await (await txs.submit(tx(1))).confirmed
+
+    asyncio.run(run())
+    # no other nonce was taken, the failed one is reused without a fetch
+    assert node.counts == 1
+    assert [t["nonce"] for t in account.signed] == [7, 7]
+
+
+def test_timed_out_send_resyncs_nonce():
+    account = RecordingAccount()
+    node = FakeNode(account)
+    send = node.request
+
+    async def timing_out(method, params):
+        if method == "eth_sendRawTransaction" and len(account.signed) == 1:
+            # the node may still have received the transaction
+            raise asyncio.TimeoutError()
+        return await send(method, params)
+
+    node.request = timing_out
+
+    async def run():
+        txs = pipeline(node, account)
+        try:
+            await txs.submit(tx(0))
+        except asyncio.TimeoutError:
+            pass
+        return await (await txs.submit(tx(1))).confirmed
+
+    asyncio.run(run())
+    # the nonce is not handed out again blindly, the count is fetched again
+    assert node.counts == 2
+
+
+def test_rejected_replacement_keeps_sent_version():
+    account = RecordingAccount()
+    node = FakeNode(account, min_fee=2**256)
+    send = node.request
+
+    async def rejecting(method, params):
+        if method == "eth_sendRawTransaction" and len(account.signed) > 1:
+            raise RpcError("replacement transaction underpriced")
+        return await send(method, params)
+
+    node.request = rejecting
+
+    async def run():
+        txs = pipeline(node, account, speed_up_after=2**32)
+        pending = await txs.submit(tx(0))
+        sent = dict(pending.tx)
+        try:
+            await txs.speed_up(pending)
+        except RpcError:
+            pass
+        return pending, sent
+
+    pending, sent = asyncio.run(run())
+    assert pending.tx == sent
+    assert len(pending.hashes) == 1
+
+
+def test_release_after_later_nonce_resyncs():
+    account = RecordingAccount()
+    node = FakeNode(account)
+
+    async def run():
+        nonces = NonceManager(node, account.address)
+        taken = [await nonces.take(), await nonces.take()]
+        # 8 may already be in flight, 7 can't simply be handed out again
+        await nonces.release(taken[0])
+        return taken, await nonces.take()
+
+    taken, nonce = asyncio.run(run())
+    assert taken == [7, 8]
+    assert node.counts == 2
+    assert nonce == 7
+
+
+def test_reverted_transaction_fails():
+    account = RecordingAccount()
+    node = FakeNode(account, status="0x0")
+
+    async def run():
+        txs = pipeline(node, account)
+        pending = await txs.submit(tx(0))
+        try:
+            await pending.confirmed
+        except TransactionReverted as e:
+            return e.args[0]
+
+    receipt = asyncio.run(run())
+    assert receipt["status"] == "0x0"
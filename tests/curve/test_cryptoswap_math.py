@@ -0,0 +1,139 @@
+from ..utils.cryptoswap import (
+    CryptoSwapPool,
+    cbrt,
+    get_y_ng,
+    newton_D,
+    newton_y,
+    reduction_coefficient_ng,
+)
+
+# parameters in the range of the CVX/ETH and tricrypto pools
+A_2 = 400000
+A_3 = 1707629
+GAMMA = 11809167828997
+
+
+def two_coin_pool(balances=(1000 * 10**18, 800 * 10**18), price=2 * 10**18):
+    xp = [balances[0], balances[1] * price // 10**18]
+    return CryptoSwapPool(
+        balances,
+        [1, 1],
+        [price],
+        A_2,
+        GAMMA,
+        newton_D(A_2, GAMMA, xp),
+        26000000,
+        45000000,
+        230000000000000,
+    )
+
+
+def three_coin_pool():
+    # usdt (6 decimals), wbtc (8 decimals), weth
+    balances = [30_000_000 * 10**6, 1000 * 10**8, 15_000 * 10**18]
+    precisions = [10**12, 10**10, 1]
+    price_scale = [30_000 * 10**18, 2_000 * 10**18]
+    pool = CryptoSwapPool(
+        balances,
+        precisions,
+        price_scale,
+        A_3,
+        GAMMA,
+        1,
+        3000000,
+        30000000,
+        500000000000000,
+    )
+    pool.D = newton_D(A_3, GAMMA, pool.xp(balances))
+    return pool
+
+
+def test_newton_y_solves_invariant():
+    for pool in (two_coin_pool(), three_coin_pool()):
+        xp = pool.xp(pool.balances)
+        n = len(xp)
+        for i in range(n):
+            for j in range(n):
+                if i == j:
+                    continue
+                moved = list(xp)
+                moved[i] = moved[i] * 11 // 10
+                moved[j] = newton_y(pool.A, pool.gamma, moved, pool.D, j)
+                D = newton_D(pool.A, pool.gamma, moved)
+                assert abs(D - pool.D) * 10**10 < pool.D
+
+
+def test_get_dy_balanced_pool():
+    pool = two_coin_pool((1000 * 10**18, 500 * 10**18))
+    dx = 10**18
+    dy = pool.get_dy(0, 1, dx)
+    # half a token per unit at the peg, minus mid fee and a little slippage
+    assert dy < dx // 2
+    assert dy > (dx // 2) * (10**10 - pool.mid_fee) // 10**10 * 9999 // 10000
+    dx_back = pool.get_dy(1, 0, dy)
+    assert dx_back < dx
+
+
+def test_get_dy_decimals():
+    pool = three_coin_pool()
+    # 1 WETH is around 2000 USDT and 0.0667 WBTC
+    assert 1990 * 10**6 < pool.get_dy(2, 0, 10**18) < 2000 * 10**6
+    assert 6600000 < pool.get_dy(2, 1, 10**18) < 6667000
+    assert 0.99 * 10**18 < pool.get_dy(0, 2, 2000 * 10**6) < 10**18
+
+
+def test_get_dy_curve():
+    pool = two_coin_pool()
+    amounts = [0] + [10**k for k in range(15, 23)]
+    quotes = pool.get_dy_curve(1, 0, amounts)
+    assert quotes == [pool.get_dy(1, 0, dx) if dx else 0 for dx in amounts]
+    # each additional unit gets a worse price
+    rates = [q * 10**18 // dx for q, dx in zip(quotes[1:], amounts[1:])]
+    assert rates == sorted(rates, reverse=True)
+    # the snapshot is not modified by quoting
+    assert pool.balances == [1000 * 10**18, 800 * 10**18]
+
+
+def test_exchange_moves_the_pool():
+    for pool in (two_coin_pool(), three_coin_pool()):
+        dx = pool.balances[0] // 100
+        quoted = pool.get_dy(0, 1, dx)
+        balances = list(pool.balances)
+        assert pool.exchange(0, 1, dx) == quoted
+        assert pool.balances[0] == balances[0] + dx
+        assert pool.balances[1] == balances[1] - quoted
+        # the same swap again gets a worse price
+        assert pool.get_dy(0, 1, dx) < quoted
+
+
+def test_cbrt():
+    assert cbrt(27 * 10**18) == 3 * 10**18
+    assert cbrt(8) == 2 * 10**12
+    assert cbrt(10**60) == 10**32
+
+
+def test_get_y_ng_solves_invariant():
+    pool = three_coin_pool()
+    xp = pool.xp(pool.balances)
+    for i, j in [(0, 1), (1, 2), (2, 0)]:
+        moved = list(xp)
+        moved[i] = moved[i] * 3 // 2
+        y = get_y_ng(pool.A, pool.gamma, moved, pool.D, j)
+        # same root as newton_y, within its convergence limit
+        assert abs(y - newton_y(pool.A, pool.gamma, moved, pool.D, j)) < y // 10**14
+        moved[j] = y
+        assert abs(newton_D(pool.A, pool.gamma, moved) - pool.D) * 10**15 < pool.D
+
+
+def test_ng_fee():
+    pool = three_coin_pool()
+    pool.ng = True
+    xp = pool.xp(pool.balances)
+    # 27 * prod(x) / sum(x) ** 3 is 1 for a balanced pool
+    assert reduction_coefficient_ng([10**24] * 3, pool.fee_gamma) == 10**18
+    assert pool.fee([10**24] * 3) == pool.mid_fee
+    assert pool.mid_fee < pool.fee([2 * 10**24, 10**24, 10**24]) < pool.out_fee
+    # same quote as tricrypto2 to a few wei for a balanced pool
+    assert (
+        abs(pool.get_dy(2, 0, 10**18) - three_coin_pool().get_dy(2, 0, 10**18)) < 3
+    )
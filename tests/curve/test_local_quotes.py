@@ -0,0 +1,66 @@
+import pytest
+from brownie import interface
+
+from ..utils.constants import (
+    CURVE_CVX_ETH_POOL,
+    CURVE_CVXCRV_CRV_POOL_V2,
+    CURVE_FRAX_USDC_POOL,
+    CURVE_TRICRV_POOL,
+    REUSD_POOL,
+)
+from ..utils.cryptoswap import CryptoSwapPool
+from ..utils.multicall import Multicall
+from ..utils.stableswap import StableSwapNGPool
+
+# local quotes against the pools' own get_dy on the fork, to the wei
+
+
+def snapshot_plain(address, rates):
+    calls = Multicall()
+    load = StableSwapNGPool.add_plain_snapshot(calls, address, rates)
+    return load(calls.execute())
+
+
+@pytest.mark.parametrize(
+    "address,rates",
+    [
+        (CURVE_FRAX_USDC_POOL, [10**18, 10**30]),
+        (CURVE_CVXCRV_CRV_POOL_V2, [10**18, 10**18]),
+    ],
+)
+def test_plain_pool_get_dy(address, rates):
+    pool = snapshot_plain(address, rates)
+    contract = interface.ICurvePool(address)
+    for i, j in [(0, 1), (1, 0)]:
+        unit = 10**36 // rates[i]
+        for dx in [unit, 1_000 * unit, 1_000_000 * unit]:
+            assert pool.get_dy(i, j, dx) == contract.get_dy(i, j, dx)
+
+
+def test_ng_pool_get_dy():
+    pool = StableSwapNGPool.from_chain(REUSD_POOL)
+    contract = interface.ICurveStableSwapNG(REUSD_POOL)
+    for i, j in [(0, 1), (1, 0)]:
+        for dx in [10**18, 10**21, 10**24]:
+            assert pool.get_dy(i, j, dx) == contract.get_dy(i, j, dx)
+
+
+def test_tricrypto_ng_get_dy():
+    pool = CryptoSwapPool.from_chain(CURVE_TRICRV_POOL, 3, ng=True)
+    contract = interface.ICurveTriCryptoFactoryNG(CURVE_TRICRV_POOL)
+    # crvUSD, ETH, CRV
+    units = [10**18, 10**15, 10**18]
+    for i in range(3):
+        for j in range(3):
+            if i != j:
+                for scale in [1, 1_000, 1_000_000]:
+                    dx = units[i] * scale
+                    assert pool.get_dy(i, j, dx) == contract.get_dy(i, j, dx)
+
+
+def test_two_coin_get_dy():
+    pool = CryptoSwapPool.from_chain(CURVE_CVX_ETH_POOL)
+    contract = interface.ICurveV2Pool(CURVE_CVX_ETH_POOL)
+    for i, j in [(0, 1), (1, 0)]:
+        for dx in [10**16, 10**19, 10**21]:
+            assert pool.get_dy(i, j, dx) == contract.get_dy(i, j, dx)
@@ -0,0 +1,89 @@
+from ..utils.erc4626 import ERC4626Snapshot
+from ..utils.stableswap import StableSwapNGPool, dynamic_fee, get_D, get_y
+
+# reUSD / scrvUSD style pool, the second coin has an ERC4626 rate
+AMP = 200 * 100
+FEE = 1000000
+OFFPEG_MULTIPLIER = 50000000000
+
+
+def ng_pool(
+    balances=(5_000_000 * 10**18, 4_500_000 * 10**18), rate=1.05 * 10**18
+):
+    return StableSwapNGPool(
+        balances, [10**18, int(rate)], AMP, FEE, OFFPEG_MULTIPLIER
+    )
+
+
+def test_get_y_solves_invariant():
+    pool = ng_pool()
+    xp = pool.xp(pool.balances)
+    assert abs(get_y(0, 1, xp[0], xp, AMP, pool.D) - xp[1]) <= 2
+    assert abs(get_y(1, 0, xp[1], xp, AMP, pool.D) - xp[0]) <= 2
+    moved = [xp[0] + 10**22, get_y(0, 1, xp[0] + 10**22, xp, AMP, pool.D)]
+    assert abs(get_D(moved, AMP) - pool.D) <= 2
+
+
+def test_dynamic_fee():
+    assert dynamic_fee(10**24, 10**24, FEE, OFFPEG_MULTIPLIER) == FEE
+    assert dynamic_fee(10**24, 10**24, FEE, 10**10) == FEE
+    off_peg = dynamic_fee(10**24, 5 * 10**23, FEE, OFFPEG_MULTIPLIER)
+    assert FEE < off_peg <= FEE * OFFPEG_MULTIPLIER // 10**10
+
+
+def test_get_dy_rates():
+    pool = ng_pool()
+    dx = 1000 * 10**18
+    # the pool is close to balanced in value so 1 reUSD buys about 1 / 1.05 shares
+    dy = pool.get_dy(0, 1, dx)
+    assert dx * 10**18 // int(1.05 * 10**18) * 999 // 1000 < dy
+    assert dy < dx * 10**18 // int(1.05 * 10**18)
+    assert pool.get_dy(1, 0, dy) < dx
+    quotes = pool.get_dy_curve(0, 1, [0, 10**18, dx])
+    assert quotes == [0, pool.get_dy(0, 1, 10**18), dy]
+
+
+def test_erc4626_snapshot():
+    vault = ERC4626Snapshot(1_050 * 10**18, 1_000 * 10**18)
+    assert vault.convert_to_shares(105 * 10**18) == 100 * 10**18
+    assert vault.convert_to_assets(100 * 10**18) == 105 * 10**18
+    # conversions round down
+    assert (
+        vault.convert_to_assets(vault.convert_to_shares(10**18 + 1)) <= 10**18 + 1
+    )
+    assert ERC4626Snapshot(0, 0).convert_to_shares(10**18) == 10**18
+
+
+def test_exchange_moves_the_pool():
+    pool = ng_pool()
+    dx = 100_000 * 10**18
+    quoted = pool.get_dy(0, 1, dx)
+    assert pool.exchange(0, 1, dx) == quoted
+    assert pool.balances == [5_100_000 * 10**18, 4_500_000 * 10**18 - quoted]
+    assert pool.get_dy(0, 1, dx) < quoted
+
+
+def test_erc4626_deposit_redeem():
+    vault = ERC4626Snapshot(1_050 * 10**18, 1_000 * 10**18)
+    assert vault.deposit(105 * 10**18) == 100 * 10**18
+    assert (vault.total_assets, vault.total_supply) == (
+        1_155 * 10**18,
+        1_100 * 10**18,
+    )
+    assert vault.redeem(100 * 10**18) == 105 * 10**18
+    assert (vault.total_assets, vault.total_supply) == (
+        1_050 * 10**18,
+        1_000 * 10**18,
+    )
+
+
+def test_legacy_get_D():
+    xp = [5_000_000 * 10**18 + 123456789, 4_725_000 * 10**18 + 987654321]
+    D = get_D(xp, AMP)
+    legacy = get_D(xp, AMP, legacy=True)
+    # same invariant, rounded differently
+    assert abs(D - legacy) <= 10
+    pool = StableSwapNGPool(
+        [10**24, 10**24], [10**18, 10**18], AMP, FEE, 0, True
+    )
+    assert pool.D == get_D([10**24, 10**24], AMP, legacy=True)
@@ -20,7 +20,7 @@ from ..utils.constants import (
     ADDRESS_ZERO,
 )
 from ..utils import cvxcrv_balance, approx
-from ..utils.merkle import OrderedMerkleTree
+from scripts.airdrop.merkle import OrderedMerkleTree
 
 
 def test_claim_vault_as_spell(alice, bob, vault, zaps):
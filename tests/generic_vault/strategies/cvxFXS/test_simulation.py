@@ -0,0 +1,52 @@
+from brownie import interface, chain
+
+from ....utils.constants import (
+    FXS,
+    CURVE_CVXFXS_FXS_POOL,
+    CURVE_CVXFXS_FXS_LP_TOKEN,
+    WETH,
+)
+from ....utils.cvxfxs import estimate_lp_tokens_received, estimate_underlying_received
+from ....utils.simulate import erc20_override, simulate_with_gas
+
+AMOUNT = 10**21
+
+
+def test_estimates_do_not_mine(fn_isolation, alice):
+    height = chain.height
+    lp_amount = estimate_lp_tokens_received(AMOUNT)
+    fxs_amount = estimate_underlying_received(lp_amount, 0)
+    assert chain.height == height
+    assert 0 < fxs_amount < AMOUNT
+
+    lpt = interface.IERC20(CURVE_CVXFXS_FXS_LP_TOKEN)
+    pool = interface.ICurveV2Pool(CURVE_CVXFXS_FXS_POOL)
+    initial_balance = lpt.balanceOf(alice)
+    interface.IERC20(FXS).approve(pool, AMOUNT, {"from": alice})
+    pool.add_liquidity([AMOUNT, 0], 0, {"from": alice})
+    assert lpt.balanceOf(alice) - initial_balance == lp_amount
+
+
+def test_simulate_with_gas(fn_isolation, alice):
+    lpt = interface.IERC20(CURVE_CVXFXS_FXS_LP_TOKEN)
+    pool = interface.ICurveV2Pool(CURVE_CVXFXS_FXS_POOL)
+    interface.IERC20(FXS).approve(pool, AMOUNT, {"from": alice})
+    gas_used, lp_amount = simulate_with_gas(
+        pool.add_liquidity, [AMOUNT, 0], 0, sender=alice.address
+    )
+
+    initial_balance = lpt.balanceOf(alice)
+    tx = pool.add_liquidity([AMOUNT, 0], 0, {"from": alice})
+    assert lpt.balanceOf(alice) - initial_balance == lp_amount
+    assert abs(tx.gas_used - gas_used) < tx.gas_used // 10
+
+
+def test_simulate_with_gas_receives_eth(alice):
+    # WETH.withdraw pays ETH back to msg.sender, i.e. the meter
+    gas_used, _ = simulate_with_gas(
+        interface.IWETH(WETH).withdraw,
+        AMOUNT,
+        sender=alice.address,
+        overrides=erc20_override(WETH, alice.address, AMOUNT),
+    )
+    assert 0 < gas_used < 100_000
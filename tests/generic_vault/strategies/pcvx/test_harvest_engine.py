@@ -0,0 +1,34 @@
+from brownie import chain
+
+from ....utils.harvest import HarvestEngine, pcvx_harvester
+
+
+def test_harvest_engine_ranking(
+    fn_isolation, alice, bob, owner, vault, pcvx, strategy, staking_rewards
+):
+    vault.depositAll(alice, {"from": alice})
+    # pCVX is a mock here, priced 1:1 with ETH
+    harvester = pcvx_harvester(vault, strategy, staking_rewards, lambda amount: amount)
+    engine = HarvestEngine([harvester], bob)
+
+    assert engine.best(gas_price=10**9) is None
+
+    amount = 1e25
+    pcvx.mint(owner, amount, {"from": owner})
+    pcvx.transfer(staking_rewards, amount, {"from": owner})
+    staking_rewards.notifyRewardAmount(amount, {"from": owner})
+    chain.sleep(60 * 60 * 24 * 30)
+    chain.mine(1)
+
+    ranking = engine.rank(gas_price=10**9)
+    assert len(ranking) == 1
+    report = ranking[0]
+    caller_incentive = report["harvested"] * vault.callIncentive() // 10000
+    assert report["incentive"] == caller_incentive
+    assert report["profit"] == caller_incentive - report["gas"] * 10**9
+    assert engine.best(gas_price=10**9)["vault"] == vault
+
+    bob_initial_balance = pcvx.balanceOf(bob)
+    tx = vault.harvest({"from": bob})
+    assert abs(report["gas"] - tx.gas_used) < report["gas"] // 10
+    assert abs(pcvx.balanceOf(bob) - bob_initial_balance - caller_incentive) < 1e18
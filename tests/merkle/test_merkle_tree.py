@@ -0,0 +1,200 @@
+import io
+import json
+import os
+
+from web3 import Web3
+
+from ..utils.airdrop.prisma import PRISMA_CLAIMS
+from scripts.airdrop.merkle import (
+    MerkleSnapshot,
+    MerkleTree,
+    OrderedMerkleTree,
+    abi_encode,
+    encode_leaf,
+    encode_leaves,
+    hash_pair,
+    verify_multiproof,
+    verify_proofs,
+)
+
+PROOFS_FILE = os.path.join(
+    os.path.dirname(__file__), "..", "..", "scripts", "airdrop", "proofs.json"
+)
+
+
+def prisma_tree():
+    data = [
+        {"user": Web3.toChecksumAddress(k), "amount": v}
+        for k, v in PRISMA_CLAIMS.items()
+    ]
+    return OrderedMerkleTree(data)
+
+
+def test_root_matches_published_proofs():
+    published = json.load(open(PROOFS_FILE))
+    tree = prisma_tree()
+    assert tree.get_root() == published["merkleRoot"]
+    for proof in tree.get_proofs()["proofs"][:50]:
+        assert published["proofs"][proof["claim"]["user"]]["proof"] == proof["proofs"]
+
+
+def test_odd_levels():
+    leaves = [bytes([i]) * 32 for i in range(7)]
+    tree = MerkleTree()
+    tree.add_leaves(leaves)
+    tree.make_tree()
+    assert len(tree.levels) == 4
+    root = tree.get_merkle_root()
+    for i, leaf in enumerate(leaves):
+        node = leaf
+        for sibling in tree.get_proof(i):
+            node = hash_pair(node, bytes.fromhex(list(sibling.values())[0]))
+        assert node.hex() == root
+    # the last leaf is carried over to the next level without a sibling
+    assert len(tree.get_proof(6)) == 2
+
+
+def test_get_proof_lookup():
+    tree = prisma_tree()
+    proofs = tree.get_proofs()["proofs"]
+    for proof in proofs[::97]:
+        user = proof["claim"]["user"]
+        assert tree.get_proof(user) == proof
+        assert tree.get_proof(user.lower()) == proof
+    assert tree.get_proof("0x" + "00" * 20) is None
+
+
+def test_write_proofs_matches_published_file():
+    tree = prisma_tree()
+    fp = io.StringIO()
+    tree.write_proofs(fp, "cvxprisma")
+    assert fp.getvalue() == open(PROOFS_FILE).read()
+
+
+def test_write_proofs_json_lines():
+    tree = prisma_tree()
+    fp = io.StringIO()
+    tree.write_proofs(fp, "cvxprisma", json_lines=True)
+    header, *lines = [json.loads(line) for line in fp.getvalue().splitlines()]
+    assert header == {"id": "cvxprisma", "merkleRoot": tree.get_root()}
+    assert len(lines) == len(PRISMA_CLAIMS)
+    assert lines[0]["proof"] == tree.get_proof(lines[0]["user"])["proofs"]
+
+
+def test_incremental_update_matches_rebuild():
+    data = [
+        {"user": Web3.toChecksumAddress(k), "amount": v}
+        for k, v in list(PRISMA_CLAIMS.items())[:200]
+    ]
+    tree = OrderedMerkleTree(data)
+    updates = [{"user": data[5]["user"], "amount": data[5]["amount"] + 1}]
+    removed = [data[-1]["user"]]
+    new_tree, changed = tree.update(updates, removed)
+
+    expected = OrderedMerkleTree(updates + data[:5] + data[6:-1])
+    assert new_tree.get_proofs() == expected.get_proofs()
+    for claimer in new_tree.claimers:
+        if tree.get_proof(claimer) != new_tree.get_proof(claimer):
+            assert claimer in changed
+
+
+def test_incremental_update_without_changes():
+    data = [
+        {"user": Web3.toChecksumAddress(k), "amount": v}
+        for k, v in list(PRISMA_CLAIMS.items())[:50]
+    ]
+    tree = OrderedMerkleTree(data)
+    new_tree, changed = tree.update([data[0]])
+    assert new_tree.get_root() == tree.get_root()
+    assert changed == []
+
+
+def test_parallel_leaf_encoding():
+    data = [
+        {"user": Web3.toChecksumAddress(k), "amount": v}
+        for k, v in list(PRISMA_CLAIMS.items())[:100]
+    ]
+    assert encode_leaves([(0, data[0]["user"], data[0]["amount"])], 2) == [
+        abi_encode(0, data[0]["user"], data[0]["amount"])
+    ]
+    tree = OrderedMerkleTree(data, processes=2)
+    assert tree.get_proofs() == OrderedMerkleTree(data).get_proofs()
+
+
+def test_packed_leaf_encoder_matches_web3():
+    claims = [
+        (i, Web3.toChecksumAddress(k), v)
+        for i, (k, v) in enumerate(list(PRISMA_CLAIMS.items())[:200])
+    ]
+    claims.append(
+        (2**256 - 1, Web3.toChecksumAddress("0x" + "ff" * 20), 2**256 - 1)
+    )
+    claims.append((0, Web3.toChecksumAddress("0x" + "00" * 20), 0))
+    for claim in claims:
+        assert encode_leaf(*claim) == abi_encode(*claim)
+
+
+def test_verify_published_proofs():
+    with open(PROOFS_FILE) as fp:
+        assert verify_proofs(fp) == []
+    with open(PROOFS_FILE) as fp:
+        assert verify_proofs(fp, processes=2) == []
+    with open(PROOFS_FILE) as fp:
+        assert len(verify_proofs(fp, "0x" + "00" * 32)) == len(PRISMA_CLAIMS)
+
+
+def test_verify_proofs_reports_failures():
+    tree = prisma_tree()
+    fp = io.StringIO()
+    tree.write_proofs(fp, "cvxprisma", json_lines=True)
+    lines = fp.getvalue().splitlines()
+    tampered = json.loads(lines[3])
+    tampered["amount"] = hex(int(tampered["amount"], 16) + 1)
+    lines[3] = json.dumps(tampered)
+    assert verify_proofs(io.StringIO("\n".join(lines))) == [tampered["user"]]
+
+
+def test_validate_proof():
+    tree = prisma_tree()
+    root = tree.tree.get_merkle_root()
+    for position in range(0, tree.tree.get_leaf_count(), 37):
+        proof = tree.tree.get_proof(position)
+        assert tree.tree.validate_proof(proof, tree.tree.get_leaf(position), root)
+
+
+def test_multiproof():
+    tree = prisma_tree()
+    claimers = tree.claimers[::50]
+    multiproof = tree.get_multiproof(claimers)
+    assert len(multiproof["claims"]) == len(claimers)
+    assert verify_multiproof(multiproof, tree.get_root())
+
+    individual = {x for c in claimers for x in tree.get_proof(c)["proofs"]}
+    assert set(multiproof["proof"]) <= individual
+
+    multiproof["claims"][0]["amount"] += 1
+    assert not verify_multiproof(multiproof, tree.get_root())
+
+
+def test_multiproof_single_claim():
+    tree = prisma_tree()
+    claimer = tree.claimers[7]
+    multiproof = tree.get_multiproof([claimer])
+    assert multiproof["proof"] == tree.get_proof(claimer)["proofs"]
+    assert verify_multiproof(multiproof, tree.get_root())
+    assert tree.get_multiproof_savings(tree.claimers[:100])["saved"] > 0
+
+
+def test_snapshot(tmp_path):
+    tree = prisma_tree()
+    path = tmp_path / "snapshot.bin"
+    with open(path, "wb") as fp:
+        tree.write_snapshot(fp)
+    with MerkleSnapshot(path) as snapshot:
+        assert snapshot.get_root() == tree.get_root()
+        assert len(snapshot) == len(tree.claimers)
+        for claimer in tree.claimers[::41] + [tree.claimers[-1]]:
+            assert snapshot.get_proof(claimer) == tree.get_proof(claimer)
+            assert snapshot.get_proof(claimer.lower()) == tree.get_proof(claimer)
+        assert snapshot.get_proof("0x" + "00" * 20) is None
+        assert snapshot.get_proof("0x" + "ff" * 20) is None
@@ -0,0 +1,49 @@
+from ..utils.routes import apply_tolerance, best_options, optimal_split, quote_grid
+
+# two constant product pools, the deep one charges a higher fee
+POOLS = {0: (10**21, 10**21, 997), 1: (10**20, 10**20, 999)}
+
+
+def quote(amount, option, pools=POOLS):
+    reserve_in, reserve_out, fee = pools[option]
+    amount = amount * fee
+    return amount * reserve_out // (reserve_in * 1000 + amount)
+
+
+def test_quote_grid():
+    amounts = [10**17, 10**18, 10**19, 10**20]
+    grid = quote_grid(quote, [0, 1], amounts)
+    assert grid == {o: [quote(a, o) for a in amounts] for o in (0, 1)}
+    assert quote_grid(quote, [0, 1], amounts, processes=2) == grid
+    # the snapshot is handed to the workers with each task
+    shallow = {0: (10**19, 10**19, 997), 1: (10**18, 10**18, 999)}
+    expected = {o: [quote(a, o, shallow) for a in amounts] for o in (0, 1)}
+    assert quote_grid(quote, [0, 1], amounts, 2, shallow) == expected
+
+
+def test_best_options():
+    amounts = [10**17, 10**20]
+    best = best_options(quote_grid(quote, [0, 1], amounts), amounts)
+    # the cheap pool wins small trades, the deep one large trades
+    assert [option for _, option, _ in best] == [1, 0]
+    assert best[0][2] == quote(10**17, 1)
+
+
+def test_optimal_split():
+    amount = 10**20
+    allocation, output = optimal_split(quote, [0, 1], amount)
+    assert sum(allocation.values()) == amount
+    assert allocation[0] > 0 and allocation[1] > 0
+    assert output == quote(allocation[0], 0) + quote(allocation[1], 1)
+    assert output > max(quote(amount, 0), quote(amount, 1))
+    # a trade too small to be worth splitting stays on one route
+    allocation, output = optimal_split(quote, [0, 1], 10**15)
+    assert allocation == {0: 0, 1: 10**15}
+
+
+def test_apply_tolerance():
+    assert apply_tolerance(10**18, 50) == 995 * 10**15
+    # always strictly below the expected amount
+    assert apply_tolerance(100, 0) == 99
+    assert apply_tolerance(1, 50) == 0
+    assert apply_tolerance(0, 50) == 0
@@ -59,7 +59,7 @@ from ..utils.constants import (
     REUSD_TOKEN,
     SREUSD_VAULT,
 )
-from ..utils.merkle import OrderedMerkleTree
+from scripts.airdrop.merkle import OrderedMerkleTree
 
 
 @pytest.fixture(scope="session")
@@ -1,5 +1,5 @@
 import brownie
-from tests.utils.merkle import OrderedMerkleTree
+from scripts.airdrop.merkle import OrderedMerkleTree
 from brownie import interface, chain
 from decimal import Decimal
 from tests.utils.constants import (
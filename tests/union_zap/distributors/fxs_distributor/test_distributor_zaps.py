@@ -1,7 +1,7 @@
 import brownie
 
 from tests.utils.cvxfxs import estimate_underlying_received, fxs_eth_unistable
-from tests.utils.merkle import OrderedMerkleTree
+from scripts.airdrop.merkle import OrderedMerkleTree
 from brownie import interface, chain
 from decimal import Decimal
 from tests.utils.constants import (
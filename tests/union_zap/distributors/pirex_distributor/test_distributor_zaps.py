@@ -3,7 +3,7 @@ import brownie
 from tests.utils.cvxfxs import (
     get_cvx_to_eth_amount,
 )
-from tests.utils.merkle import OrderedMerkleTree
+from scripts.airdrop.merkle import OrderedMerkleTree
 from brownie import interface
 from tests.utils.constants import (
     CVX,
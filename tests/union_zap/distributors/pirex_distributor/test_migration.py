@@ -1,5 +1,5 @@
 import brownie
-from tests.utils.merkle import OrderedMerkleTree
+from scripts.airdrop.merkle import OrderedMerkleTree
 from brownie import interface
 from tests.utils.constants import (
     AIRFORCE_SAFE,
@@ -1,7 +1,7 @@
 import brownie
 
 from tests.utils import approx
-from tests.utils.merkle import OrderedMerkleTree
+from scripts.airdrop.merkle import OrderedMerkleTree
 from brownie import interface
 from tests.utils.constants import (
     UNION_CRV_V2,
@@ -6,7 +6,7 @@ from tests.utils.cvxfxs import (
     cvxfxs_to_fxs,
     fxs_to_eth,
 )
-from tests.utils.merkle import OrderedMerkleTree
+from scripts.airdrop.merkle import OrderedMerkleTree
 from brownie import interface, chain
 from decimal import Decimal
 from tests.utils.constants import (
@@ -1,7 +1,7 @@
 import brownie
 
 from tests.utils.cvxfxs import estimate_underlying_received
-from tests.utils.merkle import OrderedMerkleTree
+from scripts.airdrop.merkle import OrderedMerkleTree
 from brownie import interface
 from tests.utils.constants import (
     CLAIM_AMOUNT,
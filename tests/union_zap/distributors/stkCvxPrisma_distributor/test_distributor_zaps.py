@@ -4,7 +4,7 @@ from tests.utils.cvxprisma import (
     cvxprisma_to_prisma,
     prisma_to_eth,
 )
-from tests.utils.merkle import OrderedMerkleTree
+from scripts.airdrop.merkle import OrderedMerkleTree
 from brownie import interface, chain
 from decimal import Decimal
 from tests.utils.constants import (
@@ -0,0 +1,26 @@
+from ..utils.cache import QuoteCache
+
+
+def test_quote_cache(fn_isolation, owner, union_contract):
+    cache = QuoteCache()
+    fee = union_contract.platformFee()
+
+    # nothing is kept outside of a pinned block
+    assert cache.call(union_contract.platformFee) == fee
+    assert cache.stats() == {"hits": 0, "misses": 0, "size": 0}
+
+    with cache.pinned():
+        assert cache.call(union_contract.platformFee) == fee
+        with cache.pinned():
+            assert cache.call(union_contract.platformFee) == fee
+        assert cache.call(union_contract.outputTokens, 0) == (
+            union_contract.outputTokens(0)
+        )
+        assert cache.stats() == {"hits": 1, "misses": 2, "size": 2}
+
+    # the entries are dropped once the outermost block exits
+    assert cache.results == {}
+    union_contract.setPlatformFee(fee + 1, {"from": owner})
+    with cache.pinned():
+        assert cache.call(union_contract.platformFee) == fee + 1
+    assert cache.misses == 3
@@ -1,6 +1,7 @@
 import brownie
 import pytest
 from ..utils.constants import CLAIM_AMOUNT, TOKENS, MAX_UINT256, MAX_WEIGHT_1E9
+from ..utils.slippage import MinAmountsCalculator
 
 
 def test_swap_slippage(
@@ -98,3 +99,41 @@ def test_process_incentives_slippage(
             min_amounts,
             {"from": owner},
         )
+
+
+@pytest.mark.parametrize(
+    "weights",
+    [
+        [MAX_WEIGHT_1E9, 0, 0, 0, 0, 0],
+        [0, 333333334, 0, 0, 333333333, 333333333],
+        [100000000, 100000000, 0, 0, 400000000, 400000000],
+    ],
+)
+@pytest.mark.parametrize("lock", [True, False])
+def test_calculated_min_amounts(
+    fn_isolation,
+    owner,
+    union_contract,
+    set_mock_claims,
+    claim_tree,
+    lock,
+    weights,
+    vault,
+):
+    gas_refund = 3 * 10**16
+    proofs = claim_tree.get_proof(union_contract.address)
+    params = [
+        [token, proofs["claim"]["index"], CLAIM_AMOUNT, proofs["proofs"]]
+        for token in TOKENS
+    ]
+
+    calculator = MinAmountsCalculator(union_contract, 0, lock)
+    bounds = calculator.get_min_amounts(params, 0, True, gas_refund, weights)
+
+    union_contract.swap(
+        params, 0, True, bounds["min_amount_out"], gas_refund, weights, {"from": owner}
+    )
+    assert union_contract.balance() == bounds["eth_amount"] - gas_refund
+    union_contract.adjust(
+        lock, weights, bounds["adjust_order"], bounds["min_amounts"], {"from": owner}
+    )
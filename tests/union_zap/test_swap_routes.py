@@ -7,6 +7,7 @@ import pytest
 
 from ..utils import (
     estimate_amounts_after_swap,
+    optimize_router_choices,
 )
 from ..utils.constants import (
     CLAIM_AMOUNT,
@@ -147,3 +148,32 @@ def test_swap_mixed_routes(
         else:
             assert approval[guy] == SUSHI_ROUTER
         index += 1
+
+
+def test_swap_optimized_routes(
+    fn_isolation, owner, union_contract, set_mock_claims_curve, claim_tree
+):
+
+    OTHER_TOKENS = [ALCX, FXS]
+    weights = [MAX_WEIGHT_1E9, 0, 0, 0, 0, 0]
+    gas_refund = 3e16
+    tokens = CURVE_TOKENS + OTHER_TOKENS
+
+    proofs = claim_tree.get_proof(union_contract.address)
+    params = [
+        [token, proofs["claim"]["index"], CLAIM_AMOUNT, proofs["proofs"]]
+        for token in tokens
+    ]
+
+    router_choices, expected_eth_amount, gain = optimize_router_choices(
+        tokens, union_contract, weights
+    )
+    assert gain is None or gain >= 0
+
+    original_caller_balance = owner.balance()
+    union_contract.swap(
+        params, router_choices, True, 0, gas_refund, weights, {"from": owner}
+    )
+    gas_fees = owner.balance() - original_caller_balance
+    assert gas_fees == gas_refund
+    assert union_contract.balance() == expected_eth_amount - gas_fees
@@ -8,7 +8,7 @@ from ..utils import (
     approx,
     get_pirex_cvx_received,
 )
-from ..utils.adjust import simulate_adjust, get_spot_prices
+from ..utils.adjust import simulate_adjust, get_spot_prices, AdjustSimulator
 from ..utils.constants import (
     CLAIM_AMOUNT,
     TOKENS,
@@ -108,6 +108,15 @@ def test_swap_adjust_distribute(
     fee_amount, output_amounts = simulate_adjust(
         union_contract, lock, weights, option, output_tokens, adjust_order
     )
+    simulator = AdjustSimulator(union_contract, option, lock)
+    batch_fees, batch_outputs = simulator.simulate_batch([weights], adjust_order)
+    planned_order, min_amounts, planned_outputs = simulator.plan(weights)
+    assert sorted(planned_order) == list(range(len(weights)))
+    assert sum(
+        simulator.get_value(i, amount) for i, amount in enumerate(planned_outputs)
+    ) >= sum(
+        simulator.get_value(i, amount) for i, amount in enumerate(batch_outputs[0])
+    )
 
     with brownie.reverts():
         union_contract.adjust(
@@ -119,6 +128,7 @@ def test_swap_adjust_distribute(
     )
 
     assert approx(platform.balance() - initial_platform_balance, fee_amount, 5e-2)
+    assert platform.balance() - initial_platform_balance == batch_fees[0]
 
     spot_amounts = []
     for i, output_token in enumerate(output_tokens):
@@ -129,6 +139,7 @@ def test_swap_adjust_distribute(
         # account for the fact that we leave 1 token unit for gas saving when swapping
         balance = 0 if balance == 1 else balance
         assert approx(balance, output_amounts[i], 5e-2)
+        assert approx(balance, batch_outputs[0][i], 5e-2)
         # calculate spoth ETH price and store
         price = get_spot_prices(output_token)
         spot_amounts.append(balance * price)
@@ -0,0 +1,97 @@
+import pytest
+from eth_abi.packed import encode_single_packed
+
+from ..utils.uniswap import (
+    MAX_SQRT_RATIO,
+    MAX_TICK,
+    MIN_SQRT_RATIO,
+    MIN_TICK,
+    Q96,
+    UniV2Pair,
+    UniV3Pool,
+    compute_swap_step,
+    decode_path,
+    get_sqrt_ratio_at_tick,
+    get_tick_at_sqrt_ratio,
+)
+
+TOKEN0 = "0x0000000000000000000000000000000000000001"
+TOKEN1 = "0x0000000000000000000000000000000000000002"
+WETH = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+USDC = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+FRAX = "0x853d955aCEf822Db058eb8505911ED77F175b99e"
+
+L1 = 10**24
+L2 = 3 * 10**24
+
+
+def two_range_pool():
+    # positions on [-600, 600] with L1 and [-1200, 1200] with L2, at tick 0
+    ticks = {-1200: L2, -600: L1, 600: -L1, 1200: -L2}
+    bitmap = {-1: 0, 0: 0}
+    for tick in ticks:
+        compressed = tick // 60
+        bitmap[compressed >> 8] |= 1 << (compressed & 0xFF)
+    return UniV3Pool(TOKEN0, 3000, 60, Q96, 0, L1 + L2, bitmap, ticks)
+
+
+def test_tick_math():
+    assert get_sqrt_ratio_at_tick(MIN_TICK) == MIN_SQRT_RATIO
+    assert get_sqrt_ratio_at_tick(MAX_TICK) == MAX_SQRT_RATIO
+    assert get_sqrt_ratio_at_tick(0) == Q96
+    for tick in (-200000, -1, 1, 887):
+        price = get_sqrt_ratio_at_tick(tick)
+        assert get_tick_at_sqrt_ratio(price) == tick
+        assert get_tick_at_sqrt_ratio(price - 1) == tick - 1
+        assert abs(price / Q96 - 1.0001 ** (tick / 2)) < 1e-9 * price / Q96
+
+
+def test_v2_amount_out():
+    pair = UniV2Pair(TOKEN0, 1000 * 10**18, 2000 * 10**6)
+    assert pair.get_amount_out(10**18, TOKEN0) == 1992013
+    assert pair.get_amount_out(2 * 10**6, TOKEN1.upper()) == 996006981039903216
+
+
+def test_decode_path():
+    path = encode_single_packed(
+        "(address,uint24,address,uint24,address)", [WETH, 500, USDC, 3000, FRAX]
+    )
+    tokens, fees = decode_path(path)
+    assert tokens == [WETH.lower(), USDC.lower(), FRAX.lower()]
+    assert fees == [500, 3000]
+
+
+def test_v3_swap_within_range():
+    pool = two_range_pool()
+    amount = 10**20
+    out = pool.get_amount_out(amount, TOKEN0)
+    # x * y = L ** 2 within a range, after the fee is taken from the input
+    liquidity = L1 + L2
+    x = liquidity + amount * (10**6 - 3000) // 10**6
+    expected = liquidity - liquidity * liquidity // x
+    assert abs(out - expected) <= 1
+    assert out < pool.get_amount_out(amount, TOKEN1) * 1.0001
+
+
+def test_v3_swap_crosses_ticks():
+    pool = two_range_pool()
+    amount = 18 * 10**22
+    out = pool.get_amount_out(amount, TOKEN0)
+
+    # same swap replayed step by step, liquidity drops to L2 past tick -600
+    target = get_sqrt_ratio_at_tick(-600)
+    price, step_in, step_out, fee = compute_swap_step(
+        Q96, target, L1 + L2, amount, 3000
+    )
+    assert price == target
+    remaining = amount - step_in - fee
+    _, _, last_out, _ = compute_swap_step(
+        target, get_sqrt_ratio_at_tick(-1200), L2, remaining, 3000
+    )
+    assert out == step_out + last_out
+
+
+def test_v3_swap_outside_snapshot():
+    pool = two_range_pool()
+    with pytest.raises(ValueError):
+        pool.get_amount_out(10**26, TOKEN0)
@@ -1,5 +1,6 @@
 import brownie
 from brownie import interface, chain
+from .cache import cached_call
 from .constants import (
     CLAIM_AMOUNT,
     TOKENS,
@@ -30,6 +31,7 @@ from .constants import (
     LPXCVX_POOL,
 )
 from .cvxfxs import get_crv_to_eth_amount
+from .multicall import Multicall, add_eth_quote, get_output_tokens
 
 
 def calc_harvest_amount_in_cvxcrv(vault):
@@ -41,23 +43,32 @@ def calc_harvest_amount_in_cvxcrv(vault):
     tripool = interface.ICurvePool(TRIPOOL)
     tricrypto = interface.ICurveTriCrypto(TRICRYPTO)
 
-    eth_balance = cvxEthSwap.get_dy(1, 0, cvx_balance) if cvx_balance > 0 else 0
+    eth_balance = (
+        cached_call(cvxEthSwap.get_dy, 1, 0, cvx_balance) if cvx_balance > 0 else 0
+    )
     usdt_balance = (
         tripool.calc_withdraw_one_coin(three_crv_balance, 2)
         if three_crv_balance > 0
         else 0
     )
-    eth_balance += tricrypto.get_dy(0, 2, usdt_balance) if usdt_balance > 0 else 0
+    eth_balance += (
+        cached_call(tricrypto.get_dy, 0, 2, usdt_balance) if usdt_balance > 0 else 0
+    )
     crv_balance += (
-        interface.ICurveTriCryptoFactoryNG(CURVE_TRICRV_POOL).get_dy(1, 2, eth_balance)
+        cached_call(
+            interface.ICurveTriCryptoFactoryNG(CURVE_TRICRV_POOL).get_dy,
+            1,
+            2,
+            eth_balance,
+        )
         if eth_balance > 0
         else 0
     )
 
     cvxcrv_amount = crv_balance
     if crv_balance > 0:
-        quote = interface.ICurveFactoryPool(CURVE_CVXCRV_CRV_POOL).get_dy(
-            0, 1, crv_balance
+        quote = cached_call(
+            interface.ICurveFactoryPool(CURVE_CVXCRV_CRV_POOL).get_dy, 0, 1, crv_balance
         )
         if quote > crv_balance:
             cvxcrv_amount = quote
@@ -74,18 +85,29 @@ def calc_staked_cvxcrv_harvest(strategy, wrapper, force_lock=False):
     cvxEthSwap = interface.ICurveV2Pool(CURVE_CVX_ETH_POOL)
     tricrv = interface.ICurveTriCryptoFactoryNG(CURVE_TRICRV_POOL)
     # cvx dump
-    eth_balance = cvxEthSwap.get_dy(1, 0, cvx_balance) if cvx_balance > 0 else 0
+    eth_balance = (
+        cached_call(cvxEthSwap.get_dy, 1, 0, cvx_balance) if cvx_balance > 0 else 0
+    )
     crv_balance += (
-        interface.ICurveTriCryptoFactoryNG(CURVE_TRICRV_POOL).get_dy(1, 2, eth_balance)
+        cached_call(
+            interface.ICurveTriCryptoFactoryNG(CURVE_TRICRV_POOL).get_dy,
+            1,
+            2,
+            eth_balance,
+        )
         if eth_balance > 0
         else 0
     )
     # crvusd dump
-    crv_balance += tricrv.get_dy(0, 2, crvusd_balance) if crvusd_balance > 0 else 0
+    crv_balance += (
+        cached_call(tricrv.get_dy, 0, 2, crvusd_balance) if crvusd_balance > 0 else 0
+    )
 
     cvxcrv_amount = crv_balance
     if crv_balance > 0:
-        oracle = interface.ICurveNewFactoryPool(CURVE_CVXCRV_CRV_POOL_V2).price_oracle()
+        oracle = cached_call(
+            interface.ICurveNewFactoryPool(CURVE_CVXCRV_CRV_POOL_V2).price_oracle
+        )
         if oracle < 1e18 and not force_lock:
             cvxcrv_amount = interface.ICurveNewFactoryPool(
                 CURVE_CVXCRV_CRV_POOL_V2
@@ -134,62 +156,121 @@ def approx(a, b, precision=1e-10):
 
 
 def estimate_amounts_after_swap(tokens, union_contract, router_choices, weights):
-    def is_effective_output_token(token, weights):
-        for i in range(len(weights)):
-            if union_contract.outputTokens(i) == token and weights[i] > 0:
-                return True
-        return False
-
+    output_tokens = get_output_tokens(union_contract, len(weights))
+    effective_output_tokens = [
+        token for token, weight in zip(output_tokens, weights) if weight > 0
+    ]
+
+    # queue all the quotes and fetch them in a single multicall
+    calls = Multicall()
+    quotes = []
     eth_amount = 0
     for i, token in enumerate(tokens):
         if token == WETH:
             eth_amount += CLAIM_AMOUNT - 1
         else:
-            if is_effective_output_token(token, weights):
+            if token in effective_output_tokens:
                 continue
 
             choice = router_choices & 7
-            if choice >= 4:
-                pool, index = CURVE_CONTRACT_REGISTRY[token.lower()]
-                eth_amount += interface.ICurveV2Pool(pool).get_dy(
-                    index ^ 1, index, CLAIM_AMOUNT - 1
-                )
-            elif choice == 2:
-                eth_amount += interface.IQuoter(UNI_QUOTER).quoteExactInputSingle(
-                    token, WETH, 3000, CLAIM_AMOUNT - 1, 0
-                )
-            elif choice == 3:
-                eth_amount += interface.IQuoter(UNI_QUOTER).quoteExactInputSingle(
-                    token, WETH, 10000, CLAIM_AMOUNT - 1, 0
-                )
-            else:
-                router = UNI_ROUTER if (choice == 1) else SUSHI_ROUTER
-                print(
-                    f"Token: {token} swapped on {'Uni' if router == UNI_ROUTER else 'Sushi'}"
-                )
-                eth_amount += interface.IUniV2Router(router).getAmountsOut(
-                    CLAIM_AMOUNT - 1, [token, WETH]
-                )[-1]
+            if choice < 2:
+                print(f"Token: {token} swapped on {'Uni' if choice == 1 else 'Sushi'}")
+            quotes.append(
+                (token, choice, add_eth_quote(calls, token, choice, CLAIM_AMOUNT - 1))
+            )
         router_choices = router_choices // 8
 
+    # a venue without a pool fails its sub-call and the quote is None
+    results = calls.execute()
+    for token, choice, quote in quotes:
+        amount = quote(results)
+        if amount is None:
+            raise ValueError(f"No quote for {token} with router choice {choice}")
+        eth_amount += amount
+
     print("ETH Amount: ", eth_amount)
     return eth_amount
 
 
+def optimize_router_choices(tokens, union_contract, weights, amounts=None):
+    # best routerChoices bitmap for UnionZap.swap, every venue of every
+    # swapped token is quoted in a single multicall. venues without a pool
+    # revert and are left out.
+    # returns (router choices, expected ETH, gain over the best uniform
+    # choice or None if no choice is available for all the tokens)
+    output_tokens = get_output_tokens(union_contract, len(weights))
+    effective_output_tokens = [
+        token for token, weight in zip(output_tokens, weights) if weight > 0
+    ]
+    if amounts is None:
+        amounts = [CLAIM_AMOUNT - 1] * len(tokens)
+
+    calls = Multicall()
+    swapped, quotes = [], []
+    eth_amount = 0
+    for token, amount in zip(tokens, amounts):
+        if token == WETH:
+            eth_amount += amount
+        elif token not in effective_output_tokens:
+            # choices 0 to 3 are sushi, univ2 and univ3 0.3% / 1%, 4 is curve
+            choices = 5 if token.lower() in CURVE_CONTRACT_REGISTRY else 4
+            swapped.append(token)
+            quotes.append(
+                {c: add_eth_quote(calls, token, c, amount) for c in range(choices)}
+            )
+
+    results = calls.execute()
+    outputs = []
+    for token, token_quotes in zip(swapped, quotes):
+        output = {}
+        for choice, quote in token_quotes.items():
+            amount = quote(results)
+            if amount:
+                output[choice] = amount
+        assert len(output) > 0, f"No route for {token}"
+        outputs.append(output)
+
+    # the contract only shifts the bitmap for the tokens it swaps
+    router_choices = 0
+    best_amount = eth_amount
+    for i, output in enumerate(outputs):
+        choice = max(output, key=output.get)
+        router_choices += choice * 8**i
+        best_amount += output[choice]
+
+    uniform = [
+        eth_amount + sum(output[choice] for output in outputs)
+        for choice in range(5)
+        if all(choice in output for output in outputs)
+    ]
+    gain = best_amount - max(uniform) if len(uniform) > 0 else None
+
+    print("Router choices: ", router_choices, " ETH Amount: ", best_amount)
+    return router_choices, best_amount, gain
+
+
 def crv_to_cvxcrv(amount):
-    return interface.ICurveFactoryPool(CURVE_CVXCRV_CRV_POOL).get_dy(0, 1, amount)
+    return cached_call(
+        interface.ICurveFactoryPool(CURVE_CVXCRV_CRV_POOL).get_dy, 0, 1, amount
+    )
 
 
 def crv_to_cvxcrv_v2(amount):
-    return interface.ICurveFactoryPool(CURVE_CVXCRV_CRV_POOL_V2).get_dy(0, 1, amount)
+    return cached_call(
+        interface.ICurveFactoryPool(CURVE_CVXCRV_CRV_POOL_V2).get_dy, 0, 1, amount
+    )
 
 
 def cvxcrv_to_crv(amount):
-    return interface.ICurveFactoryPool(CURVE_CVXCRV_CRV_POOL).get_dy(1, 0, amount)
+    return cached_call(
+        interface.ICurveFactoryPool(CURVE_CVXCRV_CRV_POOL).get_dy, 1, 0, amount
+    )
 
 
 def cvxcrv_to_crv_v2(amount):
-    return interface.ICurveFactoryPool(CURVE_CVXCRV_CRV_POOL_V2).get_dy(1, 0, amount)
+    return cached_call(
+        interface.ICurveFactoryPool(CURVE_CVXCRV_CRV_POOL_V2).get_dy, 1, 0, amount
+    )
 
 
 def eth_to_cvxcrv(amount):
@@ -203,18 +284,20 @@ def eth_to_cvxcrv_v2(amount):
 def eth_to_crv(amount):
     if amount <= 0:
         return 0
-    return interface.ICurveTriCryptoFactoryNG(CURVE_TRICRV_POOL).get_dy(1, 2, amount)
+    return cached_call(
+        interface.ICurveTriCryptoFactoryNG(CURVE_TRICRV_POOL).get_dy, 1, 2, amount
+    )
 
 
 def eth_to_cvx(amount):
     if amount <= 0:
         return 0
-    return interface.ICurveV2Pool(CURVE_CVX_ETH_POOL).get_dy(0, 1, amount)
+    return cached_call(interface.ICurveV2Pool(CURVE_CVX_ETH_POOL).get_dy, 0, 1, amount)
 
 
 def get_pirex_cvx_received(amount):
     pool = interface.ICurveV2Pool(LPXCVX_POOL)
-    if pool.price_oracle() > 1e18:
+    if cached_call(pool.price_oracle) > 1e18:
         return amount
     else:
-        return pool.get_dy(0, 1, amount) if amount > 0 else 0
+        return cached_call(pool.get_dy, 0, 1, amount) if amount > 0 else 0
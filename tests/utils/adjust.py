@@ -1,20 +1,34 @@
 from brownie import interface
+from copy import deepcopy
 from decimal import Decimal
 from requests_cache import CachedSession
 import json
 
 from . import eth_to_crv, eth_to_cvx, crv_to_cvxcrv_v2
+from .cache import cached_call, pinned_quotes
 from .constants import (
     CRV,
     CVX,
     MAX_WEIGHT_1E9,
     CURVE_TRICRV_POOL,
+    CURVE_CVX_ETH_POOL,
+    CURVE_CVXCRV_CRV_POOL_V2,
+    CURVE_PRISMA_ETH_POOL,
+    CRVUSD_TOKEN,
+    REUSD_TOKEN,
     FXS,
     PRISMA,
+    MULTICALL3,
+    OUTPUT_TOKEN_LENGTH,
 )
 from .crvusd import eth_to_crvusd
-from .cvxfxs import eth_to_fxs
+from .cryptoswap import CryptoSwapPool
+from .cvxfxs import eth_to_fxs, fxs_to_eth, FxsSnapshot
 from .cvxprisma import eth_to_prisma
+from .multicall import Multicall, get_output_tokens
+from .reusd import ReusdSnapshot
+from .routes import apply_tolerance
+from .stableswap import StableSwapNGPool
 
 DECIMAL_18 = Decimal(1000000000000000000)
 session = CachedSession("test_cache", expire_after=300)
@@ -35,6 +49,7 @@ def get_spot_prices(token):
     return price
 
 
+@pinned_quotes
 def simulate_adjust(union_contract, lock, weights, option, output_tokens, adjust_order):
     total_eth = union_contract.balance()
     fees = union_contract.platformFee()
@@ -52,8 +67,8 @@ def simulate_adjust(union_contract, lock, weights, option, output_tokens, adjust
             else:
                 pool = interface.ICurveTriCryptoFactoryNG(CURVE_TRICRV_POOL)
                 prices[order] = int(
-                    (Decimal(pool.price_oracle(1)) * Decimal(1e18))
-                    / Decimal(pool.price_oracle(0))
+                    (Decimal(cached_call(pool.price_oracle, 1)) * Decimal(1e18))
+                    / Decimal(cached_call(pool.price_oracle, 0))
                 )
             amounts[order] = int(
                 Decimal(interface.IERC20(output_token).balanceOf(union_contract))
@@ -113,3 +128,244 @@ def simulate_adjust(union_contract, lock, weights, option, output_tokens, adjust
             output_amounts[order] = output_amount
 
     return fee_amount, output_amounts
+
+
+class InsufficientEth(Exception):
+    # a buy of the simulated adjust spends more ETH than the contract holds,
+    # the transfer would revert on chain
+    pass
+
+
+class AdjustSimulator(object):
+    # UnionZap.adjust replayed locally with the contract's integer math
+    # balances, oracle prices and the states of the pools used to buy and
+    # sell output tokens are read once, candidate weights are then
+    # evaluated without any RPC call.
+    # each swap of a simulated adjust is applied to a copy of the pool states
+    # before the next one is quoted, so swaps going through a same pool (e.g.
+    # CRV, crvUSD and reUSD on tricrv) see each other. the FXS routes are
+    # only used by FXS and stay quoted on the snapshot
+
+    def __init__(self, union_contract, option, lock, count=OUTPUT_TOKEN_LENGTH):
+        self.option = option
+        self.lock = lock
+        self.output_tokens = get_output_tokens(union_contract, count)
+
+        calls = Multicall()
+        eth_balance = calls.add(
+            interface.IMulticall3(MULTICALL3).getEthBalance, union_contract.address
+        )
+        fee = calls.add(union_contract.platformFee)
+        balances = [
+            calls.add(interface.IERC20(token).balanceOf, union_contract.address)
+            for token in self.output_tokens
+        ]
+        pools = [calls.add(union_contract.tokenInfo, t) for t in self.output_tokens]
+        results = calls.execute()
+        self.eth_balance = results[eth_balance]
+        self.platform_fee = results[fee]
+        self.balances = [results[i] for i in balances]
+        pools = [results[i][0] for i in pools]
+
+        prices = []
+        for token, pool in zip(self.output_tokens, pools):
+            if token == CRV:
+                pool = interface.ICurveTriCryptoFactoryNG(pool)
+                prices.append(
+                    (calls.add(pool.price_oracle, 0), calls.add(pool.price_oracle, 1))
+                )
+            else:
+                prices.append(calls.add(interface.ICurveV2Pool(pool).price_oracle))
+        cvx_eth = CryptoSwapPool.add_snapshot(calls, CURVE_CVX_ETH_POOL)
+        prisma_eth = CryptoSwapPool.add_snapshot(calls, CURVE_PRISMA_ETH_POOL)
+        cvxcrv_crv = StableSwapNGPool.add_plain_snapshot(
+            calls, CURVE_CVXCRV_CRV_POOL_V2, [10**18, 10**18]
+        )
+        results = calls.execute()
+        self.prices = [
+            results[p[1]] * 10**18 // results[p[0]]
+            if isinstance(p, tuple)
+            else results[p]
+            for p in prices
+        ]
+        self.cvx_eth = cvx_eth(results)
+        self.prisma_eth = prisma_eth(results)
+        self.cvxcrv_crv = cvxcrv_crv(results)
+        self.reusd = ReusdSnapshot()
+        self.fxs = FxsSnapshot()
+
+    def pools(self):
+        # copy of the pool states for one simulated adjust
+        return deepcopy(
+            {
+                "cvx_eth": self.cvx_eth,
+                "prisma_eth": self.prisma_eth,
+                "cvxcrv_crv": self.cvxcrv_crv,
+                "reusd": self.reusd,
+            }
+        )
+
+    def buy(self, pools, token, amount):
+        # output tokens received for amount of ETH, the swaps are applied to
+        # pools
+        if amount == 0:
+            return 0
+        reusd = pools["reusd"]
+        if token == CRV:
+            return reusd.tricrv.exchange(1, 2, amount)
+        elif token == CVX:
+            return pools["cvx_eth"].exchange(0, 1, amount)
+        elif token == FXS:
+            return eth_to_fxs(amount, self.option, self.fxs)
+        elif token == PRISMA:
+            return pools["prisma_eth"].exchange(0, 1, amount)
+        crvusd = reusd.tricrv.exchange(1, 0, amount)
+        if token != REUSD_TOKEN:
+            return crvusd
+        # crvUSD -> scrvUSD -> reUSD
+        return reusd.reusd_pool.exchange(1, 0, reusd.scrvusd.deposit(crvusd))
+
+    def sell(self, pools, token, amount):
+        # ETH received for amount of output tokens, the swaps are applied to
+        # pools
+        if amount == 0:
+            return 0
+        reusd = pools["reusd"]
+        if token == CRV:
+            return reusd.tricrv.exchange(2, 1, amount)
+        elif token == CVX:
+            return pools["cvx_eth"].exchange(1, 0, amount)
+        elif token == FXS:
+            return fxs_to_eth(amount, self.option, self.fxs)
+        elif token == PRISMA:
+            return pools["prisma_eth"].exchange(1, 0, amount)
+        if token == REUSD_TOKEN:
+            # reUSD -> scrvUSD -> crvUSD
+            amount = reusd.scrvusd.redeem(reusd.reusd_pool.exchange(0, 1, amount))
+        return reusd.tricrv.exchange(0, 1, amount)
+
+    def to_cvxcrv(self, pools, amount):
+        if self.lock or amount == 0:
+            return amount
+        return pools["cvxcrv_crv"].exchange(0, 1, amount)
+
+    def get_total_eth(self, weights):
+        # (total ETH value after fees, fee, ETH value of each token balance)
+        total_eth = self.eth_balance
+        amounts = [0] * len(weights)
+        for i, weight in enumerate(weights):
+            if weight > 0 and self.balances[i] > 1:
+                amounts[i] = self.balances[i] * self.prices[i] // 10**18
+                total_eth += amounts[i]
+        fee_amount = total_eth * self.platform_fee // MAX_WEIGHT_1E9
+        # fees are only levied if there is enough ETH in the contract
+        if self.eth_balance < fee_amount:
+            fee_amount = 0
+        return total_eth - fee_amount, fee_amount, amounts
+
+    def simulate(self, weights, adjust_order):
+        # (fee amount, output amounts) of adjust(weights, adjust_order), the
+        # CRV output is the cvxCRV amount
+        total_eth, fee_amount, amounts = self.get_total_eth(weights)
+        eth_balance = self.eth_balance - fee_amount
+        output_amounts = [0] * len(weights)
+        pools = self.pools()
+        for i, index in enumerate(adjust_order):
+            if weights[index] == 0:
+                continue
+            token = self.output_tokens[index]
+            desired = total_eth * weights[index] // MAX_WEIGHT_1E9
+            if amounts[index] > desired:
+                sold = (amounts[index] - desired) * 10**18 // self.prices[index]
+                eth_balance += self.sell(pools, token, sold)
+                output = self.balances[index] - sold
+            else:
+                swap_amount = desired - amounts[index]
+                # last token gets whatever ETH is left
+                if i == len(adjust_order) - 1:
+                    swap_amount = eth_balance
+                eth_balance -= swap_amount
+                if eth_balance < 0:
+                    raise InsufficientEth(self.output_tokens[index])
+                output = self.balances[index] + self.buy(pools, token, swap_amount)
+            if token == CRV:
+                output = self.to_cvxcrv(pools, output)
+            output_amounts[index] = output
+        return fee_amount, output_amounts
+
+    def simulate_batch(self, weights, adjust_order):
+        # simulate over a matrix of weights (one candidate per row), returns
+        # the list of fee amounts and the matrix of output amounts
+        fee_amounts, output_amounts = [], []
+        for row in weights:
+            fee_amount, outputs = self.simulate(row, adjust_order)
+            fee_amounts.append(fee_amount)
+            output_amounts.append(outputs)
+        return fee_amounts, output_amounts
+
+    def get_value(self, index, amount):
+        # ETH value of an output amount at oracle price, cvxCRV valued as CRV
+        return amount * self.prices[index] // 10**18
+
+    def plan(self, weights, slippage=100):
+        # adjust order and min amounts maximizing the value delivered for
+        # weights. sells go first so that buys don't run out of ETH. the
+        # order of the buys still matters as swaps sharing a pool (CRV, crvUSD
+        # and reUSD on tricrv) move its price for the next ones and the last
+        # token buys with the ETH left: starting from the smallest buys first,
+        # each buy is tried in last position, then neighbouring buys are
+        # swapped as long as it improves the value
+        # slippage in bps, returns (adjust order, min amounts, output amounts)
+        total_eth, _, amounts = self.get_total_eth(weights)
+        inactive, sells, buys = [], [], []
+        for index, weight in enumerate(weights):
+            desired = total_eth * weight // MAX_WEIGHT_1E9
+            if weight == 0:
+                inactive.append(index)
+            elif amounts[index] > desired:
+                sells.append(index)
+            else:
+                buys.append((desired - amounts[index], index))
+        buys = [index for _, index in sorted(buys)]
+
+        results = {}
+
+        def evaluate(buys):
+            # (value, outputs), value is None if the order runs out of ETH
+            if buys not in results:
+                try:
+                    order = inactive + sells + list(buys)
+                    _, outputs = self.simulate(weights, order)
+                    value = sum(self.get_value(i, outputs[i]) for i in order)
+                    results[buys] = (value, outputs)
+                except InsufficientEth:
+                    results[buys] = (None, None)
+            return results[buys]
+
+        def better(a, b):
+            return evaluate(a)[0] is not None and (
+                evaluate(b)[0] is None or evaluate(a)[0] > evaluate(b)[0]
+            )
+
+        best = tuple(buys)
+        for last in buys[:-1]:
+            candidate = tuple(i for i in buys if i != last) + (last,)
+            if better(candidate, best):
+                best = candidate
+        improved = True
+        while improved:
+            improved = False
+            for k in range(len(best) - 1):
+                candidate = best[:k] + (best[k + 1], best[k]) + best[k + 2 :]
+                if better(candidate, best):
+                    best, improved = candidate, True
+        value, outputs = evaluate(best)
+        if value is None:
+            raise InsufficientEth("Not enough ETH for the buys")
+        order = inactive + sells + list(best)
+
+        min_amounts = [
+            apply_tolerance(output, slippage) if weights[i] > 0 else 0
+            for i, output in enumerate(outputs)
+        ]
+        return order, min_amounts, outputs
@@ -21,6 +21,17 @@ from tests.utils.constants import (
     AURABAL_BAL_ETH_BPT_POOL_ID,
     AURABAL_TOKEN,
 )
+from tests.utils.balancer import LocalVault, WeightedPool, StablePool, LinearPool
+from tests.utils.cache import cached_call
+
+# pools quoted by the helpers below and their type
+BALANCER_POOLS = {
+    AURABAL_BAL_ETH_BPT_POOL_ID: StablePool.add_snapshot,
+    AURA_ETH_POOL_ID: WeightedPool.add_legacy_snapshot,
+    BBUSD_AAVE_POOL_ID: StablePool.add_composable_snapshot,
+    BBUSDC_USDC_POOL_ID: LinearPool.add_snapshot,
+    ETH_USDC_POOL_ID: WeightedPool.add_legacy_snapshot,
+}
 
 
 # currently not needed but might change
@@ -28,8 +39,29 @@ def get_minter_minted():
     return 0
 
 
-def get_aurabal_to_lptoken_amount(amount):
-    vault = interface.IBalancerVault(BAL_VAULT)
+def get_local_balancer(pools=None):
+    # snapshot of the pools for offline queryBatchSwap estimates
+    return LocalVault.from_chain(BALANCER_POOLS if pools is None else pools)
+
+
+def query_batch_swap(swap_steps, assets, balancer=None):
+    # amount of the last asset received for a GIVEN_IN batch swap, computed
+    # on a LocalVault snapshot if one is passed
+    if balancer is not None:
+        return balancer.query_batch_swap(0, swap_steps, assets)[-1] * -1
+    funds = (WETH, False, WETH, False)
+    query = cached_call(
+        interface.IBalancerVault(BAL_VAULT).queryBatchSwap,
+        0,
+        swap_steps,
+        assets,
+        funds,
+        {"from": accounts[0]},
+    )
+    return query[-1] * -1
+
+
+def get_aurabal_to_lptoken_amount(amount, balancer=None):
     swap_step = (
         AURABAL_BAL_ETH_BPT_POOL_ID,
         0,
@@ -38,14 +70,10 @@ def get_aurabal_to_lptoken_amount(amount):
         eth_abi.encode_abi(["uint256"], [0]),
     )
     assets = [AURA_BAL_TOKEN, BAL_ETH_POOL_TOKEN]
-    funds = (WETH, False, WETH, False)
-    query = vault.queryBatchSwap(0, [swap_step], assets, funds, {"from": accounts[0]})
-    # assert False == True
-    return query.return_value[-1] * -1
+    return query_batch_swap([swap_step], assets, balancer)
 
 
-def get_aura_to_eth_amount(amount):
-    vault = interface.IBalancerVault(BAL_VAULT)
+def get_aura_to_eth_amount(amount, balancer=None):
     swap_step = (
         AURA_ETH_POOL_ID,
         0,  # AURA Index
@@ -54,13 +82,10 @@ def get_aura_to_eth_amount(amount):
         eth_abi.encode_abi(["uint256"], [0]),
     )
     assets = [AURA_TOKEN, WETH]
-    funds = (WETH, False, WETH, False)
-    query = vault.queryBatchSwap(0, [swap_step], assets, funds, {"from": accounts[0]})
-    return query.return_value[-1] * -1
+    return query_batch_swap([swap_step], assets, balancer)
 
 
-def get_bbusd_to_eth_amount(amount):
-    vault = interface.IBalancerVault(BAL_VAULT)
+def get_bbusd_to_eth_amount(amount, balancer=None):
     assets = [BBUSD_TOKEN, BBUSDC_TOKEN, USDC_TOKEN, WETH]
     indices = {assets[idx]: idx for idx in range(len(assets))}
 
@@ -88,12 +113,10 @@ def get_bbusd_to_eth_amount(amount):
         ),
     ]
 
-    funds = (WETH, False, WETH, False)
-    query = vault.queryBatchSwap(0, swap_steps, assets, funds, {"from": accounts[0]})
-    return query.return_value[-1] * -1
+    return query_batch_swap(swap_steps, assets, balancer)
 
 
-def calc_rewards(strategy):
+def calc_rewards(strategy, balancer=None):
     staking = interface.IBasicRewards(AURA_BAL_STAKING)
     bal_rewards = staking.earned(strategy)
     aura_rewards = interface.IAuraMining(AURA_MINING_LIB).ConvertBalToAura(
@@ -101,8 +124,8 @@ def calc_rewards(strategy):
     )
     bbusd_rewards = interface.IBasicRewards(staking.extraRewards(0)).earned(strategy)
 
-    eth_balance = get_aura_to_eth_amount(aura_rewards)
-    eth_balance += get_bbusd_to_eth_amount(bbusd_rewards)
+    eth_balance = get_aura_to_eth_amount(aura_rewards, balancer)
+    eth_balance += get_bbusd_to_eth_amount(bbusd_rewards, balancer)
 
     return bal_rewards, eth_balance
 
@@ -154,8 +177,7 @@ def estimate_underlying_received_baleth(strategy, lp_amount, asset_index):
     return token_out
 
 
-def get_blp_to_aurabal(amount):
-    vault = interface.IBalancerVault(BAL_VAULT)
+def get_blp_to_aurabal(amount, balancer=None):
     swap_step = (
         AURABAL_BAL_ETH_BPT_POOL_ID,
         0,
@@ -164,15 +186,13 @@ def get_blp_to_aurabal(amount):
         eth_abi.encode_abi(["uint256"], [0]),
     )
     assets = [BAL_ETH_POOL_TOKEN, AURABAL_TOKEN]
-    funds = (WETH, False, WETH, False)
-    query = vault.queryBatchSwap(0, [swap_step], assets, funds, {"from": accounts[0]})
-    return query.return_value[-1] * -1
+    return query_batch_swap([swap_step], assets, balancer)
 
 
-def calc_harvest_amount_aura(strategy, lock=True):
-    bal_balance, eth_balance = calc_rewards(strategy)
+def calc_harvest_amount_aura(strategy, lock=True, balancer=None):
+    bal_balance, eth_balance = calc_rewards(strategy, balancer)
     blp_tokens = estimate_wethbal_lp_tokens_received(strategy, bal_balance, eth_balance)
     if lock:
         return blp_tokens
     else:
-        return get_blp_to_aurabal(blp_tokens)
+        return get_blp_to_aurabal(blp_tokens, balancer)
@@ -0,0 +1,697 @@
+from copy import deepcopy
+
+from brownie import interface
+
+from .constants import BAL_VAULT, WETH, ADDRESS_ZERO
+from .multicall import Multicall
+
+# port of the Balancer V2 fixed point math (FixedPoint, LogExpMath,
+# WeightedMath, StableMath, LinearMath) used by the pools' onSwap, so that
+# IBalancerVault.queryBatchSwap can be evaluated from a snapshot of the pools
+
+ONE = 10**18
+AMP_PRECISION = 1000
+MAX_POW_RELATIVE_ERROR = 10000
+MAX_IN_RATIO = 3 * 10**17
+
+
+def _sdiv(a, b):
+    # solidity int256 division, truncated towards zero
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b > 0) else -q
+
+
+def _smod(a, b):
+    return a - b * _sdiv(a, b)
+
+
+def mul_down(a, b):
+    return a * b // ONE
+
+
+def mul_up(a, b):
+    product = a * b
+    return 0 if product == 0 else (product - 1) // ONE + 1
+
+
+def div_down(a, b):
+    assert b != 0, "ZERO_DIVISION"
+    return a * ONE // b
+
+
+def div_up(a, b):
+    assert b != 0, "ZERO_DIVISION"
+    return 0 if a == 0 else (a * ONE - 1) // b + 1
+
+
+def math_div_up(a, b):
+    assert b != 0, "ZERO_DIVISION"
+    return 0 if a == 0 else (a - 1) // b + 1
+
+
+def complement(x):
+    return ONE - x if x < ONE else 0
+
+
+def sub(a, b):
+    assert b <= a, "SUB_OVERFLOW"
+    return a - b
+
+
+# LogExpMath
+
+ONE_20 = 10**20
+ONE_36 = 10**36
+MAX_NATURAL_EXPONENT = 130 * 10**18
+MIN_NATURAL_EXPONENT = -41 * 10**18
+LN_36_LOWER_BOUND = ONE - 10**17
+LN_36_UPPER_BOUND = ONE + 10**17
+MILD_EXPONENT_BOUND = 2**254 // ONE_20
+
+# 18 decimal constants
+x0 = 128000000000000000000  # 2ˆ7
+a0 = 38877084059945950922200000000000000000000000000000000000  # eˆ(x0)
+x1 = 64000000000000000000  # 2ˆ6
+a1 = 6235149080811616882910000000  # eˆ(x1)
+# 20 decimal constants
+x2 = 3200000000000000000000  # 2ˆ5
+a2 = 7896296018268069516100000000000000  # eˆ(x2)
+x3 = 1600000000000000000000  # 2ˆ4
+a3 = 888611052050787263676000000  # eˆ(x3)
+x4 = 800000000000000000000  # 2ˆ3
+a4 = 298095798704172827474000  # eˆ(x4)
+x5 = 400000000000000000000  # 2ˆ2
+a5 = 5459815003314423907810  # eˆ(x5)
+x6 = 200000000000000000000  # 2ˆ1
+a6 = 738905609893065022723  # eˆ(x6)
+x7 = 100000000000000000000  # 2ˆ0
+a7 = 271828182845904523536  # eˆ(x7)
+x8 = 50000000000000000000  # 2ˆ-1
+a8 = 164872127070012814685  # eˆ(x8)
+x9 = 25000000000000000000  # 2ˆ-2
+a9 = 128402541668774148407  # eˆ(x9)
+x10 = 12500000000000000000  # 2ˆ-3
+a10 = 113314845306682631683  # eˆ(x10)
+x11 = 6250000000000000000  # 2ˆ-4
+a11 = 106449445891785942956  # eˆ(x11)
+
+_EXP_TERMS = [(x2, a2), (x3, a3), (x4, a4), (x5, a5), (x6, a6), (x7, a7)]
+_EXP_TERMS += [(x8, a8), (x9, a9)]
+_LN_TERMS = _EXP_TERMS + [(x10, a10), (x11, a11)]
+
+
+def log_exp_pow(x, y):
+    # x ** y with 18 decimals fixed point x and y
+    if y == 0:
+        return ONE
+    if x == 0:
+        return 0
+    assert x >> 255 == 0, "X_OUT_OF_BOUNDS"
+    assert y < MILD_EXPONENT_BOUND, "Y_OUT_OF_BOUNDS"
+
+    if LN_36_LOWER_BOUND < x < LN_36_UPPER_BOUND:
+        ln_36_x = _ln_36(x)
+        logx_times_y = _sdiv(ln_36_x, ONE) * y + _sdiv(_smod(ln_36_x, ONE) * y, ONE)
+    else:
+        logx_times_y = _ln(x) * y
+    logx_times_y = _sdiv(logx_times_y, ONE)
+
+    assert (
+        MIN_NATURAL_EXPONENT <= logx_times_y <= MAX_NATURAL_EXPONENT
+    ), "PRODUCT_OUT_OF_BOUNDS"
+    return log_exp_exp(logx_times_y)
+
+
+def log_exp_exp(x):
+    assert MIN_NATURAL_EXPONENT <= x <= MAX_NATURAL_EXPONENT, "INVALID_EXPONENT"
+    if x < 0:
+        return ONE * ONE // log_exp_exp(-x)
+
+    if x >= x0:
+        x -= x0
+        first_an = a0
+    elif x >= x1:
+        x -= x1
+        first_an = a1
+    else:
+        first_an = 1
+
+    x *= 100
+    product = ONE_20
+    for x_n, a_n in _EXP_TERMS:
+        if x >= x_n:
+            x -= x_n
+            product = product * a_n // ONE_20
+
+    series_sum = ONE_20
+    term = x
+    series_sum += term
+    for n in range(2, 13):
+        term = term * x // ONE_20 // n
+        series_sum += term
+
+    return product * series_sum // ONE_20 * first_an // 100
+
+
+def _ln(a):
+    if a < ONE:
+        return -_ln(ONE * ONE // a)
+
+    total = 0
+    if a >= a0 * ONE:
+        a //= a0
+        total += x0
+    if a >= a1 * ONE:
+        a //= a1
+        total += x1
+
+    total *= 100
+    a *= 100
+    for x_n, a_n in _LN_TERMS:
+        if a >= a_n:
+            a = a * ONE_20 // a_n
+            total += x_n
+
+    z = (a - ONE_20) * ONE_20 // (a + ONE_20)
+    z_squared = z * z // ONE_20
+    num = z
+    series_sum = num
+    for n in range(3, 12, 2):
+        num = num * z_squared // ONE_20
+        series_sum += num // n
+    series_sum *= 2
+
+    return (total + series_sum) // 100
+
+
+def _ln_36(x):
+    x *= ONE
+    z = _sdiv((x - ONE_36) * ONE_36, x + ONE_36)
+    z_squared = _sdiv(z * z, ONE_36)
+    num = z
+    series_sum = num
+    for n in range(3, 16, 2):
+        num = _sdiv(num * z_squared, ONE_36)
+        series_sum += _sdiv(num, n)
+    return series_sum * 2
+
+
+def pow_down(x, y):
+    if y == ONE:
+        return x
+    elif y == 2 * ONE:
+        return mul_down(x, x)
+    elif y == 4 * ONE:
+        square = mul_down(x, x)
+        return mul_down(square, square)
+    raw = log_exp_pow(x, y)
+    max_error = mul_up(raw, MAX_POW_RELATIVE_ERROR) + 1
+    return 0 if raw < max_error else raw - max_error
+
+
+def pow_up(x, y, legacy=False):
+    # the pools deployed before the 1, 2 and 4 exponent shortcuts (e.g.
+    # WeightedPool2Tokens) always go through log_exp_pow
+    if y == ONE and not legacy:
+        return x
+    elif y == 2 * ONE and not legacy:
+        return mul_up(x, x)
+    elif y == 4 * ONE and not legacy:
+        square = mul_up(x, x)
+        return mul_up(square, square)
+    raw = log_exp_pow(x, y)
+    return raw + mul_up(raw, MAX_POW_RELATIVE_ERROR) + 1
+
+
+# WeightedMath
+
+
+def weighted_out_given_in(
+    balance_in, weight_in, balance_out, weight_out, amount_in, legacy=False
+):
+    assert amount_in <= mul_down(balance_in, MAX_IN_RATIO), "MAX_IN_RATIO"
+    base = div_up(balance_in, balance_in + amount_in)
+    exponent = div_down(weight_in, weight_out)
+    power = pow_up(base, exponent, legacy)
+    return mul_down(balance_out, complement(power))
+
+
+# StableMath, amp includes AMP_PRECISION
+
+
+def stable_invariant(amp, balances):
+    n = len(balances)
+    total = sum(balances)
+    if total == 0:
+        return 0
+    invariant = total
+    amp_times_total = amp * n
+    for _ in range(255):
+        D_P = invariant
+        for balance in balances:
+            D_P = D_P * invariant // (balance * n)
+        prev_invariant = invariant
+        invariant = (
+            (amp_times_total * total // AMP_PRECISION + D_P * n) * invariant
+        ) // (
+            (amp_times_total - AMP_PRECISION) * invariant // AMP_PRECISION
+            + (n + 1) * D_P
+        )
+        if abs(invariant - prev_invariant) <= 1:
+            return invariant
+    raise ValueError("STABLE_INVARIANT_DIDNT_CONVERGE")
+
+
+def stable_balance_given_invariant(amp, balances, invariant, index):
+    n = len(balances)
+    amp_times_total = amp * n
+    total = balances[0]
+    P_D = balances[0] * n
+    for j in range(1, n):
+        P_D = P_D * balances[j] * n // invariant
+        total += balances[j]
+    total -= balances[index]
+
+    inv2 = invariant * invariant
+    c = math_div_up(inv2, amp_times_total * P_D) * AMP_PRECISION * balances[index]
+    b = total + invariant // amp_times_total * AMP_PRECISION
+    token_balance = math_div_up(inv2 + c, invariant + b)
+    for _ in range(255):
+        prev = token_balance
+        token_balance = math_div_up(
+            token_balance * token_balance + c, token_balance * 2 + b - invariant
+        )
+        if abs(token_balance - prev) <= 1:
+            return token_balance
+    raise ValueError("STABLE_GET_BALANCE_DIDNT_CONVERGE")
+
+
+def stable_out_given_in(amp, balances, i, j, amount_in, invariant):
+    balances = list(balances)
+    balances[i] += amount_in
+    final_balance_out = stable_balance_given_invariant(amp, balances, invariant, j)
+    return sub(balances[j], final_balance_out + 1)
+
+
+def stable_bpt_out_given_exact_tokens_in(
+    amp, balances, amounts_in, bpt_supply, invariant, swap_fee
+):
+    total = sum(balances)
+    ratios = []
+    invariant_ratio_with_fees = 0
+    for balance, amount in zip(balances, amounts_in):
+        current_weight = div_down(balance, total)
+        ratios.append(div_down(balance + amount, balance))
+        invariant_ratio_with_fees += mul_down(ratios[-1], current_weight)
+
+    new_balances = []
+    for balance, amount, ratio in zip(balances, amounts_in, ratios):
+        if ratio > invariant_ratio_with_fees:
+            non_taxable = (
+                mul_down(balance, invariant_ratio_with_fees - ONE)
+                if invariant_ratio_with_fees > ONE
+                else 0
+            )
+            fee = mul_up(sub(amount, non_taxable), swap_fee)
+            amount = sub(amount, fee)
+        new_balances.append(balance + amount)
+
+    invariant_ratio = div_down(stable_invariant(amp, new_balances), invariant)
+    return mul_down(bpt_supply, invariant_ratio - ONE) if invariant_ratio > ONE else 0
+
+
+def stable_token_out_given_exact_bpt_in(
+    amp, balances, index, bpt_in, bpt_supply, invariant, swap_fee
+):
+    new_invariant = mul_up(div_up(sub(bpt_supply, bpt_in), bpt_supply), invariant)
+    new_balance = stable_balance_given_invariant(amp, balances, new_invariant, index)
+    amount_out = sub(balances[index], new_balance)
+
+    current_weight = div_down(balances[index], sum(balances))
+    taxable = mul_up(amount_out, complement(current_weight))
+    non_taxable = sub(amount_out, taxable)
+    return non_taxable + mul_down(taxable, ONE - swap_fee)
+
+
+# LinearMath
+
+
+def linear_to_nominal(real, fee, lower, upper):
+    if real < lower:
+        return sub(real, mul_down(lower - real, fee))
+    elif real <= upper:
+        return real
+    return sub(real, mul_down(real - upper, fee))
+
+
+def linear_from_nominal(nominal, fee, lower, upper):
+    if nominal < lower:
+        return div_down(nominal + mul_down(fee, lower), ONE + fee)
+    elif nominal <= upper:
+        return nominal
+    return div_down(sub(nominal, mul_down(fee, upper)), ONE - fee)
+
+
+# Pools, swaps are GIVEN_IN and update the snapshot balances
+
+_scaling_factors = {}
+
+
+def _pool_address(pool_id):
+    return pool_id[:42]
+
+
+def _get_scaling_factors(pool_id):
+    # 10 ** (36 - decimals) of the pool tokens, fixed for a pool
+    if pool_id not in _scaling_factors:
+        tokens = interface.IBalancerVault(BAL_VAULT).getPoolTokens(pool_id)[0]
+        calls = Multicall()
+        for token in tokens:
+            calls.add(interface.IERC20(token).decimals)
+        _scaling_factors[pool_id] = [10 ** (36 - d) for d in calls.execute()]
+    return _scaling_factors[pool_id]
+
+
+def _upscale(amount, scaling_factor):
+    return mul_down(amount, scaling_factor)
+
+
+def _downscale_down(amount, scaling_factor):
+    return div_down(amount, scaling_factor)
+
+
+class WeightedPool(object):
+    # legacy for the pools using the FixedPoint without pow shortcuts, such as
+    # WeightedPool2Tokens (e.g. BAL/WETH 80/20, USDC/WETH and AURA/WETH)
+
+    def __init__(
+        self, tokens, balances, scaling_factors, weights, swap_fee, legacy=False
+    ):
+        self.tokens = [t.lower() for t in tokens]
+        self.balances = list(balances)
+        self.scaling_factors = list(scaling_factors)
+        self.weights = list(weights)
+        self.swap_fee = swap_fee
+        self.legacy = legacy
+
+    @classmethod
+    def add_snapshot(cls, calls, pool_id, legacy=False):
+        pool = interface.IBalancerWeightedPool(_pool_address(pool_id))
+        scaling_factors = _get_scaling_factors(pool_id)
+        tokens = calls.add(interface.IBalancerVault(BAL_VAULT).getPoolTokens, pool_id)
+        weights = calls.add(pool.getNormalizedWeights)
+        fee = calls.add(pool.getSwapFeePercentage)
+
+        def load(results):
+            return cls(
+                results[tokens][0],
+                results[tokens][1],
+                scaling_factors,
+                results[weights],
+                results[fee],
+                legacy,
+            )
+
+        return load
+
+    @classmethod
+    def add_legacy_snapshot(cls, calls, pool_id):
+        return cls.add_snapshot(calls, pool_id, True)
+
+    def swap(self, token_in, token_out, amount):
+        i, j = self.tokens.index(token_in), self.tokens.index(token_out)
+        amount_in = _upscale(
+            amount - mul_up(amount, self.swap_fee), self.scaling_factors[i]
+        )
+        amount_out = weighted_out_given_in(
+            _upscale(self.balances[i], self.scaling_factors[i]),
+            self.weights[i],
+            _upscale(self.balances[j], self.scaling_factors[j]),
+            self.weights[j],
+            amount_in,
+            self.legacy,
+        )
+        amount_out = _downscale_down(amount_out, self.scaling_factors[j])
+        self.balances[i] += amount
+        self.balances[j] -= amount_out
+        return amount_out
+
+
+class StablePool(object):
+    # legacy stable pools and composable stable pools (e.g. bb-a-USD), for
+    # the latter the pool's own BPT is one of the tokens and swaps from or to
+    # it are single token joins / exits. scaling factors include token rates
+
+    def __init__(
+        self,
+        tokens,
+        balances,
+        scaling_factors,
+        amp,
+        swap_fee,
+        bpt_index=None,
+        bpt_supply=0,
+    ):
+        self.tokens = [t.lower() for t in tokens]
+        self.balances = list(balances)
+        self.scaling_factors = list(scaling_factors)
+        self.amp = amp
+        self.swap_fee = swap_fee
+        self.bpt_index = bpt_index
+        self.bpt_supply = bpt_supply
+
+    @classmethod
+    def add_snapshot(cls, calls, pool_id, composable=False):
+        pool = interface.IBalancerStablePool(_pool_address(pool_id))
+        tokens = calls.add(interface.IBalancerVault(BAL_VAULT).getPoolTokens, pool_id)
+        amp = calls.add(pool.getAmplificationParameter)
+        fee = calls.add(pool.getSwapFeePercentage)
+        if composable:
+            scaling_factors = calls.add(pool.getScalingFactors)
+            bpt_index = calls.add(pool.getBptIndex)
+            bpt_supply = calls.add(pool.getActualSupply)
+        else:
+            fixed_scaling_factors = _get_scaling_factors(pool_id)
+
+        def load(results):
+            if composable:
+                return cls(
+                    results[tokens][0],
+                    results[tokens][1],
+                    results[scaling_factors],
+                    results[amp][0],
+                    results[fee],
+                    results[bpt_index],
+                    results[bpt_supply],
+                )
+            return cls(
+                results[tokens][0],
+                results[tokens][1],
+                fixed_scaling_factors,
+                results[amp][0],
+                results[fee],
+            )
+
+        return load
+
+    @classmethod
+    def add_composable_snapshot(cls, calls, pool_id):
+        return cls.add_snapshot(calls, pool_id, True)
+
+    def _upscaled_balances(self):
+        # balances without the BPT, with the index mapping
+        indexes = [k for k in range(len(self.tokens)) if k != self.bpt_index]
+        balances = [
+            _upscale(self.balances[k], self.scaling_factors[k]) for k in indexes
+        ]
+        return indexes, balances
+
+    def swap(self, token_in, token_out, amount):
+        i, j = self.tokens.index(token_in), self.tokens.index(token_out)
+        indexes, balances = self._upscaled_balances()
+        invariant = stable_invariant(self.amp, balances)
+
+        if j == self.bpt_index:
+            amounts_in = [0] * len(balances)
+            amounts_in[indexes.index(i)] = _upscale(amount, self.scaling_factors[i])
+            amount_out = stable_bpt_out_given_exact_tokens_in(
+                self.amp,
+                balances,
+                amounts_in,
+                self.bpt_supply,
+                invariant,
+                self.swap_fee,
+            )
+            self.bpt_supply += amount_out
+        elif i == self.bpt_index:
+            amount_out = stable_token_out_given_exact_bpt_in(
+                self.amp,
+                balances,
+                indexes.index(j),
+                amount,
+                self.bpt_supply,
+                invariant,
+                self.swap_fee,
+            )
+            self.bpt_supply -= amount
+        else:
+            amount_in = _upscale(
+                amount - mul_up(amount, self.swap_fee), self.scaling_factors[i]
+            )
+            amount_out = stable_out_given_in(
+                self.amp,
+                balances,
+                indexes.index(i),
+                indexes.index(j),
+                amount_in,
+                invariant,
+            )
+        amount_out = _downscale_down(amount_out, self.scaling_factors[j])
+        self.balances[i] += amount
+        self.balances[j] -= amount_out
+        return amount_out
+
+
+class LinearPool(object):
+    # main token <-> BPT swaps of linear pools (e.g. bb-a-USDC), targets are
+    # in main token units
+
+    def __init__(
+        self,
+        tokens,
+        balances,
+        scaling_factors,
+        main_index,
+        wrapped_index,
+        bpt_index,
+        lower_target,
+        upper_target,
+        swap_fee,
+        bpt_supply,
+    ):
+        self.tokens = [t.lower() for t in tokens]
+        self.balances = list(balances)
+        self.scaling_factors = list(scaling_factors)
+        self.main_index = main_index
+        self.wrapped_index = wrapped_index
+        self.bpt_index = bpt_index
+        self.lower_target = _upscale(lower_target, scaling_factors[main_index])
+        self.upper_target = _upscale(upper_target, scaling_factors[main_index])
+        self.swap_fee = swap_fee
+        self.bpt_supply = bpt_supply
+
+    @classmethod
+    def add_snapshot(cls, calls, pool_id):
+        pool = interface.IBalancerLinearPool(_pool_address(pool_id))
+        indexes = [
+            calls.add(interface.IBalancerVault(BAL_VAULT).getPoolTokens, pool_id)
+        ]
+        for method in (
+            pool.getScalingFactors,
+            pool.getMainIndex,
+            pool.getWrappedIndex,
+            pool.getBptIndex,
+            pool.getTargets,
+            pool.getSwapFeePercentage,
+            pool.getVirtualSupply,
+        ):
+            indexes.append(calls.add(method))
+
+        def load(results):
+            values = [results[i] for i in indexes]
+            tokens, scaling_factors, main, wrapped, bpt, targets, fee, supply = values
+            return cls(
+                tokens[0],
+                tokens[1],
+                scaling_factors,
+                main,
+                wrapped,
+                bpt,
+                targets[0],
+                targets[1],
+                fee,
+                supply,
+            )
+
+        return load
+
+    def swap(self, token_in, token_out, amount):
+        i, j = self.tokens.index(token_in), self.tokens.index(token_out)
+        params = (self.swap_fee, self.lower_target, self.upper_target)
+        main_balance = _upscale(
+            self.balances[self.main_index], self.scaling_factors[self.main_index]
+        )
+        wrapped_balance = _upscale(
+            self.balances[self.wrapped_index], self.scaling_factors[self.wrapped_index]
+        )
+        nominal_main = linear_to_nominal(main_balance, *params)
+        invariant = nominal_main + wrapped_balance
+
+        if i == self.bpt_index and j == self.main_index:
+            delta = invariant * amount // self.bpt_supply
+            new_main = linear_from_nominal(sub(nominal_main, delta), *params)
+            amount_out = sub(main_balance, new_main)
+            self.bpt_supply -= amount
+        elif i == self.main_index and j == self.bpt_index:
+            main_in = _upscale(amount, self.scaling_factors[i])
+            if self.bpt_supply == 0:
+                amount_out = linear_to_nominal(main_in, *params)
+            else:
+                delta = (
+                    linear_to_nominal(main_balance + main_in, *params) - nominal_main
+                )
+                amount_out = self.bpt_supply * delta // invariant
+            self.bpt_supply += amount_out
+        else:
+            raise ValueError("Only main token <-> BPT swaps are supported")
+        amount_out = _downscale_down(amount_out, self.scaling_factors[j])
+        self.balances[i] += amount
+        self.balances[j] -= amount_out
+        return amount_out
+
+
+class LocalVault(object):
+    # in process IBalancerVault.queryBatchSwap over snapshotted pools
+    # pools maps pool ids to pool snapshots
+
+    def __init__(self, pools):
+        self.pools = {pool_id.lower(): pool for pool_id, pool in pools.items()}
+
+    @classmethod
+    def from_chain(cls, pools):
+        calls = Multicall()
+        load = cls.add_snapshot(calls, pools)
+        return load(calls.execute())
+
+    @classmethod
+    def add_snapshot(cls, calls, pools):
+        # pools maps pool ids to the add_snapshot method of their pool type
+        loaders = {pool_id: add(calls, pool_id) for pool_id, add in pools.items()}
+        return lambda results: cls(
+            {pool_id: load(results) for pool_id, load in loaders.items()}
+        )
+
+    def query_batch_swap(self, kind, swaps, assets):
+        # asset deltas of a GIVEN_IN batch swap, positive amounts are sent to
+        # the vault and negative ones received. the snapshot is not modified
+        assert kind == 0, "Only GIVEN_IN swaps are supported"
+        pools = {}
+        assets = [WETH if a == ADDRESS_ZERO else a for a in assets]
+        deltas = [0] * len(assets)
+        previous = None
+        for pool_id, index_in, index_out, amount, _ in swaps:
+            pool_id = pool_id.lower() if isinstance(pool_id, str) else pool_id.hex()
+            pool_id = pool_id if pool_id.startswith("0x") else "0x" + pool_id
+            if amount == 0:
+                assert previous is not None, "UNKNOWN_AMOUNT_IN_FIRST_SWAP"
+                assert previous[0] == index_in, "MALCONSTRUCTED_MULTIHOP_SWAP"
+                amount = previous[1]
+            if pool_id not in pools:
+                pools[pool_id] = deepcopy(self.pools[pool_id])
+            amount_out = pools[pool_id].swap(
+                assets[index_in].lower(), assets[index_out].lower(), amount
+            )
+            deltas[index_in] += amount
+            deltas[index_out] -= amount_out
+            previous = (index_out, amount_out)
+        return deltas
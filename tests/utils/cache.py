@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+from functools import wraps
+
+# quotes memoized within an estimate. the chain is assumed not to move while
+# a pinned() block runs (no transaction, no chain.sleep), entries are keyed by
+# (contract, selector, args) and dropped when the outermost block exits, so
+# nothing is fetched to check the block and no stale entry survives a mined
+# block, a rewind or a time jump. outside of a pinned block nothing is cached
+
+
+def _freeze(value):
+    # hashable version of call arguments (structs, arrays, tx dicts)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class QuoteCache(object):
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.depth = 0
+        self.results = {}
+
+    def clear(self):
+        self.results = {}
+
+    @contextmanager
+    def pinned(self):
+        self.depth += 1
+        try:
+            yield self
+        finally:
+            self.depth -= 1
+            if self.depth == 0:
+                self.clear()
+
+    def get(self, key, compute):
+        # result of compute() memoized under key for the current pinned block
+        if self.depth == 0:
+            return compute()
+        key = _freeze(key)
+        if key in self.results:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.results[key] = compute()
+        return self.results[key]
+
+    def call(self, method, *args):
+        # method is a brownie contract method, e.g. ICurveV2Pool(pool).get_dy
+        # non view methods (e.g. IBalancerVault.queryBatchSwap) are eth_call'ed
+        return self.get(
+            (method._address, method.signature, args), lambda: method.call(*args)
+        )
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.results)}
+
+
+quote_cache = QuoteCache()
+
+
+def cached_call(method, *args):
+    return quote_cache.call(method, *args)
+
+
+def pinned_quotes(func):
+    # runs func within quote_cache.pinned(), for estimates that only read
+    @wraps(func)
+    def wrapped(*args, **kwargs):
+        with quote_cache.pinned():
+            return func(*args, **kwargs)
+
+    return wrapped
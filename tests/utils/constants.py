@@ -123,6 +123,8 @@ SREUSD_VAULT = "0x557AB1e003951A73c12D16F0fEA8490E39C33C35"
 
 VOTIUM_REGISTRY = "0x92e6E43f99809dF84ed2D533e1FD8017eb966ee2"
 
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
 CURVE_VOTING_ESCROW = "0xd2d43555134dc575bf7279f4ba18809645db0f1d"
 FXS_VOTING_ESCROW = "0xc8418aF6358FFddA74e09Ca9CC3Fe03Ca6aDC5b0"
 
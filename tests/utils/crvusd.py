@@ -1,5 +1,6 @@
 from brownie import interface
 
+from .cache import cached_call
 from .constants import (
     CVX,
     CURVE_CVXPRISMA_PRISMA_POOL,
@@ -9,32 +10,61 @@ from .constants import (
     CURVE_TRICRV_POOL,
     SCRVUSD_VAULT,
 )
+from .cryptoswap import CryptoSwapPool
 from .cvxfxs import get_cvx_to_eth_amount
+from .erc4626 import ERC4626Snapshot
+from .multicall import Multicall
 
 
-def eth_to_crvusd(amount):
-    return (
-        interface.ICurveV2Pool(CURVE_TRICRV_POOL).get_dy(1, 0, amount)
-        if amount > 0
-        else 0
-    )
+# the conversions below take an optional CrvUsdSnapshot to be computed
+# locally instead of through eth_calls
 
 
-def crvusd_to_eth(amount):
-    return (
-        interface.ICurveV2Pool(CURVE_TRICRV_POOL).get_dy(0, 1, amount)
-        if amount > 0
-        else 0
-    )
+def eth_to_crvusd(amount, snapshot=None):
+    if amount == 0:
+        return 0
+    if snapshot is not None:
+        return snapshot.tricrv.get_dy(1, 0, amount)
+    return cached_call(interface.ICurveV2Pool(CURVE_TRICRV_POOL).get_dy, 1, 0, amount)
+
+
+def crvusd_to_eth(amount, snapshot=None):
+    if amount == 0:
+        return 0
+    if snapshot is not None:
+        return snapshot.tricrv.get_dy(0, 1, amount)
+    return cached_call(interface.ICurveV2Pool(CURVE_TRICRV_POOL).get_dy, 0, 1, amount)
 
 
-def crvusd_to_scrvusd(amount):
+def crvusd_to_scrvusd(amount, snapshot=None):
     if amount == 0:
         return 0
+    if snapshot is not None:
+        return snapshot.scrvusd.convert_to_shares(amount)
     return interface.IERC4626(SCRVUSD_VAULT).convertToShares(amount)
 
 
-def scrvusd_to_crvusd(amount):
+def scrvusd_to_crvusd(amount, snapshot=None):
     if amount == 0:
         return 0
+    if snapshot is not None:
+        return snapshot.scrvusd.convert_to_assets(amount)
     return interface.IERC4626(SCRVUSD_VAULT).convertToAssets(amount)
+
+
+class CrvUsdSnapshot(object):
+    # states of the pools and vaults used by the conversions above, read in
+    # a single multicall
+
+    def __init__(self):
+        calls = Multicall()
+        loaders = self.add_snapshots(calls)
+        results = calls.execute()
+        for name, load in loaders.items():
+            setattr(self, name, load(results))
+
+    def add_snapshots(self, calls):
+        return {
+            "tricrv": CryptoSwapPool.add_snapshot(calls, CURVE_TRICRV_POOL, 3, ng=True),
+            "scrvusd": ERC4626Snapshot.add_snapshot(calls, SCRVUSD_VAULT),
+        }
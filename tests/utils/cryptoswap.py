@@ -0,0 +1,455 @@
+from math import isqrt
+
+from brownie import interface
+
+from .constants import MULTICALL3
+from .multicall import Multicall
+
+# port of the CryptoSwap (v2) integer math used by the on chain get_dy
+# the 2 coin functions follow curve-crypto-contract / the crypto factory pools,
+# the 3 coin ones follow tricrypto2, with get_y_ng / reduction_coefficient_ng
+# for tricrypto-ng
+
+PRECISION = 10**18
+A_MULTIPLIER = 10000
+
+_precisions = {}
+
+
+def _sort(x):
+    # from high to low
+    return sorted(x, reverse=True)
+
+
+def geometric_mean(x, sort=True):
+    n = len(x)
+    if sort:
+        x = _sort(x)
+    D = x[0]
+    for _ in range(255):
+        D_prev = D
+        if n == 2:
+            D = (D + x[0] * x[1] // D) // n
+        else:
+            tmp = 10**18
+            for _x in x:
+                tmp = tmp * _x // D
+            D = D * ((n - 1) * 10**18 + tmp) // (n * 10**18)
+        diff = abs(D - D_prev)
+        if diff <= 1 or diff * 10**18 < D:
+            return D
+    raise ValueError("Did not converge")
+
+
+def newton_D(ANN, gamma, x_unsorted):
+    n = len(x_unsorted)
+    x = _sort(x_unsorted)
+
+    D = n * geometric_mean(x, False)
+    S = sum(x)
+
+    for _ in range(255):
+        D_prev = D
+
+        if n == 2:
+            K0 = (10**18 * n**2) * x[0] // D * x[1] // D
+        else:
+            K0 = 10**18
+            for _x in x:
+                K0 = K0 * _x * n // D
+
+        _g1k0 = gamma + 10**18
+        if _g1k0 > K0:
+            _g1k0 = _g1k0 - K0 + 1
+        else:
+            _g1k0 = K0 - _g1k0 + 1
+
+        # D / (A * N**N) * _g1k0**2 / gamma**2
+        mul1 = 10**18 * D // gamma * _g1k0 // gamma * _g1k0 * A_MULTIPLIER // ANN
+
+        # 2*N*K0 / _g1k0
+        mul2 = (2 * 10**18) * n * K0 // _g1k0
+
+        neg_fprime = (S + S * mul2 // 10**18) + mul1 * n // K0 - mul2 * D // 10**18
+
+        # D -= f / fprime
+        D_plus = D * (neg_fprime + S) // neg_fprime
+        D_minus = D * D // neg_fprime
+        if 10**18 > K0:
+            D_minus += D * (mul1 // neg_fprime) // 10**18 * (10**18 - K0) // K0
+        else:
+            D_minus -= D * (mul1 // neg_fprime) // 10**18 * (K0 - 10**18) // K0
+
+        if D_plus > D_minus:
+            D = D_plus - D_minus
+        else:
+            D = (D_minus - D_plus) // 2
+
+        if abs(D - D_prev) * 10**14 < max(10**16, D):
+            for _x in x:
+                frac = _x * 10**18 // D
+                assert 10**16 - 1 < frac < 10**20 + 1, "unsafe values x[i]"
+            return D
+
+    raise ValueError("Did not converge")
+
+
+def newton_y(ANN, gamma, x, D, i):
+    n = len(x)
+    if n == 2:
+        x_j = x[1 - i]
+        y = D**2 // (x_j * n**2)
+        K0_i = (10**18 * n) * x_j // D
+        assert 10**16 * n - 1 < K0_i < 10**20 * n + 1, "unsafe values x[i]"
+        S_i = x_j
+        convergence_limit = max(max(x_j // 10**14, D // 10**14), 100)
+    else:
+        y = D // n
+        K0_i = 10**18
+        S_i = 0
+        x_sorted = list(x)
+        x_sorted[i] = 0
+        x_sorted = _sort(x_sorted)
+        convergence_limit = max(max(x_sorted[0] // 10**14, D // 10**14), 100)
+        for j in range(2, n + 1):
+            _x = x_sorted[n - j]
+            y = y * D // (_x * n)
+            S_i += _x
+        for j in range(n - 1):
+            K0_i = K0_i * x_sorted[j] * n // D
+
+    for _ in range(255):
+        y_prev = y
+
+        K0 = K0_i * y * n // D
+        S = S_i + y
+
+        _g1k0 = gamma + 10**18
+        if _g1k0 > K0:
+            _g1k0 = _g1k0 - K0 + 1
+        else:
+            _g1k0 = K0 - _g1k0 + 1
+
+        # D / (A * N**N) * _g1k0**2 / gamma**2
+        mul1 = 10**18 * D // gamma * _g1k0 // gamma * _g1k0 * A_MULTIPLIER // ANN
+
+        # 2*K0 / _g1k0
+        mul2 = 10**18 + (2 * 10**18) * K0 // _g1k0
+
+        yfprime = 10**18 * y + S * mul2 + mul1
+        _dyfprime = D * mul2
+        if yfprime < _dyfprime:
+            y = y_prev // 2
+            continue
+        yfprime -= _dyfprime
+        fprime = yfprime // y
+
+        # y -= f / f_prime;  y = (y * fprime - f) / fprime
+        y_minus = mul1 // fprime
+        y_plus = (yfprime + 10**18 * D) // fprime + y_minus * 10**18 // K0
+        y_minus += 10**18 * S // fprime
+
+        if y_plus < y_minus:
+            y = y_prev // 2
+        else:
+            y = y_plus - y_minus
+
+        if abs(y - y_prev) < max(convergence_limit, y // 10**14):
+            frac = y * 10**18 // D
+            assert 10**16 - 1 < frac < 10**20 + 1, "unsafe value for y"
+            return y
+
+    raise ValueError("Did not converge")
+
+
+def _sdiv(a, b):
+    # int256 division of the ng math, truncated towards zero
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b > 0) else -q
+
+
+# (2 ** 256 - 1) // 10 ** 36, above it x * 10 ** 36 would overflow
+CBRT_LIMIT = 115792089237316195423570985008687907853269
+
+
+def cbrt(x):
+    # cube root of x with 18 decimals, as _cbrt of the tricrypto-ng math
+    if x >= CBRT_LIMIT * 10**18:
+        xx = x
+    elif x >= CBRT_LIMIT:
+        xx = x * 10**18
+    else:
+        xx = x * 10**36
+
+    log2x = xx.bit_length() - 1 if xx > 0 else 0
+    remainder = log2x % 3
+    a = 2 ** (log2x // 3) * 1260**remainder // 1000**remainder
+    for _ in range(7):
+        a = (2 * a + xx // (a * a)) // 3
+
+    if x >= CBRT_LIMIT * 10**18:
+        a *= 10**12
+    elif x >= CBRT_LIMIT:
+        a *= 10**6
+    return a
+
+
+def get_y_ng(ANN, gamma, x, D, i):
+    # analytical solution of the 3 coin invariant for x[i] used by
+    # tricrypto-ng, which falls back to newton_y when it has no real root
+    for k in range(3):
+        if k != i:
+            frac = x[k] * 10**18 // D
+            assert 10**16 - 1 < frac < 10**20 + 1, "unsafe values x[i]"
+
+    j, k = [m for m in range(3) if m != i]
+    x_j, x_k = x[j], x[k]
+    gamma2 = gamma * gamma
+
+    a = 10**36 // 27
+    # 10**36/9 + 2*10**18*gamma/27 - D**2/x_j*gamma**2*ANN/27**2/A_MULTIPLIER/x_k
+    b = (
+        10**36 // 9
+        + 2 * 10**18 * gamma // 27
+        - D * D // x_j * gamma2 * ANN // 27**2 // A_MULTIPLIER // x_k
+    )
+    # 10**36/9 + gamma*(gamma + 4*10**18)/27 + gamma**2*(x_j+x_k-D)/D*ANN/27/A_MULTIPLIER
+    c = (
+        10**36 // 9
+        + gamma * (gamma + 4 * 10**18) // 27
+        + _sdiv(_sdiv(_sdiv(gamma2 * (x_j + x_k - D), D) * ANN, 27), A_MULTIPLIER)
+    )
+    # (10**18 + gamma)**2/27
+    d = (10**18 + gamma) ** 2 // 27
+
+    # abs(3*a*c/b - b)
+    d0 = abs(_sdiv(3 * a * c, b) - b)
+    divider = 1
+    for limit, value in (
+        (10**48, 10**30),
+        (10**44, 10**26),
+        (10**40, 10**22),
+        (10**36, 10**18),
+        (10**32, 10**14),
+        (10**28, 10**10),
+        (10**24, 10**6),
+        (10**20, 10**2),
+    ):
+        if d0 > limit:
+            divider = value
+            break
+
+    if abs(a) > abs(b):
+        additional_prec = abs(_sdiv(a, b))
+        a = _sdiv(a * additional_prec, divider)
+        b = _sdiv(b * additional_prec, divider)
+        c = _sdiv(c * additional_prec, divider)
+        d = _sdiv(d * additional_prec, divider)
+    else:
+        additional_prec = abs(_sdiv(b, a))
+        a = _sdiv(_sdiv(a, additional_prec), divider)
+        b = _sdiv(_sdiv(b, additional_prec), divider)
+        c = _sdiv(_sdiv(c, additional_prec), divider)
+        d = _sdiv(_sdiv(d, additional_prec), divider)
+
+    # 3*a*c/b - b
+    _3ac = 3 * a * c
+    delta0 = _sdiv(_3ac, b) - b
+    # 9*a*c/b - 2*b - 27*a**2/b*d/b
+    delta1 = _sdiv(3 * _3ac, b) - 2 * b - _sdiv(_sdiv(27 * a**2, b) * d, b)
+    # delta1**2 + 4*delta0**2/b*delta0
+    sqrt_arg = delta1**2 + _sdiv(4 * delta0**2, b) * delta0
+    if sqrt_arg <= 0:
+        return newton_y(ANN, gamma, x, D, i)
+    sqrt_val = isqrt(sqrt_arg)
+
+    b_cbrt = cbrt(b) if b >= 0 else -cbrt(-b)
+    if delta1 > 0:
+        second_cbrt = cbrt((delta1 + sqrt_val) // 2)
+    else:
+        second_cbrt = -cbrt(-(delta1 - sqrt_val) // 2)
+
+    # b_cbrt*b_cbrt/10**18*second_cbrt/10**18
+    C1 = _sdiv(_sdiv(b_cbrt * b_cbrt, 10**18) * second_cbrt, 10**18)
+    # (b + b*delta0/C1 - C1)/3
+    root_K0 = _sdiv(b + _sdiv(b * delta0, C1) - C1, 3)
+    # D*D/27/x_k*D/x_j*root_K0/a
+    root = _sdiv(D * D // 27 // x_k * D // x_j * root_K0, a)
+
+    frac = root * 10**18 // D
+    assert 10**16 - 1 <= frac < 10**20 + 1, "unsafe value for y"
+    return root
+
+
+def reduction_coefficient_ng(x, fee_gamma):
+    # fee_gamma / (fee_gamma + (1 - K)), K = 27 * prod(x) / sum(x) ** 3
+    S = sum(x)
+    K = 27 * 10**18 * x[0] // S * x[1] // S * x[2] // S
+    if fee_gamma > 0:
+        K = fee_gamma * 10**18 // (fee_gamma + 10**18 - K)
+    return K
+
+
+class CryptoSwapPool(object):
+    # state snapshot of a CryptoSwap pool, get_dy is then computed locally
+    # price_scale holds N - 1 prices, precisions the 10 ** (18 - decimals)
+    # multipliers of the coins. ng for tricrypto-ng, which solves y
+    # analytically and computes the fee coefficient differently
+
+    def __init__(
+        self,
+        balances,
+        precisions,
+        price_scale,
+        A,
+        gamma,
+        D,
+        mid_fee,
+        out_fee,
+        fee_gamma,
+        ramping=False,
+        ng=False,
+    ):
+        self.balances = list(balances)
+        self.precisions = list(precisions)
+        self.price_scale = list(price_scale)
+        self.A = A
+        self.gamma = gamma
+        self.D = D
+        self.mid_fee = mid_fee
+        self.out_fee = out_fee
+        self.fee_gamma = fee_gamma
+        self.ng = ng
+        # D is recomputed from the balances while A and gamma are ramping
+        if ramping:
+            self.D = newton_D(A, gamma, self.xp(self.balances))
+
+    @classmethod
+    def from_chain(cls, address, n_coins=2, ng=False):
+        calls = Multicall()
+        load = cls.add_snapshot(calls, address, n_coins, ng)
+        return load(calls.execute())
+
+    @classmethod
+    def add_snapshot(cls, calls, address, n_coins=2, ng=False):
+        # queues the state reads on calls, returns a function building the
+        # pool from the multicall results
+        if n_coins == 2:
+            pool = interface.ICurveV2Pool(address)
+        else:
+            pool = interface.ICurveTriCryptoFactoryNG(address)
+
+        if address not in _precisions:
+            coins = Multicall()
+            for i in range(n_coins):
+                coins.add(pool.coins, i)
+            decimals = Multicall()
+            for coin in coins.execute():
+                decimals.add(interface.IERC20(coin).decimals)
+            _precisions[address] = [10 ** (18 - d) for d in decimals.execute()]
+
+        indexes = [calls.add(pool.balances, i) for i in range(n_coins)]
+        if n_coins == 2:
+            indexes.append(calls.add(pool.price_scale))
+        else:
+            for k in range(n_coins - 1):
+                indexes.append(calls.add(pool.price_scale, k))
+        for method in (
+            pool.A,
+            pool.gamma,
+            pool.D,
+            pool.mid_fee,
+            pool.out_fee,
+            pool.fee_gamma,
+            pool.future_A_gamma_time,
+        ):
+            indexes.append(calls.add(method))
+        # the block timestamp the pool compares future_A_gamma_time with
+        timestamp = calls.add(
+            interface.IMulticall3(MULTICALL3).getCurrentBlockTimestamp
+        )
+
+        def load(results):
+            values = [results[i] for i in indexes]
+            balances = values[:n_coins]
+            price_scale = values[n_coins : 2 * n_coins - 1]
+            A, gamma, D, mid_fee, out_fee, fee_gamma, future_time = values[
+                2 * n_coins - 1 :
+            ]
+            # tricrypto-ng keeps future_A_gamma_time set once a ramp is over
+            ramping = future_time > results[timestamp] if ng else future_time > 0
+            return cls(
+                balances,
+                _precisions[address],
+                price_scale,
+                A,
+                gamma,
+                D,
+                mid_fee,
+                out_fee,
+                fee_gamma,
+                ramping,
+                ng,
+            )
+
+        return load
+
+    def xp(self, balances):
+        xp = [balances[0] * self.precisions[0]]
+        for k in range(len(balances) - 1):
+            xp.append(
+                balances[k + 1]
+                * self.price_scale[k]
+                * self.precisions[k + 1]
+                // PRECISION
+            )
+        return xp
+
+    def fee(self, xp):
+        n = len(xp)
+        S = sum(xp)
+        if self.ng:
+            f = reduction_coefficient_ng(xp, self.fee_gamma)
+            return (self.mid_fee * f + self.out_fee * (10**18 - f)) // 10**18
+        if n == 2:
+            f = 10**18 * n**n
+            for _x in xp:
+                f = f * _x // S
+        else:
+            f = 10**18
+            for _x in xp:
+                f = f * n * _x // S
+        f = self.fee_gamma * 10**18 // (self.fee_gamma + 10**18 - f)
+        return (self.mid_fee * f + self.out_fee * (10**18 - f)) // 10**18
+
+    def get_dy(self, i, j, dx):
+        assert i != j, "same input and output coin"
+        balances = list(self.balances)
+        balances[i] += dx
+        xp = self.xp(balances)
+
+        if self.ng:
+            y = get_y_ng(self.A, self.gamma, xp, self.D, j)
+        else:
+            y = newton_y(self.A, self.gamma, xp, self.D, j)
+        dy = xp[j] - y - 1
+        xp[j] = y
+        if j > 0:
+            dy = dy * PRECISION // self.price_scale[j - 1]
+        dy //= self.precisions[j]
+        dy -= self.fee(xp) * dy // 10**10
+        return dy
+
+    def get_dy_curve(self, i, j, amounts):
+        # output for each of the amounts, all against the same snapshot
+        return [self.get_dy(i, j, dx) if dx > 0 else 0 for dx in amounts]
+
+    def exchange(self, i, j, dx):
+        # get_dy applied to the snapshot so that following quotes see it.
+        # price_scale is left as is, the pool only moves it after its EMA
+        # oracle catches up
+        dy = self.get_dy(i, j, dx)
+        self.balances[i] += dx
+        self.balances[j] -= dy
+        self.D = newton_D(self.A, self.gamma, self.xp(self.balances))
+        return dy
@@ -1,6 +1,7 @@
-from brownie import interface, chain
+from brownie import interface
 from eth_abi.packed import encode_single_packed
 
+from .cache import cached_call
 from .constants import (
     CVXFXS_STAKING_CONTRACT,
     CURVE_CVX_ETH_POOL,
@@ -8,7 +9,6 @@ from .constants import (
     CURVE_FXS_ETH_POOL,
     CURVE_CVXFXS_FXS_POOL,
     FXS,
-    FXS_COMMUNITY,
     CURVE_CVXFXS_FXS_LP_TOKEN,
     UNI_QUOTER,
     WETH,
@@ -16,64 +16,57 @@ from .constants import (
     USDC,
     UNI_ROUTER,
     CVXFXS,
-    CVXFXS_FXS_GAUGE_DEPOSIT,
     CVX_MINING_LIB,
     CURVE_FRAX_USDC_POOL,
     CRV_TOKEN,
     CVX,
     CURVE_TRICRV_POOL,
 )
+from .cryptoswap import CryptoSwapPool
+from .multicall import Multicall
+from .simulate import simulate, erc20_override, merge_overrides
+from .stableswap import StableSwapNGPool
+from .uniswap import LocalQuoter
 
 random_wallet = "0xBa90C1f2B5678A055467Ed2d29ab66ed407Ba8c6"
 
 
 def estimate_underlying_received(amount, token_index):
-    interface.IERC20(CURVE_CVXFXS_FXS_LP_TOKEN).approve(
-        CURVE_CVXFXS_FXS_POOL, 2**256 - 1, {"from": CVXFXS_FXS_GAUGE_DEPOSIT}
-    )
-    tx = interface.ICurveV2Pool(CURVE_CVXFXS_FXS_POOL).remove_liquidity_one_coin(
-        amount, token_index, 0, False, random_wallet, {"from": CVXFXS_FXS_GAUGE_DEPOSIT}
+    pool = interface.ICurveV2Pool(CURVE_CVXFXS_FXS_POOL)
+    return simulate(
+        pool.remove_liquidity_one_coin,
+        amount,
+        token_index,
+        0,
+        False,
+        random_wallet,
+        sender=random_wallet,
+        overrides=erc20_override(CURVE_CVXFXS_FXS_LP_TOKEN, random_wallet, amount),
     )
-    value = tx.return_value
-    # older version of brownie bork the return value
-    if value is None:
-        value = tx.events[-1]["coin_amount"]
-    chain.undo(2)
-    return value
 
 
 def get_stk_cvxfxs_received(amount):
     pool = interface.ICurveV2Pool(CURVE_CVXFXS_FXS_POOL)
-    if pool.price_oracle() > 1e18:
+    if cached_call(pool.price_oracle) > 1e18:
         return amount
     else:
-        return pool.get_dy(0, 1, amount) if amount > 0 else 0
+        return cached_call(pool.get_dy, 0, 1, amount) if amount > 0 else 0
 
 
 def estimate_lp_tokens_received(amount, amount_cvxfxs=0):
-    lpt = interface.IERC20(CURVE_CVXFXS_FXS_LP_TOKEN)
-    fxs = interface.IERC20(FXS)
     if amount == 0 and amount_cvxfxs == 0:
         return 0
-
-    if amount > 0:
-        fxs.approve(CURVE_CVXFXS_FXS_POOL, 2**256 - 1, {"from": random_wallet})
-        fxs.transfer(random_wallet, amount, {"from": FXS_COMMUNITY})
-
-    if amount_cvxfxs > 0:
-        interface.IERC20(CVXFXS).transfer(
-            random_wallet, amount_cvxfxs, {"from": CURVE_CVXFXS_FXS_POOL}
-        )
-        interface.IERC20(CVXFXS).approve(
-            CURVE_CVXFXS_FXS_POOL, 2**256 - 1, {"from": random_wallet}
-        )
-
-    interface.ICurveV2Pool(CURVE_CVXFXS_FXS_POOL).add_liquidity(
-        [amount, amount_cvxfxs], 0, {"from": random_wallet}
+    overrides = merge_overrides(
+        erc20_override(FXS, random_wallet, amount, CURVE_CVXFXS_FXS_POOL),
+        erc20_override(CVXFXS, random_wallet, amount_cvxfxs, CURVE_CVXFXS_FXS_POOL),
+    )
+    return simulate(
+        interface.ICurveV2Pool(CURVE_CVXFXS_FXS_POOL).add_liquidity,
+        [amount, amount_cvxfxs],
+        0,
+        sender=random_wallet,
+        overrides=overrides,
     )
-    tokens_added = lpt.balanceOf(random_wallet)
-    chain.undo(3)
-    return tokens_added
 
 
 def calc_rewards(strategy):
@@ -91,24 +84,47 @@ def calc_rewards(strategy):
 
 def get_cvx_to_eth_amount(amount):
     cvx_eth_swap = interface.ICurveV2Pool(CURVE_CVX_ETH_POOL)
-    return cvx_eth_swap.get_dy(1, 0, amount) if amount > 0 else 0
+    return cached_call(cvx_eth_swap.get_dy, 1, 0, amount) if amount > 0 else 0
 
 
 def get_crv_to_eth_amount(amount):
     crv_eth_swap = interface.ICurveTriCryptoFactoryNG(CURVE_TRICRV_POOL)
-    return crv_eth_swap.get_dy(2, 1, amount) if amount > 0 else 0
+    return cached_call(crv_eth_swap.get_dy, 2, 1, amount) if amount > 0 else 0
 
 
-def eth_fxs_uniswap(amount):
+# the uniswap legs below take an optional LocalQuoter (see uniswap.py) to
+# quote in process rather than through the on chain quoter / router
+def quote_exact_input_single(token_in, token_out, fee, amount, quoter=None):
+    if quoter is not None:
+        return quoter.quote_exact_input_single(token_in, token_out, fee, amount)
     return interface.IQuoter(UNI_QUOTER).quoteExactInputSingle(
-        WETH, FXS, 10000, amount, 0
+        token_in, token_out, fee, amount, 0
     )
 
 
-def fxs_eth_uniswap(amount):
-    return interface.IQuoter(UNI_QUOTER).quoteExactInputSingle(
-        FXS, WETH, 10000, amount, 0
-    )
+def quote_exact_input(path, amount, quoter=None):
+    if quoter is not None:
+        return quoter.quote_exact_input(path, amount)
+    return interface.IQuoter(UNI_QUOTER).quoteExactInput(path, amount)
+
+
+def get_amounts_out(router, amount, path, quoter=None):
+    if quoter is not None:
+        return quoter.get_amounts_out(router, amount, path)
+    return interface.IUniV2Router(router).getAmountsOut(amount, path)
+
+
+# the FXS routes below take an optional FxsSnapshot to be computed locally
+def _quoter(snapshot):
+    return None if snapshot is None else snapshot.quoter
+
+
+def eth_fxs_uniswap(amount, snapshot=None):
+    return quote_exact_input_single(WETH, FXS, 10000, amount, _quoter(snapshot))
+
+
+def fxs_eth_uniswap(amount, snapshot=None):
+    return quote_exact_input_single(FXS, WETH, 10000, amount, _quoter(snapshot))
 
 
 def calc_harvest_amount_uniswap(strategy):
@@ -119,42 +135,50 @@ def calc_harvest_amount_uniswap(strategy):
     return fxs_balance
 
 
-def fxs_eth_unicurve1(amount):
-    frax_balance = interface.IUniV2Router(UNI_ROUTER).getAmountsOut(
-        amount, [FXS, FRAX]
-    )[-1]
-    usdc_balance = interface.ICurvePool(CURVE_FRAX_USDC_POOL).get_dy(0, 1, frax_balance)
+def frax_to_usdc(amount, snapshot=None):
+    if snapshot is not None:
+        return snapshot.frax_usdc.get_dy(0, 1, amount)
+    return cached_call(interface.ICurvePool(CURVE_FRAX_USDC_POOL).get_dy, 0, 1, amount)
+
+
+def usdc_to_frax(amount, snapshot=None):
+    if snapshot is not None:
+        return snapshot.frax_usdc.get_dy(1, 0, amount)
+    return cached_call(interface.ICurvePool(CURVE_FRAX_USDC_POOL).get_dy, 1, 0, amount)
+
+
+def fxs_eth_unicurve1(amount, snapshot=None):
+    quoter = _quoter(snapshot)
+    frax_balance = get_amounts_out(UNI_ROUTER, amount, [FXS, FRAX], quoter)[-1]
+    usdc_balance = frax_to_usdc(frax_balance, snapshot)
     path = encode_single_packed("(address,uint24,address)", [USDC, 500, WETH])
-    return interface.IQuoter(UNI_QUOTER).quoteExactInput(path, usdc_balance)
+    return quote_exact_input(path, usdc_balance, quoter)
 
 
-def eth_fxs_unicurve1(amount):
+def eth_fxs_unicurve1(amount, snapshot=None):
+    quoter = _quoter(snapshot)
     path = encode_single_packed("(address,uint24,address)", [WETH, 500, USDC])
-    usdc_balance = interface.IQuoter(UNI_QUOTER).quoteExactInput(path, amount)
-    frax_balance = interface.ICurvePool(CURVE_FRAX_USDC_POOL).get_dy(1, 0, usdc_balance)
-    return interface.IUniV2Router(UNI_ROUTER).getAmountsOut(frax_balance, [FRAX, FXS])[
-        -1
-    ]
+    usdc_balance = quote_exact_input(path, amount, quoter)
+    frax_balance = usdc_to_frax(usdc_balance, snapshot)
+    return get_amounts_out(UNI_ROUTER, frax_balance, [FRAX, FXS], quoter)[-1]
 
 
-def eth_fxs_unistable(amount):
+def eth_fxs_unistable(amount, snapshot=None):
+    quoter = _quoter(snapshot)
     path = encode_single_packed(
         "(address,uint24,address,uint24,address)", [WETH, 500, USDC, 500, FRAX]
     )
-    stable_balance = interface.IQuoter(UNI_QUOTER).quoteExactInput(path, amount)
-    return interface.IUniV2Router(UNI_ROUTER).getAmountsOut(
-        stable_balance, [FRAX, FXS]
-    )[-1]
+    stable_balance = quote_exact_input(path, amount, quoter)
+    return get_amounts_out(UNI_ROUTER, stable_balance, [FRAX, FXS], quoter)[-1]
 
 
-def fxs_eth_unistable(amount):
-    stable_balance = interface.IUniV2Router(UNI_ROUTER).getAmountsOut(
-        amount, [FXS, FRAX]
-    )[-1]
+def fxs_eth_unistable(amount, snapshot=None):
+    quoter = _quoter(snapshot)
+    stable_balance = get_amounts_out(UNI_ROUTER, amount, [FXS, FRAX], quoter)[-1]
     path = encode_single_packed(
         "(address,uint24,address,uint24,address)", [FRAX, 500, USDC, 500, WETH]
     )
-    return interface.IQuoter(UNI_QUOTER).quoteExactInput(path, stable_balance)
+    return quote_exact_input(path, stable_balance, quoter)
 
 
 def calc_harvest_amount_unistable(strategy):
@@ -165,20 +189,20 @@ def calc_harvest_amount_unistable(strategy):
     return fxs_balance
 
 
-def eth_fxs_curve(amount):
-    return (
-        interface.ICurveV2Pool(CURVE_FXS_ETH_POOL).get_dy(0, 1, amount)
-        if amount > 0
-        else 0
-    )
+def eth_fxs_curve(amount, snapshot=None):
+    if amount == 0:
+        return 0
+    if snapshot is not None:
+        return snapshot.fxs_eth.get_dy(0, 1, amount)
+    return cached_call(interface.ICurveV2Pool(CURVE_FXS_ETH_POOL).get_dy, 0, 1, amount)
 
 
-def fxs_eth_curve(amount):
-    return (
-        interface.ICurveV2Pool(CURVE_FXS_ETH_POOL).get_dy(1, 0, amount)
-        if amount > 0
-        else 0
-    )
+def fxs_eth_curve(amount, snapshot=None):
+    if amount == 0:
+        return 0
+    if snapshot is not None:
+        return snapshot.fxs_eth.get_dy(1, 0, amount)
+    return cached_call(interface.ICurveV2Pool(CURVE_FXS_ETH_POOL).get_dy, 1, 0, amount)
 
 
 def calc_harvest_amount_curve(strategy):
@@ -191,11 +215,15 @@ def calc_harvest_amount_curve(strategy):
 
 
 def fxs_to_cvxfxs(amount):
-    return interface.ICurveV2Pool(CURVE_CVXFXS_FXS_POOL).get_dy(0, 1, amount)
+    return cached_call(
+        interface.ICurveV2Pool(CURVE_CVXFXS_FXS_POOL).get_dy, 0, 1, amount
+    )
 
 
 def cvxfxs_to_fxs(amount):
-    return interface.ICurveV2Pool(CURVE_CVXFXS_FXS_POOL).get_dy(1, 0, amount)
+    return cached_call(
+        interface.ICurveV2Pool(CURVE_CVXFXS_FXS_POOL).get_dy, 1, 0, amount
+    )
 
 
 def calc_staking_harvest_amount(strategy, staking, option, lock=False):
@@ -222,23 +250,46 @@ def calc_staking_rewards(strategy, staking):
     return fxs_rewards, eth_balance
 
 
-def eth_to_fxs(amount, option):
+def eth_to_fxs(amount, option, snapshot=None):
+    if amount == 0:
+        return 0
     if option == 0:
-        return eth_fxs_curve(amount)
+        return eth_fxs_curve(amount, snapshot)
     elif option == 1:
-        return eth_fxs_uniswap(amount)
+        return eth_fxs_uniswap(amount, snapshot)
     elif option == 3:
-        return eth_fxs_unicurve1(amount)
+        return eth_fxs_unicurve1(amount, snapshot)
     else:
-        return eth_fxs_unistable(amount)
+        return eth_fxs_unistable(amount, snapshot)
 
 
-def fxs_to_eth(amount, option):
+def fxs_to_eth(amount, option, snapshot=None):
+    if amount == 0:
+        return 0
     if option == 0:
-        return fxs_eth_curve(amount)
+        return fxs_eth_curve(amount, snapshot)
     elif option == 1:
-        return fxs_eth_uniswap(amount)
+        return fxs_eth_uniswap(amount, snapshot)
     elif option == 3:
-        return fxs_eth_unicurve1(amount)
+        return fxs_eth_unicurve1(amount, snapshot)
     else:
-        return fxs_eth_unistable(amount)
+        return fxs_eth_unistable(amount, snapshot)
+
+
+class FxsSnapshot(object):
+    # states of the pools the FXSSwapper routes go through, read once. pass
+    # it as snapshot to the route functions above to quote them locally
+
+    def __init__(self, words=2):
+        calls = Multicall()
+        fxs_eth = CryptoSwapPool.add_snapshot(calls, CURVE_FXS_ETH_POOL)
+        frax_usdc = StableSwapNGPool.add_plain_snapshot(
+            calls, CURVE_FRAX_USDC_POOL, [10**18, 10**30]
+        )
+        results = calls.execute()
+        self.fxs_eth = fxs_eth(results)
+        self.frax_usdc = frax_usdc(results)
+        self.quoter = LocalQuoter(words)
+        # read the uniswap pools now so that the snapshot can be pickled
+        for option in range(1, 4):
+            eth_to_fxs(10**18, option, self)
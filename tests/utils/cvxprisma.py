@@ -1,5 +1,6 @@
 from brownie import interface
 
+from .cache import cached_call
 from .constants import (
     CVX,
     CURVE_PRISMA_ETH_POOL,
@@ -13,7 +14,7 @@ from .cvxfxs import get_cvx_to_eth_amount
 
 def eth_to_prisma(amount):
     return (
-        interface.ICurveV2Pool(CURVE_PRISMA_ETH_POOL).get_dy(0, 1, amount)
+        cached_call(interface.ICurveV2Pool(CURVE_PRISMA_ETH_POOL).get_dy, 0, 1, amount)
         if amount > 0
         else 0
     )
@@ -21,7 +22,7 @@ def eth_to_prisma(amount):
 
 def prisma_to_eth(amount):
     return (
-        interface.ICurveV2Pool(CURVE_PRISMA_ETH_POOL).get_dy(1, 0, amount)
+        cached_call(interface.ICurveV2Pool(CURVE_PRISMA_ETH_POOL).get_dy, 1, 0, amount)
         if amount > 0
         else 0
     )
@@ -30,34 +31,42 @@ def prisma_to_eth(amount):
 def prisma_to_cvxprisma(amount):
     if amount == 0:
         return 0
-    return interface.ICurvePool(CURVE_CVXPRISMA_PRISMA_POOL).get_dy(0, 1, amount)
+    return cached_call(
+        interface.ICurvePool(CURVE_CVXPRISMA_PRISMA_POOL).get_dy, 0, 1, amount
+    )
 
 
 def cvxprisma_to_prisma(amount):
     if amount == 0:
         return 0
-    return interface.ICurvePool(CURVE_CVXPRISMA_PRISMA_POOL).get_dy(1, 0, amount)
+    return cached_call(
+        interface.ICurvePool(CURVE_CVXPRISMA_PRISMA_POOL).get_dy, 1, 0, amount
+    )
 
 
 def prisma_to_mkusd(amount):
     if amount == 0:
         return 0
-    return interface.ICurveV2Pool(CURVE_PRISMA_MKUSD_POOL).get_dy(1, 0, amount)
+    return cached_call(
+        interface.ICurveV2Pool(CURVE_PRISMA_MKUSD_POOL).get_dy, 1, 0, amount
+    )
 
 
 def get_stk_cvxprisma_received(amount):
     pool = interface.ICurvePool(CURVE_CVXPRISMA_PRISMA_POOL)
-    if pool.price_oracle() > 1e18:
+    if cached_call(pool.price_oracle) > 1e18:
         return amount
     else:
-        return pool.get_dy(0, 1, amount) if amount > 0 else 0
+        return cached_call(pool.get_dy, 0, 1, amount) if amount > 0 else 0
 
 
 def mkusd_to_prisma(amount):
     print("MKUSD Amount,", amount)
     if amount == 0:
         return 0
-    return interface.ICurveV2Pool(CURVE_PRISMA_MKUSD_POOL).get_dy(0, 1, amount)
+    return cached_call(
+        interface.ICurveV2Pool(CURVE_PRISMA_MKUSD_POOL).get_dy, 0, 1, amount
+    )
 
 
 def calc_staking_harvest_amount(strategy, staking, lock=False):
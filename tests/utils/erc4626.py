@@ -0,0 +1,47 @@
+from brownie import interface
+
+from .multicall import Multicall
+
+
+class ERC4626Snapshot(object):
+    # share price of a vault at a given block, conversions round down like
+    # convertToShares / convertToAssets of the solmate and yearn v3 vaults
+
+    def __init__(self, total_assets, total_supply):
+        self.total_assets = total_assets
+        self.total_supply = total_supply
+
+    @classmethod
+    def from_chain(cls, address):
+        calls = Multicall()
+        load = cls.add_snapshot(calls, address)
+        return load(calls.execute())
+
+    @classmethod
+    def add_snapshot(cls, calls, address):
+        vault = interface.IERC4626(address)
+        assets = calls.add(vault.totalAssets)
+        supply = calls.add(vault.totalSupply)
+        return lambda results: cls(results[assets], results[supply])
+
+    def convert_to_shares(self, assets):
+        if self.total_supply == 0:
+            return assets
+        return assets * self.total_supply // self.total_assets
+
+    def convert_to_assets(self, shares):
+        if self.total_supply == 0:
+            return shares
+        return shares * self.total_assets // self.total_supply
+
+    def deposit(self, assets):
+        shares = self.convert_to_shares(assets)
+        self.total_assets += assets
+        self.total_supply += shares
+        return shares
+
+    def redeem(self, shares):
+        assets = self.convert_to_assets(shares)
+        self.total_assets -= assets
+        self.total_supply -= shares
+        return assets
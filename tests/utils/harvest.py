@@ -0,0 +1,200 @@
+from brownie import interface
+
+from . import calc_staked_cvxcrv_harvest, cvxcrv_to_crv_v2
+from .aurabal import (
+    calc_harvest_amount_aura,
+    estimate_underlying_received_baleth,
+    get_aurabal_to_lptoken_amount,
+    get_local_balancer,
+)
+from .cache import pinned_quotes
+from .constants import MULTICALL3
+from .cvxfxs import (
+    calc_harvest_amount_curve,
+    calc_harvest_amount_uniswap,
+    calc_harvest_amount_unistable,
+    calc_staking_harvest_amount as calc_cvxfxs_staking_harvest_amount,
+    cvxfxs_to_fxs,
+    estimate_lp_tokens_received,
+    estimate_underlying_received,
+    fxs_to_eth,
+    get_crv_to_eth_amount,
+    get_cvx_to_eth_amount,
+)
+from .cvxprisma import (
+    calc_staking_harvest_amount as calc_cvxprisma_staking_harvest_amount,
+    cvxprisma_to_prisma,
+    prisma_to_eth,
+)
+from .multicall import Multicall
+from .pirex import get_pcvx_to_cvx
+
+# priority fee added to the base fee when pricing the harvest gas
+PRIORITY_FEE = int(1e9)
+# used when the gas of a harvest can't be estimated (e.g. nothing to claim)
+DEFAULT_HARVEST_GAS = 1_500_000
+
+
+class VaultHarvester(object):
+    # a vault plugged into the HarvestEngine
+    # estimate() returns the amount harvested before fees, in the asset the
+    # caller incentive is paid in, and to_eth(amount) values that asset in ETH.
+    # harvest_args select the harvest overload used for the gas estimate
+
+    def __init__(self, name, vault, estimate, to_eth, harvest_args=(), gas=None):
+        self.name = name
+        self.vault = vault
+        self.estimate = estimate
+        self.to_eth = to_eth
+        self.harvest_args = harvest_args
+        self.gas = gas
+
+    def harvest_method(self):
+        method = self.vault.harvest
+        if hasattr(method, "methods"):
+            # overloaded harvest, picked by number of arguments
+            return next(
+                m
+                for m in method.methods.values()
+                if len(m.abi["inputs"]) == len(self.harvest_args)
+            )
+        return method
+
+    def estimate_gas(self, caller):
+        if self.gas is not None:
+            return self.gas
+        try:
+            return self.harvest_method().estimate_gas(
+                *self.harvest_args, {"from": caller}
+            )
+        except Exception:
+            return None
+
+
+class HarvestEngine(object):
+    # ranks a fleet of vaults by the ETH value of the harvest caller incentive
+    # minus the gas cost of the harvest. the incentives of all vaults and the
+    # base fee are read in a single multicall, the reward estimators share the
+    # quote cache for the duration of a ranking
+
+    def __init__(self, harvesters, caller, priority_fee=PRIORITY_FEE):
+        self.harvesters = harvesters
+        self.caller = caller
+        self.priority_fee = priority_fee
+
+    @pinned_quotes
+    def rank(self, gas_price=None):
+        # list of dicts sorted by decreasing profit, vaults whose harvest
+        # would revert have a profit of None and come last
+        calls = Multicall()
+        basefee = calls.add(interface.IMulticall3(MULTICALL3).getBasefee)
+        incentives = [calls.add(h.vault.callIncentive) for h in self.harvesters]
+        results = calls.execute()
+        if gas_price is None:
+            gas_price = results[basefee] + self.priority_fee
+
+        report = []
+        for harvester, i in zip(self.harvesters, incentives):
+            harvested = harvester.estimate()
+            incentive = harvested * results[i] // 10000
+            value = harvester.to_eth(incentive) if incentive > 0 else 0
+            gas = harvester.estimate_gas(self.caller)
+            report.append(
+                {
+                    "name": harvester.name,
+                    "vault": harvester.vault,
+                    "harvested": harvested,
+                    "incentive": incentive,
+                    "value": value,
+                    "gas": gas,
+                    "gas_cost": None if gas is None else gas * gas_price,
+                    "profit": None if gas is None else value - gas * gas_price,
+                }
+            )
+        return sorted(
+            report,
+            key=lambda r: (r["profit"] is not None, r["profit"] or 0),
+            reverse=True,
+        )
+
+    def best(self, min_profit=0, gas_price=None):
+        # most profitable vault to harvest, None if none clears min_profit
+        ranking = self.rank(gas_price)
+        if ranking and ranking[0]["profit"] is not None:
+            if ranking[0]["profit"] > min_profit:
+                return ranking[0]
+        return None
+
+
+def stkcvxcrv_harvester(vault, strategy, wrapper):
+    return VaultHarvester(
+        "stkCvxCrv",
+        vault,
+        lambda: calc_staked_cvxcrv_harvest(strategy, wrapper),
+        lambda amount: get_crv_to_eth_amount(cvxcrv_to_crv_v2(amount)),
+    )
+
+
+def stkcvxfxs_harvester(vault, strategy, staking, option, lock=False):
+    return VaultHarvester(
+        "stkCvxFxs",
+        vault,
+        lambda: calc_cvxfxs_staking_harvest_amount(strategy, staking, option, lock),
+        lambda amount: fxs_to_eth(cvxfxs_to_fxs(amount), option),
+    )
+
+
+def stkcvxprisma_harvester(vault, strategy, staking, lock=False):
+    return VaultHarvester(
+        "stkCvxPrisma",
+        vault,
+        lambda: calc_cvxprisma_staking_harvest_amount(strategy, staking, lock),
+        lambda amount: prisma_to_eth(cvxprisma_to_prisma(amount)),
+    )
+
+
+def cvxfxs_harvester(vault, strategy, option):
+    # incentive paid in cvxFXS/FXS LP tokens, valued by withdrawing to FXS
+    calc_fxs = [
+        calc_harvest_amount_curve,
+        calc_harvest_amount_uniswap,
+        calc_harvest_amount_unistable,
+    ][option]
+    return VaultHarvester(
+        "cvxFXS",
+        vault,
+        lambda: estimate_lp_tokens_received(calc_fxs(strategy)),
+        lambda amount: fxs_to_eth(estimate_underlying_received(amount, 0), option),
+    )
+
+
+def aurabal_harvester(vault, strategy, lock=True):
+    # incentive paid in auraBAL, valued by exiting the BAL/ETH pool to WETH.
+    # the Balancer swaps of an estimate and its valuation are quoted on one
+    # snapshot of the pools
+    balancer = [None]
+
+    def estimate():
+        balancer[0] = get_local_balancer()
+        return calc_harvest_amount_aura(strategy, lock, balancer[0])
+
+    return VaultHarvester(
+        "auraBAL",
+        vault,
+        estimate,
+        lambda amount: estimate_underlying_received_baleth(
+            strategy, get_aurabal_to_lptoken_amount(amount, balancer[0]), 1
+        ),
+        harvest_args=(0, lock),
+    )
+
+
+def pcvx_harvester(vault, strategy, staking_rewards, to_eth=None):
+    if to_eth is None:
+        to_eth = lambda amount: get_cvx_to_eth_amount(get_pcvx_to_cvx(amount))
+    return VaultHarvester(
+        "pCVX",
+        vault,
+        lambda: staking_rewards.earned(strategy),
+        to_eth,
+    )
@@ -0,0 +1,76 @@
+from brownie import interface
+
+from .cache import quote_cache
+from .constants import (
+    MULTICALL3,
+    CURVE_CONTRACT_REGISTRY,
+    UNI_QUOTER,
+    UNI_ROUTER,
+    SUSHI_ROUTER,
+    WETH,
+)
+
+
+class Multicall(object):
+    # collects view calls and sends them as a single Multicall3 aggregate3
+
+    def __init__(self):
+        self.calls = []
+
+    def add(self, method, *args):
+        # method is a brownie contract call, e.g. ICurveV2Pool(pool).get_dy
+        self.calls.append((method, args))
+        return len(self.calls) - 1
+
+    def execute(self):
+        # decoded result of each call, None for the calls that reverted
+        if len(self.calls) == 0:
+            return []
+        payload = [
+            (method._address, True, method.encode_input(*args))
+            for method, args in self.calls
+        ]
+        results = interface.IMulticall3(MULTICALL3).aggregate3(payload)
+        self.calls, calls = [], self.calls
+        return [
+            method.decode_output(data) if success else None
+            for (method, _), (success, data) in zip(calls, results)
+        ]
+
+
+def add_eth_quote(multicall, token, choice, amount):
+    # queues the ETH quote UnionZap.swap gets for token with a 3 bit router
+    # choice, returns a function mapping the multicall results to the amount
+    if choice >= 4:
+        pool, index = CURVE_CONTRACT_REGISTRY[token.lower()]
+        i = multicall.add(interface.ICurveV2Pool(pool).get_dy, index ^ 1, index, amount)
+        return lambda results: results[i]
+    elif choice == 2 or choice == 3:
+        fee = 3000 if choice == 2 else 10000
+        i = multicall.add(
+            interface.IQuoter(UNI_QUOTER).quoteExactInputSingle,
+            token,
+            WETH,
+            fee,
+            amount,
+            0,
+        )
+        return lambda results: results[i]
+    else:
+        router = UNI_ROUTER if (choice == 1) else SUSHI_ROUTER
+        i = multicall.add(
+            interface.IUniV2Router(router).getAmountsOut, amount, [token, WETH]
+        )
+        return lambda results: None if results[i] is None else results[i][-1]
+
+
+def get_output_tokens(union_contract, count):
+    # output tokens only change through a transaction so the list is memoized
+    # for the current block
+    def fetch():
+        calls = Multicall()
+        for i in range(count):
+            calls.add(union_contract.outputTokens, i)
+        return calls.execute()
+
+    return quote_cache.get(("outputTokens", union_contract.address, count), fetch)
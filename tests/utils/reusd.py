@@ -5,66 +5,94 @@ from .constants import (
     REUSD_POOL,
     SREUSD_VAULT,
 )
-from .crvusd import eth_to_crvusd, crvusd_to_eth, crvusd_to_scrvusd, scrvusd_to_crvusd
+from .crvusd import (
+    eth_to_crvusd,
+    crvusd_to_eth,
+    crvusd_to_scrvusd,
+    scrvusd_to_crvusd,
+    CrvUsdSnapshot,
+)
+from .erc4626 import ERC4626Snapshot
+from .stableswap import StableSwapNGPool
+
+# the conversions below take an optional ReusdSnapshot to be computed locally
 
 
-def scrvusd_to_reusd(amount):
+def scrvusd_to_reusd(amount, snapshot=None):
     """Convert scrvUSD to reUSD via Curve pool (scrvUSD=1, reUSD=0)"""
     if amount == 0:
         return 0
+    if snapshot is not None:
+        return snapshot.reusd_pool.get_dy(1, 0, amount)
     return interface.ICurveStableSwapNG(REUSD_POOL).get_dy(1, 0, amount)
 
 
-def reusd_to_scrvusd(amount):
+def reusd_to_scrvusd(amount, snapshot=None):
     """Convert reUSD to scrvUSD via Curve pool (reUSD=0, scrvUSD=1)"""
     if amount == 0:
         return 0
+    if snapshot is not None:
+        return snapshot.reusd_pool.get_dy(0, 1, amount)
     return interface.ICurveStableSwapNG(REUSD_POOL).get_dy(0, 1, amount)
 
 
-def eth_to_reusd(amount):
+def eth_to_reusd(amount, snapshot=None):
     """Convert ETH to reUSD via ETH -> crvUSD -> scrvUSD -> reUSD"""
     if amount == 0:
         return 0
-    crvusd_amount = eth_to_crvusd(amount)
-    scrvusd_amount = crvusd_to_scrvusd(crvusd_amount)
-    return scrvusd_to_reusd(scrvusd_amount)
+    crvusd_amount = eth_to_crvusd(amount, snapshot)
+    scrvusd_amount = crvusd_to_scrvusd(crvusd_amount, snapshot)
+    return scrvusd_to_reusd(scrvusd_amount, snapshot)
 
 
-def reusd_to_eth(amount):
+def reusd_to_eth(amount, snapshot=None):
     """Convert reUSD to ETH via reUSD -> scrvUSD -> crvUSD -> ETH"""
     if amount == 0:
         return 0
-    scrvusd_amount = reusd_to_scrvusd(amount)
-    crvusd_amount = scrvusd_to_crvusd(scrvusd_amount)
-    return crvusd_to_eth(crvusd_amount)
+    scrvusd_amount = reusd_to_scrvusd(amount, snapshot)
+    crvusd_amount = scrvusd_to_crvusd(scrvusd_amount, snapshot)
+    return crvusd_to_eth(crvusd_amount, snapshot)
 
 
-def crvusd_to_reusd(amount):
+def crvusd_to_reusd(amount, snapshot=None):
     """Convert crvUSD to reUSD via crvUSD -> scrvUSD -> reUSD"""
     if amount == 0:
         return 0
-    scrvusd_amount = crvusd_to_scrvusd(amount)
-    return scrvusd_to_reusd(scrvusd_amount)
+    scrvusd_amount = crvusd_to_scrvusd(amount, snapshot)
+    return scrvusd_to_reusd(scrvusd_amount, snapshot)
 
 
-def reusd_to_crvusd(amount):
+def reusd_to_crvusd(amount, snapshot=None):
     """Convert reUSD to crvUSD via reUSD -> scrvUSD -> crvUSD"""
     if amount == 0:
         return 0
-    scrvusd_amount = reusd_to_scrvusd(amount)
-    return scrvusd_to_crvusd(scrvusd_amount)
+    scrvusd_amount = reusd_to_scrvusd(amount, snapshot)
+    return scrvusd_to_crvusd(scrvusd_amount, snapshot)
 
 
-def reusd_to_sreusd(amount):
+def reusd_to_sreusd(amount, snapshot=None):
     """Convert reUSD to sReUSD via deposit into sReUSD vault"""
     if amount == 0:
         return 0
+    if snapshot is not None:
+        return snapshot.sreusd.convert_to_shares(amount)
     return interface.IERC4626(SREUSD_VAULT).convertToShares(amount)
 
 
-def sreusd_to_reusd(amount):
+def sreusd_to_reusd(amount, snapshot=None):
     """Convert sReUSD to reUSD via redeem from sReUSD vault"""
     if amount == 0:
         return 0
+    if snapshot is not None:
+        return snapshot.sreusd.convert_to_assets(amount)
     return interface.IERC4626(SREUSD_VAULT).convertToAssets(amount)
+
+
+class ReusdSnapshot(CrvUsdSnapshot):
+    """Pools and vaults of the reUSD conversions above, from a single state fetch"""
+
+    def add_snapshots(self, calls):
+        loaders = super().add_snapshots(calls)
+        loaders["reusd_pool"] = StableSwapNGPool.add_snapshot(calls, REUSD_POOL)
+        loaders["sreusd"] = ERC4626Snapshot.add_snapshot(calls, SREUSD_VAULT)
+        return loaders
@@ -0,0 +1,57 @@
+from multiprocessing import Pool
+
+# route selection over quote functions of the form quote(amount, option)
+
+
+def quote_grid(quote, options, amounts, processes=None, snapshot=None):
+    # output of every option for every amount, {option: [outputs]}
+    # if a snapshot is given it is passed to quote(amount, option, snapshot)
+    # along with each task, quote and snapshot have to be picklable when the
+    # grid is spread over processes
+    extra = () if snapshot is None else (snapshot,)
+    tasks = [(amount, option) + extra for option in options for amount in amounts]
+    if processes is not None and processes > 1:
+        with Pool(processes) as pool:
+            outputs = pool.starmap(quote, tasks)
+    else:
+        outputs = [quote(*task) for task in tasks]
+    return {
+        option: outputs[i * len(amounts) : (i + 1) * len(amounts)]
+        for i, option in enumerate(options)
+    }
+
+
+def best_options(grid, amounts):
+    # (amount, best option, output) for each amount of the grid
+    best = []
+    for i, amount in enumerate(amounts):
+        option = max(grid, key=lambda o: grid[o][i])
+        best.append((amount, option, grid[option][i]))
+    return best
+
+
+def optimal_split(quote, options, amount, steps=100):
+    # greedy allocation of amount over the options in steps chunks, each
+    # chunk going to the option with the best marginal output. optimal for
+    # concave quotes on independent pools, options sharing a pool are
+    # treated as if they did not move each other's prices
+    allocation = {option: 0 for option in options}
+    outputs = {option: 0 for option in options}
+    chunk = amount // steps
+    for step in range(steps):
+        size = chunk if step < steps - 1 else amount - chunk * (steps - 1)
+        if size == 0:
+            continue
+        marginal = {
+            option: quote(allocation[option] + size, option) for option in options
+        }
+        option = max(options, key=lambda o: marginal[o] - outputs[o])
+        allocation[option] += size
+        outputs[option] = marginal[option]
+    return allocation, sum(outputs.values())
+
+
+def apply_tolerance(amount, tolerance):
+    # min amount for an expected amount at a tolerance in bps, always strictly
+    # below amount as UnionZap checks its balances with a strict >
+    return max(0, min(amount - 1, amount * (10000 - tolerance) // 10000))
@@ -0,0 +1,172 @@
+from brownie import web3
+from eth_abi import encode_abi, decode_abi
+from eth_utils import keccak
+
+from .cache import quote_cache
+
+# simulations as eth_call with a state override set: balances and allowances
+# are written straight into the token storage instead of being transferred
+# from a whale, so nothing is mined and nothing needs to be undone
+
+# sends the metered calls, contracts with code can't be the origin of a call
+METER_ORIGIN = "0x000000000000000000000000000000000000bEEF"
+# highest storage slot probed for the balance and allowance mappings
+MAX_SLOT = 20
+MARKER = 0x1234567890ABCDEF
+
+_storage_layouts = {}
+
+
+class SimulationError(Exception):
+    pass
+
+
+def _word(value):
+    return "0x" + encode_abi(["uint256"], [value]).hex()
+
+
+def mapping_slot(key, slot, vyper=False):
+    # storage slot of mapping[key] for a mapping declared at slot
+    # (vyper < 0.3 hashes the slot first)
+    key = encode_abi(["address"], [key])
+    slot = encode_abi(["uint256"], [slot])
+    return int.from_bytes(keccak(slot + key if vyper else key + slot), "big")
+
+
+def allowance_slot(owner, spender, slot, vyper=False):
+    return mapping_slot(spender, mapping_slot(owner, slot, vyper), vyper)
+
+
+def merge_overrides(*overrides):
+    merged = {}
+    for override in overrides:
+        for address, fields in (override or {}).items():
+            entry = merged.setdefault(address, {})
+            for field, value in fields.items():
+                if field == "stateDiff":
+                    entry.setdefault("stateDiff", {}).update(value)
+                else:
+                    entry[field] = value
+    return merged
+
+
+def storage_override(address, slots):
+    # slots maps storage slots to values
+    return {
+        address: {"stateDiff": {_word(slot): _word(v) for slot, v in slots.items()}}
+    }
+
+
+def _balance_override(address, value):
+    return {address: {"balance": hex(value)}} if value > 0 else None
+
+
+def eth_call(tx, overrides=None, block="latest"):
+    # raw eth_call, returns the output bytes
+    params = [tx, block] + ([overrides] if overrides else [])
+    response = web3.provider.make_request("eth_call", params)
+    if "error" in response:
+        raise SimulationError(response["error"])
+    return bytes.fromhex(response["result"][2:])
+
+
+def _probe(token, selector_args, slot_for):
+    for vyper in (False, True):
+        for slot in range(MAX_SLOT):
+            output = eth_call(
+                {"to": token, "data": selector_args},
+                storage_override(token, {slot_for(slot, vyper): MARKER}),
+            )
+            if len(output) == 32 and int.from_bytes(output, "big") == MARKER:
+                return slot, vyper
+    raise SimulationError(f"Storage layout of {token} not found")
+
+
+def find_erc20_layout(token):
+    # (balance slot, allowance slot, vyper) of an ERC20, found by writing a
+    # marker in the candidate slots until balanceOf / allowance return it
+    if token not in _storage_layouts:
+        holder = "0x000000000000000000000000000000000000dEaD"
+        spender = "0x000000000000000000000000000000000000bEEF"
+        balance_slot, vyper = _probe(
+            token,
+            "0x70a08231" + encode_abi(["address"], [holder]).hex(),
+            lambda slot, vyper: mapping_slot(holder, slot, vyper),
+        )
+        allowances_slot, _ = _probe(
+            token,
+            "0xdd62ed3e" + encode_abi(["address", "address"], [holder, spender]).hex(),
+            lambda slot, vyper: allowance_slot(holder, spender, slot, vyper),
+        )
+        _storage_layouts[token] = (balance_slot, allowances_slot, vyper)
+    return _storage_layouts[token]
+
+
+def erc20_override(token, holder, balance, spender=None, allowance=2**256 - 1):
+    # sets the token balance of holder and its allowance to spender
+    balance_slot, allowances_slot, vyper = find_erc20_layout(token)
+    slots = {mapping_slot(holder, balance_slot, vyper): balance}
+    if spender is not None:
+        slots[allowance_slot(holder, spender, allowances_slot, vyper)] = allowance
+    return storage_override(token, slots)
+
+
+def simulate(method, *args, sender, overrides=None, value=0):
+    # decoded output of a (non view) contract method called from sender,
+    # which is given the value sent
+    def run():
+        tx = {
+            "from": sender,
+            "to": method._address,
+            "data": method.encode_input(*args),
+            "value": hex(value),
+        }
+        funded = merge_overrides(overrides, _balance_override(sender, value))
+        return method.decode_output("0x" + eth_call(tx, funded).hex())
+
+    key = ("simulate", method._address, method.signature, args, sender, overrides)
+    return quote_cache.get(key, run)
+
+
+def intrinsic_gas(data):
+    data = bytes.fromhex(data[2:])
+    return 21000 + sum(16 if byte else 4 for byte in data)
+
+
+def simulate_with_gas(method, *args, sender, overrides=None, value=0):
+    # (gas used, decoded output) from a single eth_call: the GasMeter runtime
+    # is put at sender, which has to be an EOA, and forwards the call.
+    # value is sent from METER_ORIGIN, which is given the balance
+    def run():
+        # only available once the project is compiled and loaded
+        from brownie import GasMeter
+
+        data = method.encode_input(*args)
+        meter_data = (
+            GasMeter.signatures["meter"]
+            + encode_abi(
+                ["address", "bytes"], [method._address, bytes.fromhex(data[2:])]
+            ).hex()
+        )
+        code = GasMeter._build["deployedBytecode"]
+        meter = {sender: {"code": code if code.startswith("0x") else "0x" + code}}
+        tx = {
+            "from": METER_ORIGIN,
+            "to": sender,
+            "data": meter_data,
+            "value": hex(value),
+        }
+        output = eth_call(
+            tx,
+            merge_overrides(overrides, meter, _balance_override(METER_ORIGIN, value)),
+        )
+        gas_used, success, result = decode_abi(["uint256", "bool", "bytes"], output)
+        if not success:
+            raise SimulationError(f"Reverted: 0x{result.hex()}")
+        return (
+            gas_used + intrinsic_gas(data),
+            method.decode_output("0x" + result.hex()),
+        )
+
+    key = ("gas", method._address, method.signature, args, sender, overrides)
+    return quote_cache.get(key, run)
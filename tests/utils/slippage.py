@@ -0,0 +1,130 @@
+from brownie import interface
+
+from .adjust import AdjustSimulator
+from .constants import (
+    CURVE_CONTRACT_REGISTRY,
+    SUSHI_ROUTER,
+    UNI_ROUTER,
+    WETH,
+    OUTPUT_TOKEN_LENGTH,
+)
+from .cryptoswap import CryptoSwapPool
+from .multicall import Multicall
+from .routes import apply_tolerance
+from .uniswap import LocalQuoter
+
+# UnionZap.swap fees for router choices 2 and 3
+UNIV3_FEES = [3000, 10000]
+
+
+class MinAmountsCalculator(object):
+    # claim -> swap -> adjust -> distribute replayed locally to get the
+    # minAmountOut of swap and the minAmounts of adjust / processIncentives
+    # balances and pool states are read in a few multicalls when created so
+    # a new calculator should be created right before submitting.
+    # the adjust step is quoted against the same pool states as the swap step
+
+    def __init__(self, union_contract, option, lock, count=OUTPUT_TOKEN_LENGTH):
+        self.union_contract = union_contract
+        self.adjust = AdjustSimulator(union_contract, option, lock, count)
+        # balances before the claim, the simulator ones are overwritten with
+        # the balances after the swap
+        self.eth_balance = self.adjust.eth_balance
+        self.balances = list(self.adjust.balances)
+        self.quoter = LocalQuoter()
+        self.curve_pools = {}
+
+    def get_curve_pool(self, pool):
+        if pool not in self.curve_pools:
+            self.curve_pools[pool] = CryptoSwapPool.from_chain(pool)
+        return self.curve_pools[pool]
+
+    def get_eth_amount(self, token, choice, amount):
+        # ETH received by UnionZap.swap for amount of token with router choice
+        if choice >= 4:
+            pool, index = CURVE_CONTRACT_REGISTRY[token.lower()]
+            return self.get_curve_pool(pool).get_dy(index ^ 1, index, amount)
+        elif choice >= 2:
+            return self.quoter.quote_exact_input_single(
+                token, WETH, UNIV3_FEES[choice - 2], amount
+            )
+        router = UNI_ROUTER if choice == 1 else SUSHI_ROUTER
+        return self.quoter.get_amounts_out(router, amount, [token, WETH])[-1]
+
+    def simulate_swap(self, claim_params, router_choices, claim_before_swap, weights):
+        # (ETH balance before the gas refund, token balances after the swap)
+        output_tokens = self.adjust.output_tokens
+        effective_output_tokens = [
+            token for token, weight in zip(output_tokens, weights) if weight > 0
+        ]
+        tokens = list(dict.fromkeys(param[0] for param in claim_params))
+        calls = Multicall()
+        indexes = [
+            calls.add(interface.IERC20(token).balanceOf, self.union_contract.address)
+            for token in tokens
+        ]
+        results = calls.execute()
+        balances = {token: results[i] for token, i in zip(tokens, indexes)}
+        for token, balance in zip(output_tokens, self.balances):
+            balances[token] = balance
+        if claim_before_swap:
+            for param in claim_params:
+                balances[param[0]] += param[2]
+
+        eth_balance = self.eth_balance
+        for param in claim_params:
+            token = param[0]
+            if balances[token] <= 1:
+                continue
+            amount = balances[token] - 1
+            if token == WETH:
+                eth_balance += amount
+            elif token in effective_output_tokens:
+                continue
+            else:
+                eth_balance += self.get_eth_amount(token, router_choices & 7, amount)
+                router_choices = router_choices >> 3
+            balances[token] = 1
+        return eth_balance, balances
+
+    def get_min_amounts(
+        self,
+        claim_params,
+        router_choices,
+        claim_before_swap,
+        gas_refund,
+        weights,
+        adjust_order=None,
+        tolerance=50,
+    ):
+        # tolerance in bps, the adjust order is planned if none is given
+        # returns a dict with the swap minAmountOut, the adjust order and
+        # minAmounts and the expected amounts sent to the distributors
+        gas_refund = int(gas_refund)
+        eth_balance, balances = self.simulate_swap(
+            claim_params, router_choices, claim_before_swap, weights
+        )
+        # the swap slippage check happens before the gas refund
+        min_amount_out = apply_tolerance(eth_balance, tolerance)
+
+        simulator = self.adjust
+        simulator.eth_balance = eth_balance - gas_refund
+        simulator.balances = [balances[token] for token in simulator.output_tokens]
+        if adjust_order is None:
+            adjust_order, min_amounts, outputs = simulator.plan(weights, tolerance)
+            fee_amount, _ = simulator.simulate(weights, adjust_order)
+        else:
+            fee_amount, outputs = simulator.simulate(weights, adjust_order)
+            min_amounts = [
+                apply_tolerance(output, tolerance) if weights[i] > 0 else 0
+                for i, output in enumerate(outputs)
+            ]
+
+        return {
+            "eth_amount": eth_balance,
+            "min_amount_out": min_amount_out,
+            "fee_amount": fee_amount,
+            "adjust_order": adjust_order,
+            "min_amounts": min_amounts,
+            "distributed": outputs,
+        }
@@ -0,0 +1,166 @@
+from brownie import interface
+
+from .multicall import Multicall
+
+# port of the StableSwap-NG integer math used by the views contract get_dy,
+# and of the plain pools before it (FRAXBP, factory plain pools) whose D
+# rounds differently
+
+PRECISION = 10**18
+A_PRECISION = 100
+FEE_DENOMINATOR = 10**10
+
+
+def get_D(xp, amp, legacy=False):
+    # NG divides D_P by n ** n once, the older pools by n at each coin
+    n = len(xp)
+    S = sum(xp)
+    if S == 0:
+        return 0
+
+    D = S
+    Ann = amp * n
+    for _ in range(255):
+        D_P = D
+        if legacy:
+            for x in xp:
+                D_P = D_P * D // (x * n)
+        else:
+            for x in xp:
+                D_P = D_P * D // x
+            D_P //= n**n
+        D_prev = D
+        D = (
+            (Ann * S // A_PRECISION + D_P * n)
+            * D
+            // ((Ann - A_PRECISION) * D // A_PRECISION + (n + 1) * D_P)
+        )
+        if abs(D - D_prev) <= 1:
+            return D
+
+    raise ValueError("Did not converge")
+
+
+def get_y(i, j, x, xp, amp, D):
+    n = len(xp)
+    assert i != j, "same coin"
+
+    S_ = 0
+    c = D
+    Ann = amp * n
+    for k in range(n):
+        if k == i:
+            _x = x
+        elif k != j:
+            _x = xp[k]
+        else:
+            continue
+        S_ += _x
+        c = c * D // (_x * n)
+
+    c = c * D * A_PRECISION // (Ann * n)
+    b = S_ + D * A_PRECISION // Ann
+    y = D
+    for _ in range(255):
+        y_prev = y
+        y = (y * y + c) // (2 * y + b - D)
+        if abs(y - y_prev) <= 1:
+            return y
+
+    raise ValueError("Did not converge")
+
+
+def dynamic_fee(xpi, xpj, fee, fee_multiplier):
+    if fee_multiplier <= FEE_DENOMINATOR:
+        return fee
+    xps2 = (xpi + xpj) ** 2
+    return (fee_multiplier * fee) // (
+        (fee_multiplier - FEE_DENOMINATOR) * 4 * xpi * xpj // xps2 + FEE_DENOMINATOR
+    )
+
+
+class StableSwapNGPool(object):
+    # state snapshot of a StableSwap-NG pool, rates are the pool's
+    # stored_rates (rate multipliers with the oracle / ERC4626 rates applied)
+    # amp is A_precise, i.e. A * A_PRECISION. legacy for the plain pools
+    # before NG, see add_plain_snapshot
+
+    def __init__(self, balances, rates, amp, fee, offpeg_fee_multiplier, legacy=False):
+        self.balances = list(balances)
+        self.rates = list(rates)
+        self.amp = amp
+        self.fee = fee
+        self.offpeg_fee_multiplier = offpeg_fee_multiplier
+        self.legacy = legacy
+        self.D = get_D(self.xp(self.balances), amp, legacy)
+
+    @classmethod
+    def from_chain(cls, address):
+        calls = Multicall()
+        load = cls.add_snapshot(calls, address)
+        return load(calls.execute())
+
+    @classmethod
+    def add_snapshot(cls, calls, address):
+        pool = interface.ICurveStableSwapNG(address)
+        indexes = [
+            calls.add(method)
+            for method in (
+                pool.get_balances,
+                pool.stored_rates,
+                pool.A_precise,
+                pool.fee,
+                pool.offpeg_fee_multiplier,
+            )
+        ]
+        return lambda results: cls(*[results[i] for i in indexes])
+
+    @classmethod
+    def add_plain_snapshot(cls, calls, address, rates):
+        # plain pools before NG (e.g. FRAXBP, the cvxCRV/CRV factory pool)
+        # have fixed rates and no dynamic fee, and their get_D divides by n
+        # at each coin. get_y and get_dy are otherwise the NG ones
+        pool = interface.ICurvePool(address)
+        balances = [calls.add(pool.balances, i) for i in range(len(rates))]
+        amp = calls.add(pool.A_precise)
+        fee = calls.add(pool.fee)
+        return lambda results: cls(
+            [results[i] for i in balances],
+            rates,
+            results[amp],
+            results[fee],
+            0,
+            True,
+        )
+
+    def xp(self, balances):
+        return [
+            rate * balance // PRECISION for rate, balance in zip(self.rates, balances)
+        ]
+
+    def get_dy(self, i, j, dx):
+        xp = self.xp(self.balances)
+        x = xp[i] + dx * self.rates[i] // PRECISION
+        y = get_y(i, j, x, xp, self.amp, self.D)
+        dy = xp[j] - y - 1
+        fee = (
+            dynamic_fee(
+                (xp[i] + x) // 2, (xp[j] + y) // 2, self.fee, self.offpeg_fee_multiplier
+            )
+            * dy
+            // FEE_DENOMINATOR
+        )
+        return (dy - fee) * PRECISION // self.rates[j]
+
+    def get_dy_curve(self, i, j, amounts):
+        # output for each of the amounts, all against the same snapshot
+        return [self.get_dy(i, j, dx) if dx > 0 else 0 for dx in amounts]
+
+    def exchange(self, i, j, dx):
+        # get_dy applied to the snapshot so that following quotes see it, the
+        # admin share of the fee is left in the balances
+        dy = self.get_dy(i, j, dx)
+        self.balances[i] += dx
+        self.balances[j] -= dy
+        self.D = get_D(self.xp(self.balances), self.amp, self.legacy)
+        return dy
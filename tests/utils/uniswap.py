@@ -0,0 +1,380 @@
+from brownie import interface
+
+from .constants import UNI_QUOTER
+from .multicall import Multicall
+
+# port of the Uniswap V3 core math (TickMath, SqrtPriceMath, SwapMath,
+# TickBitmap) needed to replay an exact input swap against a pool snapshot
+
+Q96 = 2**96
+MAX_UINT256 = 2**256 - 1
+MIN_TICK = -887272
+MAX_TICK = 887272
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+
+_TICK_RATIOS = [
+    (0x2, 0xFFF97272373D413259A46990580E213A),
+    (0x4, 0xFFF2E50F5F656932EF12357CF3C7FDCC),
+    (0x8, 0xFFE5CACA7E10E4E61C3624EAA0941CD0),
+    (0x10, 0xFFCB9843D60F6159C9DB58835C926644),
+    (0x20, 0xFF973B41FA98C081472E6896DFB254C0),
+    (0x40, 0xFF2EA16466C96A3843EC78B326B52861),
+    (0x80, 0xFE5DEE046A99A2A811C461F1969C3053),
+    (0x100, 0xFCBE86C7900A88AEDCFFC83B479AA3A4),
+    (0x200, 0xF987A7253AC413176F2B074CF7815E54),
+    (0x400, 0xF3392B0822B70005940C7A398E4B70F3),
+    (0x800, 0xE7159475A2C29B7443B29C7FA6E889D9),
+    (0x1000, 0xD097F3BDFD2022B8845AD8F792AA5825),
+    (0x2000, 0xA9F746462D870FDF8A65DC1F90E061E5),
+    (0x4000, 0x70D869A156D2A1B890BB3DF62BAF32F7),
+    (0x8000, 0x31BE135F97D08FD981231505542FCFA6),
+    (0x10000, 0x9AA508B5B7A84E1C677DE54F3E99BC9),
+    (0x20000, 0x5D6AF8DEDB81196699C329225EE604),
+    (0x40000, 0x2216E584F5FA1EA926041BEDFE98),
+    (0x80000, 0x48A170391F7DC42444E8FA2),
+]
+
+_factories = {}
+_pairs = {}
+_pools = {}
+
+
+def mul_div(a, b, denominator):
+    return a * b // denominator
+
+
+def mul_div_rounding_up(a, b, denominator):
+    return -(-a * b // denominator)
+
+
+def div_rounding_up(a, b):
+    return -(-a // b)
+
+
+def get_sqrt_ratio_at_tick(tick):
+    abs_tick = abs(tick)
+    assert abs_tick <= MAX_TICK, "T"
+
+    if abs_tick & 0x1:
+        ratio = 0xFFFCB933BD6FAD37AA2D162D1A594001
+    else:
+        ratio = 0x100000000000000000000000000000000
+    for bit, multiplier in _TICK_RATIOS:
+        if abs_tick & bit:
+            ratio = (ratio * multiplier) >> 128
+
+    if tick > 0:
+        ratio = MAX_UINT256 // ratio
+    return (ratio >> 32) + (0 if ratio % (1 << 32) == 0 else 1)
+
+
+def get_tick_at_sqrt_ratio(sqrt_price):
+    # greatest tick whose sqrt ratio is at most sqrt_price
+    assert MIN_SQRT_RATIO <= sqrt_price < MAX_SQRT_RATIO, "R"
+    low, high = MIN_TICK, MAX_TICK
+    while low < high:
+        mid = (low + high + 1) // 2
+        if get_sqrt_ratio_at_tick(mid) <= sqrt_price:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def get_amount0_delta(sqrt_a, sqrt_b, liquidity, round_up):
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    numerator1 = liquidity << 96
+    numerator2 = sqrt_b - sqrt_a
+    if round_up:
+        return div_rounding_up(
+            mul_div_rounding_up(numerator1, numerator2, sqrt_b), sqrt_a
+        )
+    return mul_div(numerator1, numerator2, sqrt_b) // sqrt_a
+
+
+def get_amount1_delta(sqrt_a, sqrt_b, liquidity, round_up):
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    if round_up:
+        return mul_div_rounding_up(liquidity, sqrt_b - sqrt_a, Q96)
+    return mul_div(liquidity, sqrt_b - sqrt_a, Q96)
+
+
+def get_next_sqrt_price_from_input(sqrt_price, liquidity, amount_in, zero_for_one):
+    assert sqrt_price > 0 and liquidity > 0
+    if amount_in == 0:
+        return sqrt_price
+    if zero_for_one:
+        # rounding up, the product and denominator are uint256 on chain
+        numerator1 = liquidity << 96
+        product = amount_in * sqrt_price
+        if product <= MAX_UINT256 and numerator1 + product <= MAX_UINT256:
+            return mul_div_rounding_up(numerator1, sqrt_price, numerator1 + product)
+        return div_rounding_up(numerator1, numerator1 // sqrt_price + amount_in)
+    # rounding down
+    if amount_in < 2**160:
+        quotient = (amount_in << 96) // liquidity
+    else:
+        quotient = mul_div(amount_in, Q96, liquidity)
+    return sqrt_price + quotient
+
+
+def compute_swap_step(sqrt_price, sqrt_target, liquidity, amount_remaining, fee):
+    # exact input only, returns (sqrt_price_next, amount_in, amount_out, fee)
+    zero_for_one = sqrt_price >= sqrt_target
+
+    amount_remaining_less_fee = mul_div(amount_remaining, 10**6 - fee, 10**6)
+    if zero_for_one:
+        amount_in = get_amount0_delta(sqrt_target, sqrt_price, liquidity, True)
+    else:
+        amount_in = get_amount1_delta(sqrt_price, sqrt_target, liquidity, True)
+    if amount_remaining_less_fee >= amount_in:
+        sqrt_next = sqrt_target
+    else:
+        sqrt_next = get_next_sqrt_price_from_input(
+            sqrt_price, liquidity, amount_remaining_less_fee, zero_for_one
+        )
+
+    reached = sqrt_target == sqrt_next
+    if zero_for_one:
+        if not reached:
+            amount_in = get_amount0_delta(sqrt_next, sqrt_price, liquidity, True)
+        amount_out = get_amount1_delta(sqrt_next, sqrt_price, liquidity, False)
+    else:
+        if not reached:
+            amount_in = get_amount1_delta(sqrt_price, sqrt_next, liquidity, True)
+        amount_out = get_amount0_delta(sqrt_price, sqrt_next, liquidity, False)
+
+    if not reached:
+        fee_amount = amount_remaining - amount_in
+    else:
+        fee_amount = mul_div_rounding_up(amount_in, fee, 10**6 - fee)
+    return sqrt_next, amount_in, amount_out, fee_amount
+
+
+def _most_significant_bit(x):
+    return x.bit_length() - 1
+
+
+def _least_significant_bit(x):
+    return (x & -x).bit_length() - 1
+
+
+def decode_path(path):
+    # packed (address,uint24,address,...) path of the V3 router and quoter
+    path = bytes(path)
+    tokens, fees = [], []
+    while True:
+        tokens.append("0x" + path[:20].hex())
+        if len(path) < 43:
+            break
+        fees.append(int.from_bytes(path[20:23], "big"))
+        path = path[23:]
+    return tokens, fees
+
+
+def get_amount_out(amount_in, reserve_in, reserve_out):
+    assert amount_in > 0, "UniswapV2Library: INSUFFICIENT_INPUT_AMOUNT"
+    assert (
+        reserve_in > 0 and reserve_out > 0
+    ), "UniswapV2Library: INSUFFICIENT_LIQUIDITY"
+    amount_in_with_fee = amount_in * 997
+    return (amount_in_with_fee * reserve_out) // (
+        reserve_in * 1000 + amount_in_with_fee
+    )
+
+
+class UniV2Pair(object):
+    # reserves snapshot of a Uniswap V2 style pair (Uni V2, Sushi)
+
+    def __init__(self, token0, reserve0, reserve1):
+        self.token0 = token0.lower()
+        self.reserve0 = reserve0
+        self.reserve1 = reserve1
+
+    @classmethod
+    def add_snapshot(cls, calls, address):
+        pair = interface.IUniV2Pair(address)
+        token0 = calls.add(pair.token0)
+        reserves = calls.add(pair.getReserves)
+        return lambda results: cls(results[token0], *results[reserves][:2])
+
+    def get_amount_out(self, amount_in, token_in):
+        if token_in.lower() == self.token0:
+            return get_amount_out(amount_in, self.reserve0, self.reserve1)
+        return get_amount_out(amount_in, self.reserve1, self.reserve0)
+
+
+class UniV3Pool(object):
+    # snapshot of a Uniswap V3 pool, bitmap holds the tick bitmap words that
+    # were read and liquidity_net the net liquidity of their initialized ticks
+    # quotes that would cross out of the words read raise a ValueError
+
+    def __init__(
+        self,
+        token0,
+        fee,
+        tick_spacing,
+        sqrt_price,
+        tick,
+        liquidity,
+        bitmap,
+        liquidity_net,
+    ):
+        self.token0 = token0.lower()
+        self.fee = fee
+        self.tick_spacing = tick_spacing
+        self.sqrt_price = sqrt_price
+        self.tick = tick
+        self.liquidity = liquidity
+        self.bitmap = bitmap
+        self.liquidity_net = liquidity_net
+
+    @classmethod
+    def from_chain(cls, address, words=2):
+        pool = interface.IUniV3Pool(address)
+        calls = Multicall()
+        for method in (pool.token0, pool.fee, pool.tickSpacing, pool.liquidity):
+            calls.add(method)
+        calls.add(pool.slot0)
+        token0, fee, tick_spacing, liquidity, slot0 = calls.execute()
+        sqrt_price, tick = slot0[:2]
+
+        word = (tick // tick_spacing) >> 8
+        positions = range(word - words, word + words + 1)
+        for position in positions:
+            calls.add(pool.tickBitmap, position)
+        bitmap = dict(zip(positions, calls.execute()))
+
+        ticks = [
+            (position * 256 + bit) * tick_spacing
+            for position, value in bitmap.items()
+            for bit in range(256)
+            if value >> bit & 1
+        ]
+        for t in ticks:
+            calls.add(pool.ticks, t)
+        liquidity_net = {t: result[1] for t, result in zip(ticks, calls.execute())}
+
+        return cls(
+            token0,
+            fee,
+            tick_spacing,
+            sqrt_price,
+            tick,
+            liquidity,
+            bitmap,
+            liquidity_net,
+        )
+
+    def _get_word(self, position):
+        if position not in self.bitmap:
+            raise ValueError("Swap crosses the ticks of the snapshot")
+        return self.bitmap[position]
+
+    def next_initialized_tick(self, tick, lte):
+        # TickBitmap.nextInitializedTickWithinOneWord
+        compressed = tick // self.tick_spacing
+        if lte:
+            position, bit = compressed >> 8, compressed & 0xFF
+            masked = self._get_word(position) & ((1 << bit) - 1 + (1 << bit))
+            if masked:
+                return (
+                    compressed - (bit - _most_significant_bit(masked))
+                ) * self.tick_spacing, True
+            return (compressed - bit) * self.tick_spacing, False
+        position, bit = (compressed + 1) >> 8, (compressed + 1) & 0xFF
+        masked = self._get_word(position) & (MAX_UINT256 ^ ((1 << bit) - 1))
+        if masked:
+            return (
+                compressed + 1 + (_least_significant_bit(masked) - bit)
+            ) * self.tick_spacing, True
+        return (compressed + 1 + (255 - bit)) * self.tick_spacing, False
+
+    def get_amount_out(self, amount_in, token_in):
+        zero_for_one = token_in.lower() == self.token0
+        limit = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+
+        remaining = amount_in
+        amount_out = 0
+        sqrt_price, tick, liquidity = self.sqrt_price, self.tick, self.liquidity
+        while remaining != 0 and sqrt_price != limit:
+            tick_next, initialized = self.next_initialized_tick(tick, zero_for_one)
+            tick_next = min(max(tick_next, MIN_TICK), MAX_TICK)
+            sqrt_price_next = get_sqrt_ratio_at_tick(tick_next)
+            if zero_for_one:
+                target = max(sqrt_price_next, limit)
+            else:
+                target = min(sqrt_price_next, limit)
+
+            start = sqrt_price
+            sqrt_price, step_in, step_out, step_fee = compute_swap_step(
+                sqrt_price, target, liquidity, remaining, self.fee
+            )
+            remaining -= step_in + step_fee
+            amount_out += step_out
+
+            if sqrt_price == sqrt_price_next:
+                if initialized:
+                    net = self.liquidity_net[tick_next]
+                    liquidity += -net if zero_for_one else net
+                tick = tick_next - 1 if zero_for_one else tick_next
+            elif sqrt_price != start:
+                tick = get_tick_at_sqrt_ratio(sqrt_price)
+        return amount_out
+
+
+class LocalQuoter(object):
+    # in process replacement for IUniV2Router.getAmountsOut and
+    # IQuoter.quoteExactInput(Single), pairs and pools are snapshotted the
+    # first time a quote goes through them and reused afterwards
+
+    def __init__(self, words=2):
+        self.words = words
+        self.pairs = {}
+        self.pools = {}
+
+    def get_pair(self, router, token_a, token_b):
+        if router not in _factories:
+            _factories[router] = interface.IUniV2Router(router).factory()
+        key = (_factories[router],) + tuple(sorted([token_a.lower(), token_b.lower()]))
+        if key not in _pairs:
+            _pairs[key] = interface.IUniV2Factory(key[0]).getPair(token_a, token_b)
+        address = _pairs[key]
+        if address not in self.pairs:
+            calls = Multicall()
+            load = UniV2Pair.add_snapshot(calls, address)
+            self.pairs[address] = load(calls.execute())
+        return self.pairs[address]
+
+    def get_pool(self, token_a, token_b, fee, quoter=UNI_QUOTER):
+        if quoter not in _factories:
+            _factories[quoter] = interface.IQuoter(quoter).factory()
+        key = (_factories[quoter], fee) + tuple(
+            sorted([token_a.lower(), token_b.lower()])
+        )
+        if key not in _pools:
+            _pools[key] = interface.IUniV3Factory(key[0]).getPool(token_a, token_b, fee)
+        address = _pools[key]
+        if address not in self.pools:
+            self.pools[address] = UniV3Pool.from_chain(address, self.words)
+        return self.pools[address]
+
+    def get_amounts_out(self, router, amount, path):
+        amounts = [amount]
+        for token_in, token_out in zip(path[:-1], path[1:]):
+            pair = self.get_pair(router, token_in, token_out)
+            amounts.append(pair.get_amount_out(amounts[-1], token_in))
+        return amounts
+
+    def quote_exact_input_single(self, token_in, token_out, fee, amount):
+        pool = self.get_pool(token_in, token_out, fee)
+        return pool.get_amount_out(amount, token_in)
+
+    def quote_exact_input(self, path, amount):
+        tokens, fees = decode_path(path)
+        for token_in, fee, token_out in zip(tokens[:-1], fees, tokens[1:]):
+            amount = self.quote_exact_input_single(token_in, token_out, fee, amount)
+        return amount